@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from application.series_store import SeriesKey, SeriesStore, get_series_store
+from domain.graph import XYSeries
+from domain.graph_config_factory import get_graph_configs
+from domain.material_type import MaterialType
+from infra.backup_schedule import next_backup_at
+from infra.graph_repository_factory import ApiHostName, GraphRepositoryFactory
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WarmResult:
+    """1つのプロパティの組を温めた結果"""
+    key: SeriesKey
+    seconds: float
+    n_series: int
+    n_points: int
+    error: Optional[str] = None
+
+
+def _fetch_bulk(key: SeriesKey) -> XYSeries:
+    prop_x, prop_y, _, _ = key
+    return GraphRepositoryFactory.create(ApiHostName.bulk_from_env()).get_graph_by_property(prop_x, prop_y)
+
+
+def parse_priority(value: str) -> List[Tuple[str, str]]:
+    """"Temperature-Seebeck coefficient,Temperature-ZT" のようなbulk dataファイル名形式の優先順位を読む"""
+    pairs = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        prop_x, sep, prop_y = item.partition("-")
+        if not sep:
+            raise ValueError(f"Invalid warm priority entry: {item!r} (expected 'prop_x-prop_y')")
+        pairs.append((prop_x.strip(), prop_y.strip()))
+    return pairs
+
+
+class CacheWarmer:
+    """
+    全MaterialTypeのグラフ設定に含まれるプロパティの組について、bulk dataを事前に取得・パースして
+    SeriesStoreに載せるウォーマー。プロセス起動時とbulk dataのバックアップ（JST 0時）後に実行する。
+    並列度はmax_workersで制限し、利用頻度の高い組をpriorityで先に温める。
+    """
+
+    def __init__(
+        self,
+        store: Optional[SeriesStore] = None,
+        fetch: Callable[[SeriesKey], XYSeries] = _fetch_bulk,
+        max_workers: int = 2,
+        priority: Sequence[Tuple[str, str]] = (),
+        refresh_delay: timedelta = timedelta(minutes=5),
+    ):
+        self.store = store if store is not None else get_series_store()
+        self.fetch = fetch
+        self.max_workers = max_workers
+        self.priority = list(priority)
+        self.refresh_delay = refresh_delay
+        self.last_results: List[WarmResult] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "CacheWarmer":
+        return cls(
+            max_workers=int(os.environ.get("STARRYDATA_WARM_WORKERS", 2)),
+            priority=parse_priority(os.environ.get("STARRYDATA_WARM_PRIORITY", "")),
+            refresh_delay=timedelta(seconds=float(os.environ.get("STARRYDATA_WARM_DELAY_SECONDS", 300))),
+        )
+
+    def keys(self) -> List[SeriesKey]:
+        """温める対象のキーを優先順位順に返す（同じ組は1回だけ）"""
+        keys: List[SeriesKey] = []
+        for material_type in MaterialType:
+            for graph in get_graph_configs(material_type):
+                key = (graph.x_axis.property, graph.y_axis.property, graph.x_axis.unit, graph.y_axis.unit)
+                if key not in keys:
+                    keys.append(key)
+        rank = {pair: i for i, pair in enumerate(self.priority)}
+        # 優先指定された組を指定順に先頭へ、それ以外は設定ファイルの順序を保つ
+        return sorted(keys, key=lambda k: rank.get((k[0], k[1]), len(rank)))
+
+    def warm_all(self) -> List[WarmResult]:
+        expires_at = next_backup_at()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cache-warmer") as executor:
+            results = list(executor.map(lambda key: self._warm(key, expires_at), self.keys()))
+        self.last_results = results
+        return results
+
+    def _warm(self, key: SeriesKey, expires_at: datetime) -> WarmResult:
+        started = time.perf_counter()
+        # スナップショットの世代が切り替わったら、リクエスト側（GraphDataService）が読み直す
+        generation = GraphRepositoryFactory.bulk_generation()
+        try:
+            series = self.fetch(key)
+        except Exception as e:  # 1つの組の失敗で他の組の温めを止めない
+            result = WarmResult(key=key, seconds=time.perf_counter() - started, n_series=0, n_points=0, error=repr(e))
+            logger.warning("cache warm failed: %s-%s in %.3fs: %s", key[0], key[1], result.seconds, result.error)
+            return result
+        self.store.put(key, series, expires_at, generation=generation)
+        result = WarmResult(key=key, seconds=time.perf_counter() - started, n_series=len(series), n_points=series.n_points)
+        logger.info(
+            "cache warmed: %s-%s in %.3fs (%d series, %d points)",
+            key[0], key[1], result.seconds, result.n_series, result.n_points,
+        )
+        return result
+
+    def start(self) -> threading.Thread:
+        """バックグラウンドスレッドで起動時とバックアップ後の温めを繰り返す"""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.warm_all()
+            wait = (next_backup_at() + self.refresh_delay - datetime.now(timezone.utc)).total_seconds()
+            self._stop.wait(max(wait, 0))
+
+
+_started_warmer: Optional[CacheWarmer] = None
+_start_lock = threading.Lock()
+
+
+def start_cache_warmer_once() -> Optional[CacheWarmer]:
+    """STARRYDATA_CACHE_WARMERが有効なら、プロセスにつき1回だけウォーマーを起動する"""
+    global _started_warmer
+    if os.environ.get("STARRYDATA_CACHE_WARMER", "").lower() not in ("1", "true", "yes"):
+        return None
+    with _start_lock:
+        if _started_warmer is None:
+            _started_warmer = CacheWarmer.from_env()
+            _started_warmer.start()
+        return _started_warmer
@@ -1,11 +1,18 @@
+import asyncio
+import contextvars
 import os
 import datetime
 import requests
-from typing import Dict, List, Tuple, Optional
+from typing import Awaitable, Callable, Dict, List, Tuple, Optional, Sequence
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from application.series_store import BULK, DELTA, MERGED, SeriesKey, SeriesStore, get_series_store
 from infra.graph_repository_factory import ApiHostName, GraphRepositoryFactory
-from src.domain.graph import XYSeries, XYPoints, XYPoint
-from src.domain.graph import HighlightCondition
+from infra.metrics import get_metrics
+from domain.graph import XYSeries, XYPoints, XYPoint
+from domain.graph import HighlightCondition
 
 @dataclass
 class XYPointsDTO:
@@ -16,65 +23,165 @@ class XYPointsDTO:
     sample_id: str
     composition: str
 
-@dataclass
+class XYPointsDTOView(Sequence[XYPointsDTO]):
+    """XYSeriesDTOを旧来のList[XYPointsDTO]として扱うための遅延ビュー"""
+    def __init__(self, dto: "XYSeriesDTO"):
+        self._dto = dto
+
+    def __len__(self) -> int:
+        return len(self._dto.series)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._dto.points_dto_at(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("XYSeriesDTO index out of range")
+        return self._dto.points_dto_at(index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._dto.points_dto_at(i)
+
+
 class XYSeriesDTO:
-    data: List[XYPointsDTO]
+    """
+    描画用の系列集合（列指向）
+    series: 描画順に並んだXYSeries
+    is_highlighted: 系列ごとのハイライト有無（bool配列）
+    旧来のList[XYPointsDTO]は data プロパティから遅延ビューとして利用できる。
+    """
+    def __init__(self, data: Optional[List[XYPointsDTO]] = None):
+        data = list(data) if data is not None else []
+        self.series = XYSeries([
+            XYPoints(
+                data=dto.data,
+                updated_at="",
+                sid=dto.sid,
+                figure_id=dto.figure_id,
+                sample_id=dto.sample_id,
+                composition=dto.composition,
+            )
+            for dto in data
+        ])
+        self.is_highlighted = np.fromiter((dto.is_highlighted for dto in data), dtype=bool, count=len(data))
+
+    @classmethod
+    def from_series(cls, series: XYSeries, is_highlighted: np.ndarray) -> "XYSeriesDTO":
+        dto = cls.__new__(cls)
+        dto.series = series
+        dto.is_highlighted = np.asarray(is_highlighted, dtype=bool)
+        return dto
+
+    @property
+    def data(self) -> XYPointsDTOView:
+        return XYPointsDTOView(self)
+
+    def points_dto_at(self, i: int) -> XYPointsDTO:
+        points = self.series.points_at(i)
+        return XYPointsDTO(
+            data=points.data,
+            is_highlighted=bool(self.is_highlighted[i]),
+            sid=points.sid,
+            figure_id=points.figure_id,
+            sample_id=points.sample_id,
+            composition=points.composition if points.composition is not None else ""
+        )
+
+    def highlight_per_point(self) -> np.ndarray:
+        """各点のハイライト有無（bool配列）"""
+        return np.repeat(self.is_highlighted, self.series.lengths())
 
 class GraphDataService:
+    def __init__(self, series_store: Optional[SeriesStore] = None):
+        # パース済み系列のキャッシュ（既定はプロセス共有のもの。キャッシュウォーマーもここに載せる）
+        self.series_store = series_store if series_store is not None else get_series_store()
+
     def filter_and_sort_by_highlight_dto(self, xy_series: XYSeries, highlight_condition: HighlightCondition) -> XYSeriesDTO:
         """
-        ハイライト条件でXYPointsを2分割し、各XYPointsDTOにis_highlighted属性を付与し、ハイライト対象を末尾に並べる（非ハイライト→ハイライトの順）
+        ハイライト条件でXYSeriesの系列を2分割し、系列ごとのis_highlightedを付与し、ハイライト対象を末尾に並べる（非ハイライト→ハイライトの順）
         """
-        highlighted = []
-        non_highlighted = []
-        for points in xy_series.data:
-            is_highlight = highlight_condition.is_match_points(points)
-            dto = XYPointsDTO(
-                data=points.data,
-                is_highlighted=is_highlight,
-                sid=points.sid,
-                figure_id=points.figure_id,
-                sample_id=points.sample_id,
-                composition=points.composition
-            )
-            if is_highlight:
-                highlighted.append(dto)
-            else:
-                non_highlighted.append(dto)
-        return XYSeriesDTO(data=non_highlighted + highlighted)
-
-    def _convert_utc_to_jst(self, updated_at: str) -> str:
-        from datetime import datetime, timezone, timedelta
-        import re
-        # Z→+00:00
-        s = updated_at
-        if s.endswith('Z'):
-            s = s[:-1] + '+00:00'
-        if not re.search(r'[+-]\d{2}:\d{2}$', s):
-            dt = datetime.fromisoformat(s)
-            dt = dt.replace(tzinfo=timezone.utc)
-        else:
-            dt = datetime.fromisoformat(s)
-        # JSTに変換
-        jst = dt.astimezone(timezone(timedelta(hours=9)))
-        # 2025-06-02T23:59:59+0900 の形式で返す
-        return jst.strftime('%Y-%m-%dT%H:%M:%S%z')
-
-    def _replace_points_with_jst(self, points_list):
-        from src.domain.graph import XYPoints
-        new_list = []
-        for points in points_list:
-            new_list.append(
-                XYPoints(
-                    data=points.data,
-                    updated_at=self._convert_utc_to_jst(points.updated_at),
-                    sid=points.sid,
-                    figure_id=points.figure_id,
-                    sample_id=points.sample_id,
-                    composition=points.composition if points.composition is not None else ""
-                )
-            )
-        return new_list
+        mask = highlight_condition.mask(xy_series)
+        order = np.concatenate([np.flatnonzero(~mask), np.flatnonzero(mask)])
+        return XYSeriesDTO.from_series(xy_series.take(order), mask[order])
+
+    def highlight(self, merged_series: XYSeries, highlight_condition: Optional[HighlightCondition]) -> XYSeriesDTO:
+        """マージ済みの系列にハイライト条件を適用する（条件がなければ全系列を非ハイライトにする）"""
+        with get_metrics().span("highlight", series=len(merged_series), condition=type(highlight_condition).__name__):
+            if highlight_condition is not None:
+                return self.filter_and_sort_by_highlight_dto(merged_series, highlight_condition)
+            return XYSeriesDTO.from_series(merged_series, np.zeros(len(merged_series), dtype=bool))
+
+    async def _load_cached(self, key: SeriesKey, kind: str, load: Callable[[], Awaitable[XYSeries]]) -> XYSeries:
+        """
+        キャッシュにあればそれを返し、なければloadで取得してキャッシュに載せる。
+        bulk dataは取得元の世代も確かめ、スナップショットの世代が切り替わっていれば読み直す。
+        """
+        # 取得前の世代で載せる（取得中に切り替わっても、次の参照で新しい世代を読み直す）
+        generation = GraphRepositoryFactory.bulk_generation() if kind == BULK else None
+        with get_metrics().span(f"load_{kind}") as span:
+            series = self.series_store.get(key, kind, generation)
+            span.set(cached=series is not None)
+            if series is None:
+                series = await load()
+                self.series_store.put(key, series, kind=kind, generation=generation)
+            return series
+
+    async def _fetch_bulk(self, prop_x: str, prop_y: str) -> XYSeries:
+        repo_bulk = GraphRepositoryFactory.create_async(ApiHostName.bulk_from_env())
+        return await repo_bulk.get_graph_by_property(prop_x, prop_y)
+
+    async def _fetch_today(self, prop_x: str, prop_y: str, unit_x: str, unit_y: str) -> XYSeries:
+        repo_today = GraphRepositoryFactory.create_async(ApiHostName.STARRYDATA2)
+        # updated_atは取り込み時にUTCの時刻列へパース済み（表示用の文字列への整形はツールチップ側で行う）
+        return await repo_today.get_graph_by_property_and_unit(
+            property_x=prop_x,
+            property_y=prop_y,
+            unit_x=unit_x,
+            unit_y=unit_y,
+        )
+
+    async def load_merged_series_async(self, prop_x: str, prop_y: str, unit_x: str = "", unit_y: str = "") -> XYSeries:
+        """
+        bulk data APIとStarrydata2 APIを並行に取得し、両方の完了後に連結する。
+        どちらもプロセス共有のキャッシュ（SeriesStore）を先に参照し、ヒットした側は取得しない。
+        連結結果も同じキャッシュに載せ、bulk dataとdeltaのどちらかが変わるまで連結し直さない
+        （deltaの再取得で新しいレコードがなければdeltaは同じversionのままなので、bulk dataの列をコピーしない）。
+        """
+        key = (prop_x, prop_y, unit_x, unit_y)
+        bulk_data_series, today_data_series = await asyncio.gather(
+            self._load_cached(key, BULK, lambda: self._fetch_bulk(prop_x, prop_y)),
+            self._load_cached(key, DELTA, lambda: self._fetch_today(prop_x, prop_y, unit_x, unit_y)),
+        )
+        with get_metrics().span("merge") as span:
+            if len(bulk_data_series) == 0 or len(today_data_series) == 0:
+                # 片方が空なら連結はもう片方をそのまま返す（コピーしないのでキャッシュにも載せない）
+                return XYSeries.concat([bulk_data_series, today_data_series])
+            # XYSeries.concatは連結元のversionの組をversionにする
+            version = ("concat", bulk_data_series.version, today_data_series.version)
+            merged = self.series_store.get(key, MERGED)
+            span.set(cached=merged is not None and merged.version == version)
+            if merged is None or merged.version != version:
+                merged = XYSeries.concat([bulk_data_series, today_data_series])
+                self.series_store.put(key, merged, kind=MERGED)
+            return merged
+
+    def load_merged_series(self, prop_x: str, prop_y: str, unit_x: str = "", unit_y: str = "") -> XYSeries:
+        """load_merged_series_asyncの同期ラッパー"""
+        return _run_sync(self.load_merged_series_async(prop_x, prop_y, unit_x, unit_y))
+
+    async def get_merged_graph_data_async(
+        self,
+        prop_x: str,
+        prop_y: str,
+        unit_x: str = "",
+        unit_y: str = "",
+        highlight_condition: Optional[HighlightCondition] = None,
+    ) -> XYSeriesDTO:
+        """bulk dataとStarrydata2のデータをマージし、ハイライト条件を適用する"""
+        merged_series = await self.load_merged_series_async(prop_x, prop_y, unit_x, unit_y)
+        return self.highlight(merged_series, highlight_condition)
 
     def get_merged_graph_data(
         self,
@@ -84,30 +191,16 @@ class GraphDataService:
         unit_y: str = "",
         highlight_condition: Optional[HighlightCondition] = None,
     ) -> XYSeriesDTO:
-        repo_bulk = GraphRepositoryFactory.create(ApiHostName.CLEANSING_DATASET)
-        bulk_data_series = repo_bulk.get_graph_by_property(prop_x, prop_y)
-        # bulk側はJST変換不要
-        repo_today = GraphRepositoryFactory.create(ApiHostName.STARRYDATA2)
-        today_data_series = repo_today.get_graph_by_property_and_unit(
-            property_x=prop_x,
-            property_y=prop_y,
-            unit_x=unit_x,
-            unit_y=unit_y,
-        )
-        # today側のみJST変換
-        today_data_series = XYSeries(data=self._replace_points_with_jst(today_data_series.data))
-        bulk_data_series.data.extend(today_data_series.data)
-        if highlight_condition is not None:
-            return self.filter_and_sort_by_highlight_dto(bulk_data_series, highlight_condition)
-        dtos = []
-        for points in bulk_data_series.data:
-            dtos.append(XYPointsDTO(
-                data=points.data,
-                is_highlighted=False,
-                sid=points.sid,
-                figure_id=points.figure_id,
-                sample_id=points.sample_id,
-                composition=points.composition if points.composition is not None else ""
-            ))
-        return XYSeriesDTO(data=dtos)
+        """get_merged_graph_data_asyncの同期ラッパー（Streamlitのページから呼ぶ）"""
+        return _run_sync(self.get_merged_graph_data_async(prop_x, prop_y, unit_x, unit_y, highlight_condition))
+
 
+def _run_sync(coroutine):
+    """コルーチンを同期的に実行する。イベントループ実行中のスレッドから呼ばれた場合は別スレッドで実行する"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # 呼び出し元のcontextvars（計測のtraceなど）を引き継いで実行する
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coroutine).result()
@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from domain.graph import XYSeries
+from infra.backup_schedule import next_backup_at
+from infra.metrics import get_metrics
+
+# (prop_x, prop_y, unit_x, unit_y)
+SeriesKey = Tuple[str, str, str, str]
+
+BULK = "bulk"
+DELTA = "delta"
+# bulk dataとdeltaを連結した系列（連結元のversionが変わるまで使い回す）
+MERGED = "merged"
+
+DEFAULT_MAX_BYTES = 512 << 20  # 512MiB
+DEFAULT_DELTA_TTL = timedelta(seconds=60)
+# メタデータ文字列（updated_at, sid, figure_id, sample_id, composition）の系列あたりの概算バイト数
+_METADATA_BYTES_PER_SERIES = 5 * 64
+
+
+@dataclass(frozen=True)
+class _Entry:
+    series: XYSeries
+    expires_at: datetime
+    size: int
+    generation: Optional[str] = None
+
+
+class SeriesStore:
+    """
+    パース済みXYSeriesをプロセス内に常駐させるキャッシュ。全ユーザーセッションで共有する。
+    bulk dataと連結済みのエントリは次のバックアップ（JST 0時）まで、Starrydata2のdeltaはdelta_ttlの間だけ有効で、
+    合計サイズがmax_bytesを超えたら最近使われていないものから追い出す。
+    取得元に世代がある場合（スナップショットのbulk data）は、載せた時と参照する時の世代が違えば期限切れとして扱う。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, delta_ttl: timedelta = DEFAULT_DELTA_TTL):
+        self.max_bytes = max_bytes
+        self.delta_ttl = delta_ttl
+        self._entries: "OrderedDict[Tuple[str, SeriesKey], _Entry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._hits = {BULK: 0, DELTA: 0, MERGED: 0}
+        self._misses = {BULK: 0, DELTA: 0, MERGED: 0}
+        self._evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "SeriesStore":
+        return cls(
+            max_bytes=int(os.environ.get("STARRYDATA_SERIES_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            delta_ttl=timedelta(seconds=float(os.environ.get("STARRYDATA_DELTA_CACHE_TTL_SECONDS", DEFAULT_DELTA_TTL.total_seconds()))),
+        )
+
+    def get(self, key: SeriesKey, kind: str = BULK, generation: Optional[str] = None) -> Optional[XYSeries]:
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is not None and (entry.expires_at <= datetime.now(timezone.utc) or entry.generation != generation):
+                self._remove((kind, key))
+                entry = None
+            if entry is None:
+                self._misses[kind] += 1
+                return None
+            self._entries.move_to_end((kind, key))
+            self._hits[kind] += 1
+            return entry.series
+
+    def put(
+        self,
+        key: SeriesKey,
+        series: XYSeries,
+        expires_at: Optional[datetime] = None,
+        kind: str = BULK,
+        generation: Optional[str] = None,
+    ) -> None:
+        """
+        エントリを追加する。expires_atを省略すると、deltaは現在時刻+delta_ttl、それ以外は次のバックアップ時刻になる。
+        generationは取得元の世代（GraphRepositoryFactory.bulk_generation）で、getには同じ値を渡す。
+        """
+        if expires_at is None:
+            expires_at = datetime.now(timezone.utc) + self.delta_ttl if kind == DELTA else next_backup_at()
+        size = series.nbytes + len(series) * _METADATA_BYTES_PER_SERIES
+        with self._lock:
+            if (kind, key) in self._entries:
+                self._remove((kind, key))
+            if size > self.max_bytes:
+                return
+            self._entries[(kind, key)] = _Entry(series=series, expires_at=expires_at, size=size, generation=generation)
+            self._size += size
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, float]:
+        """種別ごとのヒット数・ミス数・ヒット率と、エントリ数・合計サイズ・追い出し数を返す"""
+        with self._lock:
+            stats: Dict[str, float] = {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "evictions": self._evictions,
+            }
+            for kind in (BULK, DELTA, MERGED):
+                lookups = self._hits[kind] + self._misses[kind]
+                stats[f"{kind}_hits"] = self._hits[kind]
+                stats[f"{kind}_misses"] = self._misses[kind]
+                stats[f"{kind}_hit_rate"] = self._hits[kind] / lookups if lookups else 0.0
+            return stats
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _remove(self, entry_key: Tuple[str, SeriesKey]) -> None:
+        entry = self._entries.pop(entry_key)
+        self._size -= entry.size
+
+
+_default_store = SeriesStore.from_env()
+get_metrics().register_collector("series_store", _default_store.stats)
+
+
+def get_series_store() -> SeriesStore:
+    """プロセス全体で共有するキャッシュを返す"""
+    return _default_store
@@ -0,0 +1,308 @@
+"""
+bulk data APIから全グラフ設定のプロパティの組を取得し、ローカルのスナップショット（infra.snapshot）の
+新しい世代を作って切り替えるツール。
+
+    PYTHONPATH=src python -m application.snapshot_builder --root /var/lib/starrydata/snapshots            # 1回だけ作る
+    PYTHONPATH=src python -m application.snapshot_builder --root /var/lib/starrydata/snapshots --schedule # バックアップごとに作り直す
+
+ルートの下は次のように並ぶ。アプリはSTARRYDATA_SNAPSHOT_DIRにルートを、STARRYDATA_BULK_DATA_SOURCEにsnapshotを設定して読む。
+
+    generations/<世代>/<組のキー>.xysnap, manifest.json
+    current -> generations/<世代>
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta, timezone
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from application.cache_warmer import parse_priority
+from domain.graph_config_factory import get_graph_configs
+from domain.material_type import MaterialType
+from infra.api_client import CleansingDatasetApiClient
+from infra.backup_schedule import JST, latest_backup_at, next_backup_at
+from infra.graph_repository import _to_xy_series
+from infra.snapshot import CURRENT, SnapshotStore, read_header
+
+logger = logging.getLogger(__name__)
+
+GENERATIONS = "generations"
+MANIFEST = "manifest.json"
+
+
+def property_pairs() -> List[Tuple[str, str]]:
+    """全MaterialTypeのグラフ設定が参照するプロパティの組（設定ファイルの順序、同じ組は1回だけ）"""
+    pairs: List[Tuple[str, str]] = []
+    for material_type in MaterialType:
+        for graph in get_graph_configs(material_type):
+            pair = (graph.x_axis.property, graph.y_axis.property)
+            if pair not in pairs:
+                pairs.append(pair)
+    return pairs
+
+
+@dataclass(frozen=True)
+class PairTask:
+    """ワーカープロセスに渡す1つの組の作業"""
+    property_x: str
+    property_y: str
+    host: str
+    directory: str
+    # 現在の世代にある同じ組のスナップショットと、その元になった本文のハッシュ
+    previous_path: Optional[str] = None
+    previous_sha256: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class PairResult:
+    """1つの組を作った結果"""
+    property_x: str
+    property_y: str
+    downloaded_bytes: int = 0
+    snapshot_bytes: int = 0
+    download_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    n_series: int = 0
+    n_points: int = 0
+    sha256: Optional[str] = None
+    # 本文が前の世代と同じで、前のスナップショットを引き継いだ
+    skipped: bool = False
+    # 取得・変換に失敗した（前の世代があればそれを引き継ぐ）
+    error: Optional[str] = None
+
+
+def build_pair(task: PairTask) -> PairResult:
+    """
+    1つの組を取得してスナップショットにする（ワーカープロセスで実行する）。
+    本文のハッシュが前の世代と同じならパースせず、前のスナップショットを新しい世代へリンクする。
+    """
+    started = time.perf_counter()
+    result = PairResult(property_x=task.property_x, property_y=task.property_y)
+    store = SnapshotStore(task.directory)
+    try:
+        client = CleansingDatasetApiClient(task.host, streaming=False)
+        body = client.fetch_xy_body(task.property_x, task.property_y)
+        downloaded_at = time.perf_counter()
+        sha256 = hashlib.sha256(body).hexdigest()
+        result = replace(result, downloaded_bytes=len(body), download_seconds=downloaded_at - started, sha256=sha256)
+        if task.previous_path is not None and sha256 == task.previous_sha256:
+            _link_or_copy(task.previous_path, store.path(task.property_x, task.property_y))
+            header = read_header(task.previous_path)
+            return replace(
+                result,
+                skipped=True,
+                snapshot_bytes=os.path.getsize(task.previous_path),
+                n_series=header["n_series"],
+                n_points=header["n_points"],
+            )
+        series = _to_xy_series(client.decoder.decode_columns(body))
+        snapshot_bytes = store.write(task.property_x, task.property_y, series, metadata={"source_sha256": sha256, "source_bytes": len(body)})
+        return replace(
+            result,
+            parse_seconds=time.perf_counter() - downloaded_at,
+            snapshot_bytes=snapshot_bytes,
+            n_series=len(series),
+            n_points=series.n_points,
+        )
+    except Exception as e:  # 1つの組の失敗で他の組を止めない
+        if task.previous_path is not None:
+            _link_or_copy(task.previous_path, store.path(task.property_x, task.property_y))
+        return replace(result, error=repr(e))
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+@dataclass
+class BuildReport:
+    generation: str
+    backup_at: str
+    wall_seconds: float
+    pairs: List[PairResult]
+
+    @property
+    def failed(self) -> List[PairResult]:
+        return [p for p in self.pairs if p.error is not None]
+
+    def to_dict(self) -> dict:
+        return {
+            "generation": self.generation,
+            "backup_at": self.backup_at,
+            "wall_seconds": self.wall_seconds,
+            "downloaded_bytes": sum(p.downloaded_bytes for p in self.pairs),
+            "snapshot_bytes": sum(p.snapshot_bytes for p in self.pairs),
+            "built": sum(not p.skipped and p.error is None for p in self.pairs),
+            "skipped": sum(p.skipped for p in self.pairs),
+            "failed": len(self.failed),
+            "pairs": [asdict(p) for p in self.pairs],
+        }
+
+    def format(self) -> List[str]:
+        lines = [f"generation {self.generation} (backup {self.backup_at})"]
+        for p in self.pairs:
+            status = "error" if p.error else "skipped" if p.skipped else "built"
+            lines.append(
+                f"{p.property_x}-{p.property_y}: {status:>7}, download {p.downloaded_bytes / 1e6:8.2f} MB in {p.download_seconds:6.2f} s, "
+                f"parse {p.parse_seconds:6.2f} s, snapshot {p.snapshot_bytes / 1e6:8.2f} MB ({p.n_series} series)"
+                + (f" {p.error}" if p.error else "")
+            )
+        summary = self.to_dict()
+        lines.append(
+            f"total: {summary['built']} built, {summary['skipped']} skipped, {summary['failed']} failed, "
+            f"{summary['downloaded_bytes'] / 1e6:.2f} MB downloaded, wall {self.wall_seconds:.2f} s"
+        )
+        return lines
+
+
+class SnapshotBuilder:
+    """
+    スナップショットの世代を作って切り替える。
+    組ごとの取得・変換はプロセスプールで並列に行い（workers=0なら呼び出し元のプロセスで順に行う）、
+    全組が揃ってからcurrentのシンボリックリンクを置き換えるので、読み手は世代の途中の状態を見ない。
+    古い世代はkeep_generationsを残して削除する（開いているmmapは削除後も有効）。
+    """
+
+    def __init__(
+        self,
+        root: str,
+        host: str,
+        workers: int = 4,
+        keep_generations: int = 2,
+        pairs: Optional[Sequence[Tuple[str, str]]] = None,
+        refresh_delay: timedelta = timedelta(minutes=5),
+    ):
+        self.root = root
+        self.host = host
+        self.workers = workers
+        self.keep_generations = keep_generations
+        self.pairs = list(pairs) if pairs is not None else property_pairs()
+        self.refresh_delay = refresh_delay
+        self._stop = threading.Event()
+
+    def build(self, force: bool = False) -> BuildReport:
+        """新しい世代を作って切り替える。forceなら本文が変わっていない組も作り直す"""
+        started = time.perf_counter()
+        now = datetime.now(JST)
+        generation = now.strftime("%Y%m%dT%H%M%S%f")
+        directory = os.path.join(self.root, GENERATIONS, generation)
+        os.makedirs(directory)
+        previous = self._current_snapshots()
+        tasks = []
+        for property_x, property_y in self.pairs:
+            path, sha256 = previous.get((property_x, property_y), (None, None))
+            # forceでもハッシュを比べないだけで、失敗時には前の世代を引き継ぐ
+            tasks.append(PairTask(property_x, property_y, self.host, directory, previous_path=path, previous_sha256=None if force else sha256))
+        if self.workers > 0:
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn")) as executor:
+                results = list(executor.map(build_pair, tasks))
+        else:
+            results = [build_pair(task) for task in tasks]
+        report = BuildReport(
+            generation=generation,
+            backup_at=latest_backup_at(now).isoformat(),
+            wall_seconds=time.perf_counter() - started,
+            pairs=results,
+        )
+        with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+        self._swap(directory)
+        self._prune()
+        logger.info(report.format()[-1])
+        return report
+
+    def run_forever(self, force_first: bool = False) -> None:
+        """起動時に1回作り、以後はバックアップ（JST 0時）のrefresh_delay後ごとに作り直す"""
+        force = force_first
+        while not self._stop.is_set():
+            try:
+                self.build(force=force)
+            except Exception:  # 次のバックアップで再試行する
+                logger.exception("snapshot build failed")
+            force = False
+            wait = (next_backup_at() + self.refresh_delay - datetime.now(timezone.utc)).total_seconds()
+            self._stop.wait(max(wait, 0))
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _current_snapshots(self) -> Dict[Tuple[str, str], Tuple[str, Optional[str]]]:
+        """現在の世代の組ごとの (スナップショットのパス, 元の本文のハッシュ)"""
+        store = SnapshotStore(os.path.join(self.root, CURRENT))
+        hashes = {}
+        for pair in self.pairs:
+            path = store.path(*pair)
+            try:
+                hashes[pair] = (path, read_header(path)["metadata"].get("source_sha256"))
+            except (OSError, ValueError):
+                continue
+        return hashes
+
+    def _swap(self, directory: str) -> None:
+        """currentを新しい世代へのリンクに置き換える（renameなので原子的）"""
+        link = os.path.join(self.root, CURRENT)
+        tmp_link = os.path.join(self.root, f".tmp-{CURRENT}-{os.getpid()}")
+        os.symlink(os.path.relpath(directory, self.root), tmp_link)
+        os.replace(tmp_link, link)
+
+    def _prune(self) -> None:
+        generations_dir = os.path.join(self.root, GENERATIONS)
+        current = os.path.realpath(os.path.join(self.root, CURRENT))
+        generations = sorted(os.listdir(generations_dir), reverse=True)
+        for name in generations[self.keep_generations:]:
+            path = os.path.join(generations_dir, name)
+            if os.path.realpath(path) != current:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=os.environ.get("STARRYDATA_SNAPSHOT_DIR"), help="スナップショットのルート（既定: STARRYDATA_SNAPSHOT_DIR）")
+    parser.add_argument("--host", default=os.environ.get("STARRYDATA_BULK_DATA_API"), help="bulk data API（既定: STARRYDATA_BULK_DATA_API）")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="ワーカープロセス数（0で直列）")
+    parser.add_argument("--keep", type=int, default=2, help="残す世代数")
+    parser.add_argument("--pairs", help="作る組を 'prop_x-prop_y' のカンマ区切りで限定する（既定: 全グラフ設定の組）")
+    parser.add_argument("--force", action="store_true", help="本文が変わっていない組も作り直す")
+    parser.add_argument("--schedule", action="store_true", help="常駐してバックアップごとに作り直す")
+    parser.add_argument("--delay-seconds", type=float, default=300, help="バックアップから作り直すまでの待ち時間（--schedule）")
+    parser.add_argument("--report", help="結果のJSONの出力先（1回だけ作る場合）")
+    args = parser.parse_args(argv)
+    if not args.root:
+        parser.error("--root or STARRYDATA_SNAPSHOT_DIR is required")
+    if not args.host:
+        parser.error("--host or STARRYDATA_BULK_DATA_API is required")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    builder = SnapshotBuilder(
+        args.root,
+        args.host,
+        workers=args.workers,
+        keep_generations=args.keep,
+        pairs=parse_priority(args.pairs) if args.pairs else None,
+        refresh_delay=timedelta(seconds=args.delay_seconds),
+    )
+    if args.schedule:
+        builder.run_forever(force_first=args.force)
+        return 0
+    report = builder.build(force=args.force)
+    print("\n".join(report.format()))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
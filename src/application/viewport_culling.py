@@ -0,0 +1,60 @@
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import numpy as np
+
+from application.graph_data_service import XYSeriesDTO
+from domain.graph import Axis
+
+
+@dataclass(frozen=True)
+class CullResult:
+    """カリングの結果"""
+    keep: np.ndarray     # 点ごとに残すかどうか
+    n_input: int         # カリング前の点数
+    n_outside: int       # 表示範囲（+余白）の外として落とした点数
+    n_non_positive: int  # 対数軸で0以下のため落とした点数
+    dto: Optional[XYSeriesDTO] = None  # 残った点だけのDTO（cullの場合。系列の並びとハイライトは元のまま）
+
+    @property
+    def n_output(self) -> int:
+        return self.n_input - self.n_outside - self.n_non_positive
+
+
+@dataclass(frozen=True)
+class ViewportCulling:
+    """
+    GraphDataServiceの結果から、描画しても見えない点を落とす段。
+    軸のAxisRangeの外（パン用に範囲の幅のmargin倍だけ広げる）の点と、対数軸で0以下の点を落とす。
+    対数軸の余白は対数スケール上の幅で計算する。
+    """
+    margin: float = 0.5
+
+    def cull(self, xy_series_dto: XYSeriesDTO, x_axis: Axis, y_axis: Axis) -> CullResult:
+        series = xy_series_dto.series
+        result = self.point_mask(series.x, series.y, x_axis, y_axis)
+        return replace(result, dto=XYSeriesDTO.from_series(series.select_points(result.keep), xy_series_dto.is_highlighted))
+
+    def point_mask(self, x: np.ndarray, y: np.ndarray, x_axis: Axis, y_axis: Axis) -> CullResult:
+        """点の座標列だけから残す点を決める（DTOは作らない）"""
+        x_positive, x_inside = self._classify(x, x_axis)
+        y_positive, y_inside = self._classify(y, y_axis)
+        positive = x_positive & y_positive
+        keep = positive & x_inside & y_inside
+        n_non_positive = int(np.count_nonzero(~positive))
+        n_outside = int(len(keep) - np.count_nonzero(keep)) - n_non_positive
+        return CullResult(keep=keep, n_input=len(keep), n_outside=n_outside, n_non_positive=n_non_positive)
+
+    def _classify(self, values: np.ndarray, axis: Axis):
+        """(対数軸で描画できる点, 余白込みの範囲内の点) の真偽値配列"""
+        lo, hi = sorted((axis.axis_range.min_value, axis.axis_range.max_value))
+        if not axis.axis_type.is_log():
+            pad = (hi - lo) * self.margin
+            return np.ones(len(values), dtype=bool), (values >= lo - pad) & (values <= hi + pad)
+        positive = values > 0
+        if lo <= 0:
+            # 範囲の下限が0以下だと対数での幅が決まらないので、範囲では落とさない
+            return positive, np.ones(len(values), dtype=bool)
+        log_lo, log_hi = np.log10(lo), np.log10(hi)
+        pad = (log_hi - log_lo) * self.margin
+        return positive, (values >= 10 ** (log_lo - pad)) & (values <= 10 ** (log_hi + pad))
@@ -0,0 +1,347 @@
+"""
+bulk data APIとStarrydata2 APIの代わりになるローカルのHTTPサーバー。
+合成データ（benchmarks.synthetic）を返し、遅延・帯域・エラー率・ETag・gzipを設定できるので、
+ネットワークなしで取得からグラフ作成までを通しで計測できる。
+
+    PYTHONPATH=src python -m benchmarks.api_server --port 8800 --series 100000 --latency-ms 50 --bandwidth-mbps 20
+
+起動すると、アプリに設定する環境変数（STARRYDATA_BULK_DATA_API, STARRYDATA2_API_XY_DATA）を表示する。
+    bulk data API:     GET /bulk/{prop_x}-{prop_y}.json
+    Starrydata2 API:   GET /xy_data/?property_x=&property_y=&date_from=&date_to=&limit=&offset=
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from benchmarks.synthetic import PayloadSpec, make_data, make_payload
+from domain.timestamps import parse_iso8601
+
+BULK_PREFIX = "/bulk/"
+XY_DATA_PREFIX = "/xy_data/"
+# 帯域制限時に1回に書き込むバイト数
+_WRITE_CHUNK_SIZE = 1 << 14
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    """スタンドインサーバーのデータの大きさと通信の性質"""
+    bulk_series: int = 10_000           # bulk dataの系列数（プロパティの組ごと）
+    delta_series: int = 200             # Starrydata2の直近24時間の系列数（プロパティの組ごと）
+    points_mean: float = 20.0
+    points_sigma: float = 1.0
+    latency: float = 0.0                # 応答までの遅延（秒）
+    jitter: float = 0.0                 # 遅延に加える一様乱数の幅（秒）
+    bandwidth: Optional[float] = None   # 本文の送信速度の上限（バイト/秒。Noneなら無制限）
+    error_rate: float = 0.0             # error_statusを返す確率
+    error_status: int = 503
+    etag: bool = True                   # bulk dataにETag/Last-Modifiedを付け、条件付きGETに304を返す
+    gzip: bool = False                  # Accept-Encodingにgzipがあれば圧縮して返す
+    seed: int = 0
+
+
+@dataclass
+class _Dataset:
+    bulk_body: bytes
+    etag: str
+    last_modified: str
+    delta: Dict[str, list]
+    delta_epoch: np.ndarray
+    bulk_gzip: Optional[bytes] = None  # bulk_bodyをgzipで圧縮したもの（初回の要求時に作る）
+
+
+class StandInApiServer:
+    """
+    ThreadingHTTPServerで動くスタンドイン。プロパティの組ごとのデータは初回のリクエストで作って保持する
+    （組ごとにシードを変えるので、組が違えば中身も違う）。
+    リクエスト数・304の数・注入したエラーの数・送信バイト数をstatsで返す。
+    """
+
+    def __init__(self, config: ServerConfig = ServerConfig(), host: str = "127.0.0.1", port: int = 0):
+        self.config = config
+        self.started_at = datetime.now(timezone.utc).replace(microsecond=0)
+        self._datasets: Dict[Tuple[str, str], _Dataset] = {}
+        self._datasets_lock = threading.Lock()
+        self._stats = {"requests": 0, "bulk_requests": 0, "xy_data_requests": 0, "not_modified": 0, "errors": 0, "bytes_sent": 0}
+        self._stats_lock = threading.Lock()
+        self._random = random.Random(config.seed)
+        self._random_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_class(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def bulk_url(self) -> str:
+        return self.url + BULK_PREFIX.rstrip("/")
+
+    @property
+    def xy_data_url(self) -> str:
+        return self.url + XY_DATA_PREFIX.rstrip("/")
+
+    def env(self) -> Dict[str, str]:
+        """アプリをこのサーバーに向けるための環境変数"""
+        return {"STARRYDATA_BULK_DATA_API": self.bulk_url, "STARRYDATA2_API_XY_DATA": self.xy_data_url}
+
+    def start(self) -> "StandInApiServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stand-in-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """現在のスレッドで応答し続ける（Ctrl+Cで終了する）"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StandInApiServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def dataset(self, prop_x: str, prop_y: str) -> _Dataset:
+        key = (prop_x, prop_y)
+        with self._datasets_lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                dataset = self._datasets[key] = self._make_dataset(prop_x, prop_y)
+            return dataset
+
+    # --- 内部処理 ---
+
+    def _make_dataset(self, prop_x: str, prop_y: str) -> _Dataset:
+        config = self.config
+        seed = config.seed * 1_000_003 + zlib.crc32(f"{prop_x}-{prop_y}".encode("utf-8"))
+        spec = PayloadSpec(
+            n_series=config.bulk_series,
+            points_mean=config.points_mean,
+            points_sigma=config.points_sigma,
+            updated_at_to=int(self.started_at.timestamp()) - 2 * 24 * 60 * 60,
+            seed=seed,
+        )
+        body = make_payload(spec)
+        # deltaはサーバー起動前の24時間に更新された系列（bulk dataの末尾の系列の取り直しを含む）
+        delta = make_data(spec.delta(config.delta_series, updated_at_from=int(self.started_at.timestamp()) - 24 * 60 * 60))
+        return _Dataset(
+            bulk_body=body,
+            etag='"{}"'.format(hashlib.sha1(body).hexdigest()),
+            last_modified=formatdate(self.started_at.timestamp(), usegmt=True),
+            delta=delta,
+            delta_epoch=parse_iso8601(delta["updated_at"]),
+        )
+
+    def _count(self, **values) -> None:
+        with self._stats_lock:
+            for name, value in values.items():
+                self._stats[name] += value
+
+    def _should_fail(self) -> bool:
+        if self.config.error_rate <= 0:
+            return False
+        with self._random_lock:
+            return self._random.random() < self.config.error_rate
+
+    def _delay(self) -> float:
+        if self.config.jitter <= 0:
+            return self.config.latency
+        with self._random_lock:
+            return self.config.latency + self._random.uniform(0, self.config.jitter)
+
+
+def _handler_class(server: StandInApiServer):
+    class Handler(BaseHTTPRequestHandler):
+        # keep-aliveで接続を再利用できるようにする（本文には必ずContent-Lengthを付ける）
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            server._count(requests=1)
+            delay = server._delay()
+            if delay > 0:
+                time.sleep(delay)
+            if server._should_fail():
+                server._count(errors=1)
+                self._send(server.config.error_status, b"", "text/plain")
+                return
+            parts = urlsplit(self.path)
+            path = unquote(parts.path)
+            if path.startswith(BULK_PREFIX) and path.endswith(".json"):
+                server._count(bulk_requests=1)
+                self._bulk(path[len(BULK_PREFIX):-len(".json")])
+            elif path.rstrip("/") + "/" == XY_DATA_PREFIX:
+                server._count(xy_data_requests=1)
+                self._xy_data(parse_qs(parts.query))
+            else:
+                self._send(404, b'{"detail": "Not Found"}', "application/json")
+
+        def _bulk(self, name: str):
+            prop_x, sep, prop_y = name.partition("-")
+            if not sep:
+                self._send(404, b'{"detail": "Not Found"}', "application/json")
+                return
+            dataset = server.dataset(prop_x, prop_y)
+            headers = {}
+            if server.config.etag:
+                headers = {"ETag": dataset.etag, "Last-Modified": dataset.last_modified}
+                if self._not_modified(dataset):
+                    server._count(not_modified=1)
+                    self._send(304, b"", None, headers)
+                    return
+            if self._accepts_gzip():
+                if dataset.bulk_gzip is None:
+                    dataset.bulk_gzip = gzip.compress(dataset.bulk_body, compresslevel=5)
+                self._send(200, dataset.bulk_gzip, "application/json", {**headers, "Content-Encoding": "gzip"}, compress=False)
+                return
+            self._send(200, dataset.bulk_body, "application/json", headers)
+
+        def _not_modified(self, dataset: _Dataset) -> bool:
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match is not None:
+                return dataset.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+            if_modified_since = self.headers.get("If-Modified-Since")
+            if if_modified_since:
+                try:
+                    return parsedate_to_datetime(if_modified_since) >= server.started_at
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def _xy_data(self, query: Dict[str, list]):
+            def param(name: str, default: Optional[str] = None) -> Optional[str]:
+                values = query.get(name)
+                return values[0] if values else default
+            prop_x, prop_y = param("property_x"), param("property_y")
+            if not prop_x or not prop_y:
+                self._send(422, b'{"detail": "property_x and property_y are required"}', "application/json")
+                return
+            dataset = server.dataset(prop_x, prop_y)
+            epoch = dataset.delta_epoch
+            selected = np.ones(len(epoch), dtype=bool)
+            for name, compare in (("date_from", np.greater_equal), ("date_to", np.less_equal)):
+                value = param(name)
+                if value:
+                    bound = parse_iso8601([value])[0]
+                    if np.isnat(bound):
+                        self._send(422, json.dumps({"detail": f"invalid {name}"}).encode("utf-8"), "application/json")
+                        return
+                    selected &= compare(epoch, bound)
+            # updated_at順に並べてlimit/offsetで切り出す
+            positions = np.flatnonzero(selected)
+            positions = positions[np.argsort(epoch[positions], kind="stable")]
+            offset = int(param("offset", "0"))
+            limit = param("limit")
+            positions = positions[offset:offset + int(limit)] if limit else positions[offset:]
+            index = positions.tolist()
+            data = {key: [values[i] for i in index] for key, values in dataset.delta.items()}
+            self._send(200, json.dumps({"data": data}, separators=(",", ":")).encode("utf-8"), "application/json")
+
+        def _accepts_gzip(self) -> bool:
+            return server.config.gzip and "gzip" in self.headers.get("Accept-Encoding", "")
+
+        def _send(
+            self,
+            status: int,
+            body: bytes,
+            content_type: Optional[str],
+            headers: Optional[Dict[str, str]] = None,
+            compress: bool = True,
+        ):
+            if body and compress and self._accepts_gzip():
+                body = gzip.compress(body, compresslevel=5)
+                headers = {**(headers or {}), "Content-Encoding": "gzip"}
+            self.send_response(status)
+            if content_type:
+                self.send_header("Content-Type", content_type)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self._write(body)
+            server._count(bytes_sent=len(body))
+
+        def _write(self, body: bytes):
+            bandwidth = server.config.bandwidth
+            if not bandwidth:
+                self.wfile.write(body)
+                return
+            started = time.perf_counter()
+            for start in range(0, len(body), _WRITE_CHUNK_SIZE):
+                self.wfile.write(body[start:start + _WRITE_CHUNK_SIZE])
+                # 書き込んだ量に見合う時間が経つまで待つ
+                ahead = (start + _WRITE_CHUNK_SIZE) / bandwidth - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--series", type=int, default=ServerConfig.bulk_series, help="bulk dataの系列数")
+    parser.add_argument("--delta-series", type=int, default=ServerConfig.delta_series, help="Starrydata2の直近24時間の系列数")
+    parser.add_argument("--points-mean", type=float, default=ServerConfig.points_mean)
+    parser.add_argument("--points-sigma", type=float, default=ServerConfig.points_sigma)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--bandwidth-mbps", type=float, help="送信速度の上限（メガビット/秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=ServerConfig.error_status)
+    parser.add_argument("--no-etag", action="store_true", help="ETag/Last-Modifiedを付けない")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = ServerConfig(
+        bulk_series=args.series,
+        delta_series=args.delta_series,
+        points_mean=args.points_mean,
+        points_sigma=args.points_sigma,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        bandwidth=args.bandwidth_mbps * 1e6 / 8 if args.bandwidth_mbps else None,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        etag=not args.no_etag,
+        gzip=args.gzip,
+        seed=args.seed,
+    )
+    server = StandInApiServer(config, host=args.host, port=args.port)
+    for name, value in server.env().items():
+        print(f"export {name}={value}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
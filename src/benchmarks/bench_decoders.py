@@ -0,0 +1,121 @@
+"""
+JSONデコーダのバックエンドごとの計測。
+合成したbulk dataのレスポンス（benchmarks.synthetic）を、バックエンド×検証の厳しさの組ごとに
+本文 → XYApiColumnsまでデコードし、時間・スループット・割り当てのピークを比べる。
+逐次デコード（infra.xy_stream_decoder）も同じ本文で測る。
+
+    make bench-decoders BENCH_ARGS="--series 10000,100000"
+    PYTHONPATH=src python -m benchmarks.bench_decoders --series 10000 --output result.json   # リポジトリのルートで実行
+
+各組の結果は従来の経路（json/full）の結果と一致することを確かめ、その経路に対する速度比も表示する。
+"""
+import argparse
+import json
+import sys
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.bench_pipeline import CHUNK_SIZE, _stream_decode, environment
+from benchmarks.measure import measure
+from benchmarks.synthetic import PayloadSpec, make_payload
+from infra.api_client import XYApiColumns
+from infra.xy_decoders import Strictness, XYDecoder, available_backends, orjson
+
+BASELINE = "json/full"
+STREAM = "stream"
+
+
+def decoders() -> Dict[str, Callable[[bytes], XYApiColumns]]:
+    """この環境で使える組（名前 → 本文をXYApiColumnsにする関数）"""
+    cases = {}
+    for backend in available_backends():
+        for strictness in Strictness:
+            cases[f"{backend}/{strictness.value}"] = XYDecoder(backend=backend, strictness=strictness).decode_columns
+    cases[STREAM] = _stream_decode
+    return cases
+
+
+def same_columns(a: XYApiColumns, b: XYApiColumns) -> bool:
+    return all(
+        np.array_equal(getattr(a, key), getattr(b, key)) for key in ("x", "x_offsets", "y", "y_offsets")
+    ) and all(
+        getattr(a, key) == getattr(b, key) for key in ("updated_at", "SID", "figure_id", "sample_id", "composition")
+    )
+
+
+def run(spec: PayloadSpec, repeat: int = 1, names: Optional[List[str]] = None) -> dict:
+    payload = make_payload(spec)
+    cases = decoders()
+    reference = cases[BASELINE](payload)
+    n_series = len(reference.SID)
+    n_points = int(reference.x_offsets[-1])
+    results = {}
+    for name in names or list(cases):
+        measured = measure(lambda _: cases[name](payload), repeat=repeat)
+        seconds = measured["seconds"]
+        results[name] = {
+            "seconds": seconds,
+            "peak_bytes": measured["peak_bytes"],
+            "bytes_per_s": len(payload) / seconds if seconds else None,
+            "series_per_s": n_series / seconds if seconds else None,
+            "points_per_s": n_points / seconds if seconds else None,
+            "matches_baseline": same_columns(measured["result"], reference),
+        }
+    return {
+        "spec": asdict(spec),
+        "series": n_series,
+        "points": n_points,
+        "input_bytes": len(payload),
+        "decoders": results,
+    }
+
+
+def format_run(run: dict) -> List[str]:
+    lines = [f"series {run['series']}, points {run['points']}, input {run['input_bytes'] / 1e6:.1f} MB"]
+    baseline = run["decoders"].get(BASELINE)
+    for name, result in run["decoders"].items():
+        speedup = f"{baseline['seconds'] / result['seconds']:5.2f}x" if baseline and result["seconds"] else "    -"
+        mismatch = "" if result["matches_baseline"] else "  MISMATCH"
+        lines.append(
+            f"{name:>16}: {result['seconds'] * 1000:9.1f} ms, {result['bytes_per_s'] / 1e6:7.1f} MB/s, "
+            f"{result['points_per_s'] / 1e6:7.2f} Mpoints/s, peak {result['peak_bytes'] / 1e6:7.1f} MB, {speedup}{mismatch}"
+        )
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", default="10000", help="bulk dataの系列数（カンマ区切りで複数）")
+    parser.add_argument("--points-mean", type=float, default=20.0, help="系列あたりの平均点数")
+    parser.add_argument("--points-sigma", type=float, default=1.0, help="点数の対数正規分布の広がり（0で一定）")
+    parser.add_argument("--repeat", type=int, default=1, help="時間を計る回数（最小値を採る）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--decoders", help="計測する組（カンマ区切り。既定: 使えるものすべて）")
+    parser.add_argument("--output", help="結果のJSONの出力先（既定: bench-decoders-<commit>.json）")
+    args = parser.parse_args(argv)
+
+    available = list(decoders())
+    names = [s for s in args.decoders.split(",") if s] if args.decoders else available
+    unknown = set(names) - set(available)
+    if unknown:
+        parser.error(f"unknown or unavailable decoders: {', '.join(sorted(unknown))}")
+    env = environment()
+    env["orjson"] = orjson.__version__ if orjson is not None else None
+    env["stream_chunk_size"] = CHUNK_SIZE
+    result: Dict[str, object] = {"environment": env, "runs": []}
+    for n_series in (int(s) for s in args.series.split(",")):
+        spec = PayloadSpec(n_series=n_series, points_mean=args.points_mean, points_sigma=args.points_sigma, seed=args.seed)
+        run_result = run(spec, repeat=args.repeat, names=names)
+        result["runs"].append(run_result)
+        print("\n".join(format_run(run_result)))
+    output = args.output or f"bench-decoders-{env['commit'] or 'unknown'}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"wrote {output}")
+    return result
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,214 @@
+"""
+パイプラインの段階ごとの計測。
+合成したbulk data・deltaのレスポンス（benchmarks.synthetic）をアプリと同じ順に処理し、
+段階ごとの時間・スループット・割り当てのピークを測ってJSONファイルに書き出す。
+
+    make bench BENCH_ARGS="--series 10000,100000,1000000"
+    PYTHONPATH=src python -m benchmarks.bench_pipeline --series 10000 --output result.json   # リポジトリのルートで実行
+
+--baselineに以前の結果のJSONを渡すと、同じ系列数の実行どうしで段階ごとの時間の比（今回/以前）も表示する。
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import bokeh
+import numpy as np
+import pydantic
+from bokeh.embed import json_item
+
+from application.graph_data_service import GraphDataService
+from benchmarks.measure import measure
+from benchmarks.synthetic import PayloadSpec, make_payload
+from domain.graph import Axis, AxisRange, AxisType, DateHighlightCondition, XYSeries
+from domain.timestamps import parse_iso8601
+from infra.api_client import XYApiColumns, XYApiResponse
+from infra.graph_repository import _to_xy_series
+from infra.xy_stream_decoder import XYStreamDecoder
+from presentation.bokeh_graph_creator import BokehGraphCreator
+from presentation.wire_format import WireFormat
+
+# 段階（処理順）。decode〜convertはbulk data・deltaの両方を処理した合計
+STAGES = (
+    "decode",         # JSON本文 → dict（json.loads）
+    "validate",       # dict → XYApiResponse（pydanticの検証）
+    "stream_decode",  # JSON本文 → XYApiColumns（bulk data APIの逐次デコード。decode・validateの代わりに使われる）
+    "convert",        # XYApiResponse → XYSeries（XYApiColumns.from_response + _to_xy_series。updated_atのパースを含む）
+    "normalize",      # updated_at → UTCの時刻列（parse_iso8601のみ）
+    "merge",          # bulk data + delta → 連結したXYSeries
+    "highlight",      # 期間のハイライト条件の適用（索引の構築を含む）とDTO化
+    "cds",            # DTO → ColumnDataSource
+    "serialize",      # 図 → JSON（json_item + json.dumps）
+)
+# 入力バイト数あたりのスループットも出す段階
+BYTE_STAGES = ("decode", "stream_decode")
+CHUNK_SIZE = 1 << 16
+
+X_AXIS = Axis(property="x", axis_type=AxisType.LINEAR, unit="", axis_range=AxisRange(0, 1000))
+Y_AXIS = Axis(property="y", axis_type=AxisType.LOGARITHMIC, unit="", axis_range=AxisRange(1e-3, 1e3))
+
+
+def _stream_decode(payload: bytes) -> XYApiColumns:
+    decoder = XYStreamDecoder()
+    for start in range(0, len(payload), CHUNK_SIZE):
+        decoder.feed(payload[start:start + CHUNK_SIZE])
+    return decoder.close()
+
+
+def _highlight_condition(spec: PayloadSpec, delta_spec: PayloadSpec) -> DateHighlightCondition:
+    """bulk dataの期間の最後の1割とdeltaをハイライトする条件"""
+    start = spec.updated_at_to - (spec.updated_at_to - spec.updated_at_from) // 10
+    def day(seconds: int) -> str:
+        return datetime.fromtimestamp(seconds, timezone.utc).date().isoformat()
+    return DateHighlightCondition(date_from=day(start), date_to=day(delta_spec.updated_at_to))
+
+
+def run(spec: PayloadSpec, delta_series: int, repeat: int = 1, stages=STAGES) -> dict:
+    """bulk data（spec）とdelta（delta_series系列）の1組について、各段階を計測する"""
+    delta_spec = spec.delta(delta_series)
+    payloads = [make_payload(spec), make_payload(delta_spec)]
+    input_bytes = sum(map(len, payloads))
+    # 各段階の入力は前の段階の出力（計測の外で1回だけ作る）
+    decoded = [json.loads(p)["data"] for p in payloads]
+    responses = [XYApiResponse(**d) for d in decoded]
+    columns = [XYApiColumns.from_response(r) for r in responses]
+    parts = [_to_xy_series(c) for c in columns]
+    merged = XYSeries.concat(parts)
+    n_series, n_points = len(merged), merged.n_points
+
+    service = GraphDataService()
+    creator = BokehGraphCreator(graph_data_service=service, wire_format=WireFormat())
+    condition = _highlight_condition(spec, delta_spec)
+
+    def fresh_merged():
+        # 索引・マスクのメモが効かない、取得直後の状態の連結済み系列
+        return XYSeries.concat([_to_xy_series(c) for c in columns])
+
+    def fresh_dto():
+        return service.highlight(merged, condition)
+
+    def fresh_figure():
+        return creator.create_bokeh_figure_from_dto(fresh_dto(), X_AXIS, Y_AXIS)
+
+    cases = {
+        "decode": (lambda _: [json.loads(p) for p in payloads], None),
+        "validate": (lambda _: [XYApiResponse(**d) for d in decoded], None),
+        "stream_decode": (lambda _: [_stream_decode(p) for p in payloads], None),
+        "convert": (lambda _: [_to_xy_series(XYApiColumns.from_response(r)) for r in responses], None),
+        "normalize": (lambda _: [parse_iso8601(r.updated_at) for r in responses], None),
+        "merge": (lambda _: XYSeries.concat(parts), None),
+        "highlight": (lambda series: service.highlight(series, condition), fresh_merged),
+        "cds": (lambda dto: creator.create_bokeh_data_source(dto, x_axis=X_AXIS, y_axis=Y_AXIS), fresh_dto),
+        "serialize": (lambda fig: json.dumps(json_item(fig)), fresh_figure),
+    }
+    results = {}
+    for name in stages:
+        func, setup = cases[name]
+        measured = measure(func, setup, repeat=repeat)
+        seconds = measured["seconds"]
+        stage = {
+            "seconds": seconds,
+            "peak_bytes": measured["peak_bytes"],
+            "series_per_s": n_series / seconds if seconds else None,
+            "points_per_s": n_points / seconds if seconds else None,
+        }
+        if name in BYTE_STAGES:
+            stage["bytes_per_s"] = input_bytes / seconds if seconds else None
+        if name == "serialize":
+            stage["output_bytes"] = len(measured["result"])
+        results[name] = stage
+    return {
+        "spec": asdict(spec),
+        "delta_series": delta_series,
+        "series": n_series,
+        "points": n_points,
+        "input_bytes": input_bytes,
+        "stages": results,
+    }
+
+
+def environment() -> dict:
+    """結果を比べるときに必要な実行環境の情報"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pydantic": pydantic.VERSION,
+        "bokeh": bokeh.__version__,
+    }
+
+
+def compare(result: dict, baseline: dict) -> List[str]:
+    """同じ系列数の実行どうしで、段階ごとの時間の比（今回/以前）を表にする"""
+    lines = []
+    previous = {run["spec"]["n_series"]: run for run in baseline.get("runs", [])}
+    for run in result["runs"]:
+        base = previous.get(run["spec"]["n_series"])
+        if base is None:
+            continue
+        lines.append(f"series {run['spec']['n_series']}: vs {baseline.get('environment', {}).get('commit')}")
+        for name, stage in run["stages"].items():
+            old = base["stages"].get(name)
+            if old and old["seconds"]:
+                lines.append(f"{name:>14}: {stage['seconds'] / old['seconds']:6.2f}x time, {stage['peak_bytes'] / max(old['peak_bytes'], 1):6.2f}x peak")
+    return lines
+
+
+def format_run(run: dict) -> List[str]:
+    lines = [f"series {run['series']} ({run['delta_series']} delta), points {run['points']}, input {run['input_bytes'] / 1e6:.1f} MB"]
+    for name, stage in run["stages"].items():
+        lines.append(
+            f"{name:>14}: {stage['seconds'] * 1000:9.1f} ms, {stage['points_per_s'] / 1e6:8.2f} Mpoints/s, "
+            f"peak {stage['peak_bytes'] / 1e6:7.1f} MB"
+        )
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", default="10000", help="bulk dataの系列数（カンマ区切りで複数）")
+    parser.add_argument("--points-mean", type=float, default=20.0, help="系列あたりの平均点数")
+    parser.add_argument("--points-sigma", type=float, default=1.0, help="点数の対数正規分布の広がり（0で一定）")
+    parser.add_argument("--delta-fraction", type=float, default=0.01, help="bulk dataに対するdeltaの系列数の比")
+    parser.add_argument("--repeat", type=int, default=1, help="時間を計る回数（最小値を採る）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default=",".join(STAGES), help="計測する段階（カンマ区切り）")
+    parser.add_argument("--output", help="結果のJSONの出力先（既定: bench-pipeline-<commit>.json）")
+    parser.add_argument("--baseline", help="比較する以前の結果のJSON")
+    args = parser.parse_args(argv)
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    result: Dict[str, object] = {"environment": environment(), "runs": []}
+    for n_series in (int(s) for s in args.series.split(",")):
+        spec = PayloadSpec(n_series=n_series, points_mean=args.points_mean, points_sigma=args.points_sigma, seed=args.seed)
+        run_result = run(spec, max(1, int(n_series * args.delta_fraction)), repeat=args.repeat, stages=stages)
+        result["runs"].append(run_result)
+        print("\n".join(format_run(run_result)))
+    output = args.output or f"bench-pipeline-{result['environment']['commit'] or 'unknown'}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"wrote {output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print("\n".join(compare(result, json.load(f))))
+    return result
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,45 @@
+"""
+updated_at列の正規化の計測。
+以前の1件ずつの変換（正規表現 + fromisoformat + astimezone + strftime）と、
+取り込み時の一括パース（domain.timestamps.parse_iso8601）の時間と割り当てメモリを比べる。
+
+    PYTHONPATH=src python -m benchmarks.bench_timestamps [件数]   # リポジトリのルートで実行
+"""
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.measure import measure
+from benchmarks.synthetic import make_updated_at
+from domain.timestamps import parse_iso8601
+
+JST = timezone(timedelta(hours=9))
+
+
+def legacy_convert_utc_to_jst(updated_at: str) -> str:
+    """以前のGraphDataService._convert_utc_to_jst"""
+    s = updated_at
+    if s.endswith('Z'):
+        s = s[:-1] + '+00:00'
+    if not re.search(r'[+-]\d{2}:\d{2}$', s):
+        dt = datetime.fromisoformat(s).replace(tzinfo=timezone.utc)
+    else:
+        dt = datetime.fromisoformat(s)
+    return dt.astimezone(JST).strftime('%Y-%m-%dT%H:%M:%S%z')
+
+
+def run(n: int = 100_000) -> dict:
+    values = make_updated_at(n)
+    return {
+        "records": n,
+        "legacy_per_record": measure(lambda _: [legacy_convert_utc_to_jst(u) for u in values]),
+        "vectorized": measure(lambda _: parse_iso8601(values)),
+    }
+
+
+if __name__ == "__main__":
+    result = run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
+    print(f"records: {result['records']}")
+    for name in ("legacy_per_record", "vectorized"):
+        r = result[name]
+        print(f"{name:>18}: {r['seconds'] * 1000:8.1f} ms, peak {r['peak_bytes'] / 1e6:6.1f} MB")
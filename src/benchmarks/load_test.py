@@ -0,0 +1,299 @@
+"""
+material_pageの負荷試験。
+N個の模擬セッションが並行に、素材の選択・グラフの切り替え・軸の変更・ハイライト期間の変更を繰り返し、
+ページ（material_page.main）を1回実行するごとの時間を計る。上流のAPIはローカルのスタンドイン（benchmarks.api_server）にする。
+1つのプロセスが1つのレプリカにあたり（st.cache_resource・SeriesStoreはプロセス内で共有される）、
+--replicasを2以上にすると別プロセスのレプリカを並べて同じスタンドインに向ける。
+
+    make load-test LOAD_TEST_ARGS="--sessions 8 --steps 20"
+    PYTHONPATH=src:. python -m benchmarks.load_test --sessions 8 --steps 20 --output load.json   # リポジトリのルートで実行
+
+結果は操作の種類ごとの時間の分位点・スループット・上流へのリクエスト数・RSSの増加をJSONに書き出す。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.api_server import ServerConfig, StandInApiServer
+
+# ページを1回実行するスクリプト（AppTestは関数のソースを実行するので、素材は文字列に埋め込む）
+PAGE_SCRIPT = """
+import presentation.material_page as material_page
+from domain.material_type import MaterialType
+material_page.main(MaterialType({material!r}))
+"""
+# 操作の種類と選ばれる重み（最初の操作は必ずopen）
+ACTIONS = {"open": 1, "switch_graph": 3, "tweak_axes": 4, "toggle_scale": 2, "change_highlight": 3}
+# 合成データのupdated_atが入る範囲（ハイライト期間はこの中から選ぶ）
+HIGHLIGHT_FROM = date(2020, 9, 1)
+HIGHLIGHT_TO = date(2025, 6, 1)
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass(frozen=True)
+class LoadTestConfig:
+    sessions: int = 4
+    steps: int = 10             # セッションあたりの操作数
+    think_time: float = 0.0     # 操作の間の待ち時間（秒）
+    materials: tuple = ("thermoelectric", "battery", "magnetic")
+    timeout: float = 120.0      # ページ1回の実行の上限（秒）
+    seed: int = 0
+
+
+class SimulatedSession:
+    """
+    1人の利用者の操作を再現するセッション。streamlit.testing（AppTest）でページのスクリプトを実行するので、
+    ウィジェットの状態・キャッシュの効き方は実際のセッションと同じになる（描画結果はブラウザに送らない）。
+    """
+
+    def __init__(self, config: LoadTestConfig, rng: random.Random):
+        self.config = config
+        self.rng = rng
+        self.app = None
+        self.material = None
+
+    def step(self, action: str) -> None:
+        getattr(self, action)()
+
+    def open(self) -> None:
+        from streamlit.testing.v1 import AppTest
+        self.material = self.rng.choice(self.config.materials)
+        self.app = AppTest.from_string(PAGE_SCRIPT.format(material=self.material), default_timeout=self.config.timeout)
+        self._run(self.app)
+
+    def switch_graph(self) -> None:
+        from domain.graph_config_factory import get_graph_configs
+        from domain.material_type import MaterialType
+        config = self.rng.choice(get_graph_configs(MaterialType(self.material)))
+        # 選択肢はタプルなので、表示文字列ではなく値で選ぶ
+        self._run(self.app.selectbox(key="select_graph").set_value((config.x_axis.property, config.y_axis.property)))
+
+    def tweak_axes(self) -> None:
+        prop_x, prop_y = self.app.selectbox(key="select_graph").value
+        name = self.rng.choice(["x_min", "x_max", "y_min", "y_max"])
+        widget = self.app.number_input(key=f"{name}_{prop_x}_{prop_y}")
+        value = widget.value
+        # 表示範囲を広げたり狭めたりする（0付近では加算で動かす）
+        scale = self.rng.choice([0.5, 0.8, 1.25, 2.0])
+        self._run(widget.set_value(value * scale if value else scale))
+
+    def toggle_scale(self) -> None:
+        label = self.rng.choice(["X Axis Scale", "Y Axis Scale"])
+        widget = next(w for w in self.app.selectbox if w.label == label)
+        self._run(widget.set_value("log" if widget.value == "linear" else "linear"))
+
+    def change_highlight(self) -> None:
+        span = (HIGHLIGHT_TO - HIGHLIGHT_FROM).days
+        start = HIGHLIGHT_FROM + timedelta(days=self.rng.randrange(span))
+        end = min(start + timedelta(days=self.rng.choice([1, 7, 30, 365])), HIGHLIGHT_TO)
+        self.app.date_input(key="main_date_from").set_value(start)
+        self._run(self.app.date_input(key="main_date_to").set_value(end))
+
+    def _run(self, target) -> None:
+        """ページ（ウィジェットの場合は値を変えたページ）を実行する"""
+        app = target.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+    def script(self) -> List[str]:
+        """このセッションの操作の並び（最初はページを開く）"""
+        names = [name for name in ACTIONS if name != "open"]
+        weights = [ACTIONS[name] for name in names]
+        actions = ["open"]
+        while len(actions) < self.config.steps:
+            action = self.rng.choices(names + ["open"], weights + [ACTIONS["open"]])[0]
+            actions.append(action)
+        return actions
+
+
+def rss_bytes() -> int:
+    """現在のRSS（Linux以外ではピークのRSSで代用する）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト、Linuxはキロバイト
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    if not seconds:
+        return {"count": 0}
+    values = np.asarray(seconds) * 1000
+    summary = {"count": len(values), "mean_ms": float(values.mean()), "max_ms": float(values.max())}
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = float(np.percentile(values, p))
+    return summary
+
+
+def run_replica(config: LoadTestConfig, env: Optional[Dict[str, str]] = None, replica: int = 0) -> dict:
+    """このプロセスを1つのレプリカとして、config.sessions個のセッションを並行に動かす（replicaは操作の乱数をずらす番号）"""
+    os.environ.update(env or {})
+    # streamlitの「ScriptRunContextがない」などの警告で出力が埋まらないようにする
+    from streamlit.logger import set_log_level
+    set_log_level("error")
+    # ページのモジュールは先に読み込んでおく（セッションのスレッドが同時に初回のimportをしないようにする）
+    import presentation.material_page  # noqa: F401
+    rss_start = rss_bytes()
+    timings: Dict[str, List[float]] = {action: [] for action in ACTIONS}
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def session_main(index: int) -> None:
+        session = SimulatedSession(config, random.Random((config.seed * 10_007 + replica) * 10_007 + index))
+        for action in session.script():
+            if session.app is None and action != "open":
+                action = "open"
+            started = time.perf_counter()
+            try:
+                session.step(action)
+            except Exception as e:  # 失敗も記録して次の操作へ進む（ページを開き直す）
+                with lock:
+                    errors.append(f"{action}: {e}")
+                session.app = None
+                continue
+            with lock:
+                timings[action].append(time.perf_counter() - started)
+            if config.think_time:
+                time.sleep(config.think_time)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session_main, args=(i,), name=f"session-{i}") for i in range(config.sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+    rss_end = rss_bytes()
+    all_timings = [t for values in timings.values() for t in values]
+    return {
+        "replica": replica,
+        "pid": os.getpid(),
+        "sessions": config.sessions,
+        "steps": len(all_timings),
+        "errors": len(errors),
+        "error_samples": errors[:10],
+        "duration_s": duration,
+        "throughput_steps_per_s": len(all_timings) / duration if duration else None,
+        "latency": {"all": latency_summary(all_timings), **{a: latency_summary(v) for a, v in timings.items()}},
+        "rss": {
+            "start_bytes": rss_start,
+            "end_bytes": rss_end,
+            "peak_bytes": peak_rss_bytes(),
+            "growth_bytes": rss_end - rss_start,
+            "growth_per_session_bytes": (rss_end - rss_start) / max(config.sessions, 1),
+        },
+    }
+
+
+def run(config: LoadTestConfig, server_config: ServerConfig, replicas: int = 1) -> dict:
+    """スタンドインを起動し、replicas個のレプリカで負荷をかけた結果を返す"""
+    with StandInApiServer(server_config) as server:
+        env = server.env()
+        if replicas <= 1:
+            saved = {name: os.environ.get(name) for name in env}
+            try:
+                results = [run_replica(config, env)]
+            finally:
+                # 呼び出し元のプロセスの環境変数を元に戻す
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+        else:
+            # レプリカごとにキャッシュを持つよう、別プロセス（spawn）で動かす
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(replicas) as pool:
+                results = pool.starmap(run_replica, [(config, env, i) for i in range(replicas)])
+        upstream = server.stats()
+    steps = sum(r["steps"] for r in results)
+    duration = max(r["duration_s"] for r in results)
+    return {
+        "config": asdict(config),
+        "server": asdict(server_config),
+        "replicas": results,
+        "steps": steps,
+        "throughput_steps_per_s": steps / duration if duration else None,
+        "upstream": upstream,
+        "upstream_requests_per_step": upstream["requests"] / steps if steps else None,
+    }
+
+
+def format_result(result: dict) -> List[str]:
+    lines = []
+    for i, replica in enumerate(result["replicas"]):
+        lines.append(
+            f"replica {i}: {replica['sessions']} sessions, {replica['steps']} steps, {replica['errors']} errors, "
+            f"{replica['throughput_steps_per_s']:.2f} steps/s, RSS +{replica['rss']['growth_bytes'] / 1e6:.1f} MB"
+        )
+        for action, summary in replica["latency"].items():
+            if summary["count"]:
+                lines.append(
+                    f"{action:>16}: n={summary['count']:4d}  p50 {summary['p50_ms']:8.1f} ms  "
+                    f"p90 {summary['p90_ms']:8.1f} ms  p99 {summary['p99_ms']:8.1f} ms"
+                )
+    upstream = result["upstream"]
+    lines.append(
+        f"upstream: {upstream['requests']} requests ({upstream['bulk_requests']} bulk, {upstream['xy_data_requests']} xy_data, "
+        f"{upstream['not_modified']} not modified), {upstream['bytes_sent'] / 1e6:.1f} MB"
+    )
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=LoadTestConfig.sessions, help="レプリカあたりの同時セッション数")
+    parser.add_argument("--steps", type=int, default=LoadTestConfig.steps, help="セッションあたりの操作数")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="操作の間の待ち時間")
+    parser.add_argument("--replicas", type=int, default=1, help="レプリカ（プロセス）数")
+    parser.add_argument("--materials", default=",".join(LoadTestConfig.materials))
+    parser.add_argument("--series", type=int, default=ServerConfig.bulk_series, help="スタンドインのbulk dataの系列数")
+    parser.add_argument("--delta-series", type=int, default=ServerConfig.delta_series)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="スタンドインの応答遅延")
+    parser.add_argument("--bandwidth-mbps", type=float, help="スタンドインの送信速度の上限")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="結果のJSONの出力先")
+    args = parser.parse_args(argv)
+
+    config = LoadTestConfig(
+        sessions=args.sessions,
+        steps=args.steps,
+        think_time=args.think_ms / 1000,
+        materials=tuple(m for m in args.materials.split(",") if m),
+        seed=args.seed,
+    )
+    server_config = ServerConfig(
+        bulk_series=args.series,
+        delta_series=args.delta_series,
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mbps * 1e6 / 8 if args.bandwidth_mbps else None,
+        seed=args.seed,
+    )
+    result = run(config, server_config, replicas=args.replicas)
+    print("\n".join(format_result(result)))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"wrote {args.output}")
+    return result
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
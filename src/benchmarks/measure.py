@@ -0,0 +1,28 @@
+import time
+import tracemalloc
+from typing import Any, Callable, Optional
+
+
+def measure(func: Callable[[Any], Any], setup: Optional[Callable[[], Any]] = None, repeat: int = 1, warmup: int = 1) -> dict:
+    """
+    funcの時間と割り当てのピークを計る。setupがあれば毎回の実行前に（計測の外で）呼び、その戻り値をfuncに渡す。
+    時間は計測しないwarmup回の実行（初回だけの遅延importなどを除くため）の後、tracemallocなしでrepeat回実行した最小値、
+    割り当てのピークは別の1回の実行で計る（tracemallocは処理を遅くするため）。
+    """
+    for _ in range(warmup):
+        func(setup() if setup is not None else None)
+    seconds = float("inf")
+    result = None
+    for _ in range(max(repeat, 1)):
+        arg = setup() if setup is not None else None
+        started = time.perf_counter()
+        result = func(arg)
+        seconds = min(seconds, time.perf_counter() - started)
+    arg = setup() if setup is not None else None
+    tracemalloc.start()
+    try:
+        func(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak, "result": result}
@@ -0,0 +1,101 @@
+"""
+計測用の合成データ。
+bulk data API・Starrydata2 APIと同じ形のレスポンス（{"data": {"x": [[...]], "y": [[...]], "SID": [...], ...}}）を、
+シードから決定的に作る。系列ごとの点数は対数正規分布（平均points_mean, 広がりpoints_sigma）に従う。
+"""
+import json
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 組成の候補（一部の系列はNoneにする）
+COMPOSITIONS = ("Bi2Te3", "Bi0.5Sb1.5Te3", "PbTe", "SnSe", "Mg3Sb2", "CoSb3", "Cu2Se", "GeTe", "SiGe", "ZrNiSn")
+# 1つのSIDあたりの図の数、1つの図あたりの試料の数
+FIGURES_PER_SID = 4
+SAMPLES_PER_FIGURE = 3
+# updated_atの範囲（UTCのエポック秒）
+UPDATED_AT_FROM = 1_600_000_000
+UPDATED_AT_TO = 1_750_000_000
+
+
+@dataclass(frozen=True)
+class PayloadSpec:
+    """合成レスポンスの設定"""
+    n_series: int
+    points_mean: float = 20.0  # 系列あたりの平均点数
+    points_sigma: float = 1.0  # 点数の対数正規分布の広がり（0なら全系列がpoints_mean点）
+    max_points: int = 5_000
+    composition_null_rate: float = 0.05
+    first_series: int = 0      # SID・figure_id・sample_idの通し番号の開始位置
+    updated_at_from: int = UPDATED_AT_FROM
+    updated_at_to: int = UPDATED_AT_TO
+    seed: int = 0
+
+    def delta(self, n_series: int, overlap: float = 0.1, updated_at_from: int = UPDATED_AT_TO) -> "PayloadSpec":
+        """
+        このbulk dataに対するdeltaの設定。
+        先頭のoverlapの割合はbulk dataの末尾の系列を取り直したもの（同じSID・figure_id・sample_id）で、残りは新しい系列。
+        """
+        first = self.first_series + self.n_series - int(n_series * overlap)
+        return replace(
+            self,
+            n_series=n_series,
+            first_series=first,
+            updated_at_from=updated_at_from,
+            updated_at_to=updated_at_from + 24 * 60 * 60,
+            seed=self.seed + 1,
+        )
+
+
+def point_counts(spec: PayloadSpec) -> np.ndarray:
+    """系列ごとの点数（1〜max_points）"""
+    rng = np.random.default_rng(spec.seed)
+    if spec.points_sigma <= 0:
+        counts = np.full(spec.n_series, spec.points_mean)
+    else:
+        # 対数正規分布の平均がpoints_meanになるようにmuをずらす
+        mu = np.log(spec.points_mean) - spec.points_sigma ** 2 / 2
+        counts = rng.lognormal(mu, spec.points_sigma, spec.n_series)
+    return np.clip(np.rint(counts), 1, spec.max_points).astype(np.int64)
+
+
+def make_updated_at(n: int, seed: int = 0, start: int = UPDATED_AT_FROM, end: int = UPDATED_AT_TO) -> List[str]:
+    """Starrydata2の形式（ミリ秒・Z付き）のupdated_atをn件作る"""
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(start, end, n)
+    millis = rng.integers(0, 1000, n)
+    base = np.datetime_as_string(seconds.astype("datetime64[s]"))
+    return [f"{b}.{m:03d}Z" for b, m in zip(base.tolist(), millis.tolist())]
+
+
+def make_data(spec: PayloadSpec) -> Dict[str, list]:
+    """レスポンスのdata部分（XYApiResponseのフィールドの辞書）"""
+    counts = point_counts(spec)
+    rng = np.random.default_rng(spec.seed + 1_000_003)
+    n_points = int(counts.sum())
+    # xは系列ごとに昇順の測定点、yは正の値（対数軸でも描ける）を小数4桁で持つ
+    x = rng.uniform(0, 1000, n_points)
+    x = np.round(x[np.lexsort((x, np.repeat(np.arange(spec.n_series), counts)))], 4)
+    y = np.round(rng.lognormal(0, 2, n_points), 4)
+    bounds = np.r_[0, np.cumsum(counts)].tolist()
+    serial = np.arange(spec.first_series, spec.first_series + spec.n_series)
+    figure = serial // SAMPLES_PER_FIGURE
+    sid = figure // FIGURES_PER_SID
+    compositions = np.asarray(COMPOSITIONS, dtype=object)[rng.integers(0, len(COMPOSITIONS), spec.n_series)]
+    compositions[rng.random(spec.n_series) < spec.composition_null_rate] = None
+    x_list, y_list = x.tolist(), y.tolist()
+    return {
+        "x": [x_list[a:b] for a, b in zip(bounds[:-1], bounds[1:])],
+        "y": [y_list[a:b] for a, b in zip(bounds[:-1], bounds[1:])],
+        "updated_at": make_updated_at(spec.n_series, spec.seed, spec.updated_at_from, spec.updated_at_to),
+        "SID": [f"{s:06d}" for s in sid.tolist()],
+        "figure_id": [str(f) for f in figure.tolist()],
+        "sample_id": [str(s) for s in serial.tolist()],
+        "composition": compositions.tolist(),
+    }
+
+
+def make_payload(spec: PayloadSpec, data: Optional[Dict[str, list]] = None) -> bytes:
+    """レスポンス本文（UTF-8のJSON）"""
+    return json.dumps({"data": data if data is not None else make_data(spec)}, separators=(",", ":")).encode("utf-8")
@@ -1,7 +1,19 @@
+import dataclasses
+import itertools
+import re
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Dict, Any, FrozenSet, Optional, Iterable, Iterator, Sequence, Tuple, Union, overload
 from enum import Enum
 from abc import ABC, abstractmethod
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from domain.series_index import MAX_LAYERS, SeriesIndex
+from domain.timestamps import parse_iso8601
 
 class AxisType(Enum):
     """軸のスケール種別を表す列挙型"""
@@ -43,9 +55,345 @@ class  XYPoints:
     sample_id: str   # 追加: 系列ごとのsample_id
     composition: Optional[str] # 追加: 系列ごとのcomposition（nullableに変更）
 
-@dataclass(frozen=True)
+def _object_array(values: Iterable[Any]) -> np.ndarray:
+    """文字列などを要素に持つ1次元のobject配列を作る"""
+    values = list(values)
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    arr.setflags(write=False)
+    return arr
+
+
+class XYPointsView(Sequence[XYPoints]):
+    """XYSeriesを旧来のList[XYPoints]として扱うための遅延ビュー（アクセスされた系列だけXYPointsを生成する）"""
+    def __init__(self, series: "XYSeries"):
+        self._series = series
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    @overload
+    def __getitem__(self, index: int) -> XYPoints: ...
+    @overload
+    def __getitem__(self, index: slice) -> List[XYPoints]: ...
+    def __getitem__(self, index: Union[int, slice]) -> Union[XYPoints, List[XYPoints]]:
+        if isinstance(index, slice):
+            return [self._series.points_at(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("XYSeries index out of range")
+        return self._series.points_at(index)
+
+    def __iter__(self) -> Iterator[XYPoints]:
+        for i in range(len(self)):
+            yield self._series.points_at(i)
+
+
+# 系列ごとのメタデータ列
+METADATA_COLUMNS = ("updated_at", "sid", "figure_id", "sample_id", "composition")
+
+# XYSeriesの内容を識別するversionの採番（ハイライトのマスクのメモ化に使う）
+_series_versions = itertools.count(1)
+
+
 class XYSeries:
-    data: List[XYPoints]
+    """
+    XYデータ系列の集合（列指向）
+    全系列の点をfloat64のx/y配列に連続して格納し、offsets（長さ=系列数+1）で系列の境界を表す。
+    系列ごとのメタデータ（updated_at, sid, figure_id, sample_id, composition）は系列数と同じ長さの並列配列で持つ。
+    旧来のXYPointsによるAPIは data プロパティから遅延ビューとして利用できる。
+    """
+    def __init__(self, data: Optional[Iterable[XYPoints]] = None):
+        points_list = list(data) if data is not None else []
+        lengths = np.fromiter((len(p.data) for p in points_list), dtype=np.int64, count=len(points_list))
+        offsets = np.zeros(len(points_list) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        total = int(offsets[-1])
+        x = np.fromiter((pt.x for p in points_list for pt in p.data), dtype=np.float64, count=total)
+        y = np.fromiter((pt.y for p in points_list for pt in p.data), dtype=np.float64, count=total)
+        self._set_columns(
+            x=x,
+            y=y,
+            offsets=offsets,
+            updated_at=_object_array(p.updated_at for p in points_list),
+            sid=_object_array(p.sid for p in points_list),
+            figure_id=_object_array(p.figure_id for p in points_list),
+            sample_id=_object_array(p.sample_id for p in points_list),
+            composition=_object_array(p.composition for p in points_list),
+        )
+
+    def _set_columns(self, x, y, offsets, updated_at, sid, figure_id, sample_id, composition) -> None:
+        self.x: np.ndarray = _readonly(np.ascontiguousarray(x, dtype=np.float64))
+        self.y: np.ndarray = _readonly(np.ascontiguousarray(y, dtype=np.float64))
+        self.offsets: np.ndarray = _readonly(np.ascontiguousarray(offsets, dtype=np.int64))
+        # メタデータ列。Noneの列は_lazyの辞書符号から初回アクセス時に作る（from_encoded）
+        self._metadata: Dict[str, Optional[np.ndarray]] = {
+            name: None if column is None else _readonly(column)
+            for name, column in zip(METADATA_COLUMNS, (updated_at, sid, figure_id, sample_id, composition))
+        }
+        self._lazy: Dict[str, Tuple[Any, np.ndarray]] = {}
+        self._updated_at_epoch: Optional[np.ndarray] = None
+        self._encoded: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._index: Optional[SeriesIndex] = None
+        # 内容の識別子。列は読み取り専用なので、同じversionなら同じ内容
+        self.version: Any = next(_series_versions)
+        if len(self.offsets) == 0 or self.offsets[0] != 0 or self.offsets[-1] != len(self.x) or len(self.x) != len(self.y):
+            raise ValueError("offsets must start at 0 and end at the number of points, and x/y must have the same length")
+        n_series = len(self.offsets) - 1
+        for name, column in self._metadata.items():
+            if column is not None and len(column) != n_series:
+                raise ValueError(f"{name} must have one entry per series ({n_series}), got {len(column)}")
+
+    @property
+    def updated_at(self) -> np.ndarray:
+        return self._metadata_column("updated_at")
+
+    @property
+    def sid(self) -> np.ndarray:
+        return self._metadata_column("sid")
+
+    @property
+    def figure_id(self) -> np.ndarray:
+        return self._metadata_column("figure_id")
+
+    @property
+    def sample_id(self) -> np.ndarray:
+        return self._metadata_column("sample_id")
+
+    @property
+    def composition(self) -> np.ndarray:
+        return self._metadata_column("composition")
+
+    def _metadata_column(self, name: str) -> np.ndarray:
+        column = self._metadata[name]
+        if column is None:
+            # 複数のスレッドが同時に作っても結果は同じなので、ロックは取らない
+            values, codes = self.dictionary_encode(name)
+            column = self._metadata[name] = _readonly(values[codes])
+        return column
+
+    @classmethod
+    def from_columns(
+        cls,
+        x: np.ndarray,
+        y: np.ndarray,
+        offsets: np.ndarray,
+        updated_at: Iterable[str],
+        sid: Iterable[str],
+        figure_id: Iterable[str],
+        sample_id: Iterable[str],
+        composition: Iterable[Optional[str]],
+        updated_at_epoch: Optional[np.ndarray] = None,
+    ) -> "XYSeries":
+        """
+        列配列から直接XYSeriesを作る（点ごとのオブジェクトは生成しない）
+        updated_at_epochにパース済みのupdated_at（UTCのdatetime64[us]）を渡すと、それを時刻列として使う。
+        """
+        series = cls.__new__(cls)
+        series._set_columns(
+            x=x,
+            y=y,
+            offsets=offsets,
+            updated_at=_as_object_column(updated_at),
+            sid=_as_object_column(sid),
+            figure_id=_as_object_column(figure_id),
+            sample_id=_as_object_column(sample_id),
+            composition=_as_object_column(composition),
+        )
+        if updated_at_epoch is not None:
+            if len(updated_at_epoch) != len(series):
+                raise ValueError(f"updated_at_epoch must have one entry per series ({len(series)}), got {len(updated_at_epoch)}")
+            series._updated_at_epoch = _readonly(np.asarray(updated_at_epoch, dtype="datetime64[us]"))
+        return series
+
+    @classmethod
+    def from_encoded(
+        cls,
+        x: np.ndarray,
+        y: np.ndarray,
+        offsets: np.ndarray,
+        dictionaries: Dict[str, Tuple[Union[Sequence[Any], Callable[[], Sequence[Any]]], np.ndarray]],
+        updated_at_epoch: Optional[np.ndarray] = None,
+    ) -> "XYSeries":
+        """
+        辞書符号化されたメタデータ列（列名 → (値の一覧, 系列ごとの値の位置)）からXYSeriesを作る。
+        値の一覧と位置はdictionary_encodeの結果としてそのまま使うので、後から符号化し直さない。
+        値の一覧には一覧を返す関数も渡せる。関数は列が初めて必要になった時に呼び、
+        系列ごとのメタデータ列もその時に作るので、作るときの手間は系列数によらない。
+        """
+        n_series = len(offsets) - 1
+        for name in METADATA_COLUMNS:
+            codes = dictionaries[name][1]
+            if len(codes) != n_series:
+                raise ValueError(f"{name} must have one entry per series ({n_series}), got {len(codes)}")
+        series = cls.__new__(cls)
+        series._set_columns(x=x, y=y, offsets=offsets, **{name: None for name in METADATA_COLUMNS})
+        series._lazy = {name: (values, _readonly(np.asarray(codes))) for name, (values, codes) in dictionaries.items()}
+        if updated_at_epoch is not None:
+            if len(updated_at_epoch) != n_series:
+                raise ValueError(f"updated_at_epoch must have one entry per series ({n_series}), got {len(updated_at_epoch)}")
+            series._updated_at_epoch = _readonly(np.asarray(updated_at_epoch, dtype="datetime64[us]"))
+        return series
+
+    @classmethod
+    def concat(cls, series_list: Iterable["XYSeries"]) -> "XYSeries":
+        """複数のXYSeriesを系列方向に連結する（空でないものが1つだけなら、列をコピーせずにそれを返す）"""
+        series_list = [s for s in series_list if len(s)]
+        if not series_list:
+            return cls()
+        if len(series_list) == 1:
+            return series_list[0]
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for s in series_list:
+            offsets.append(s.offsets[1:] + base)
+            base += int(s.offsets[-1])
+        merged = cls.from_columns(
+            x=np.concatenate([s.x for s in series_list]),
+            y=np.concatenate([s.y for s in series_list]),
+            offsets=np.concatenate(offsets),
+            updated_at=np.concatenate([s.updated_at for s in series_list]),
+            sid=np.concatenate([s.sid for s in series_list]),
+            figure_id=np.concatenate([s.figure_id for s in series_list]),
+            sample_id=np.concatenate([s.sample_id for s in series_list]),
+            composition=np.concatenate([s.composition for s in series_list]),
+        )
+        # 連結元（キャッシュ済みのbulk dataなど）でパース済みの時刻列を再利用する
+        merged._updated_at_epoch = _readonly(np.concatenate([s.updated_at_epoch for s in series_list]))
+        # 同じ系列集合どうしの連結は同じversionにして、リクエストごとに連結し直してもメモ化が効くようにする
+        merged.version = ("concat",) + tuple(s.version for s in series_list)
+        # 連結元の索引を層として引き継ぐ（層が増えすぎたら連結後の系列で作り直す）
+        index = SeriesIndex.concat([s.index for s in series_list], [len(s) for s in series_list])
+        if index.n_layers <= MAX_LAYERS:
+            merged._index = index
+        return merged
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def n_points(self) -> int:
+        return len(self.x)
+
+    @property
+    def nbytes(self) -> int:
+        """数値列の合計バイト数（メタデータ文字列本体は含まない）"""
+        return int(self.x.nbytes + self.y.nbytes + self.offsets.nbytes)
+
+    @property
+    def updated_at_epoch(self) -> np.ndarray:
+        """updated_atをUTCのdatetime64[us]に変換した列（初回アクセス時に一括パースして保持する。空・不正な値はNaT）"""
+        if self._updated_at_epoch is None:
+            self._updated_at_epoch = _readonly(parse_iso8601(self.updated_at))
+        return self._updated_at_epoch
+
+    @property
+    def index(self) -> SeriesIndex:
+        """SID・figure_id・sample_id・updated_atの索引（各索引は初回の検索時に作る）"""
+        if self._index is None:
+            self._index = SeriesIndex.build(self)
+        return self._index
+
+    def dictionary_encode(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        メタデータ列（sid, figure_id, sample_id, compositionなど）を (値の一覧, 系列ごとの値の位置) に符号化する。
+        値ごとの判定を一覧に対して1回ずつ行い、位置で系列に展開するために使う（結果は列ごとに保持する）。
+        """
+        if name not in self._encoded and name in self._lazy:
+            values, codes = self._lazy[name]
+            self._encoded[name] = (_readonly(_as_object_column(values() if callable(values) else values)), codes)
+        if name not in self._encoded:
+            positions: Dict[Any, int] = {}
+            codes = np.fromiter(
+                (positions.setdefault(v, len(positions)) for v in getattr(self, name)),
+                dtype=np.int64,
+                count=len(self),
+            )
+            self._encoded[name] = (_readonly(_object_array(positions)), _readonly(codes))
+        return self._encoded[name]
+
+    @property
+    def data(self) -> XYPointsView:
+        """旧API互換: 系列をXYPointsとして遅延生成するビュー"""
+        return XYPointsView(self)
+
+    def lengths(self) -> np.ndarray:
+        """系列ごとの点数"""
+        return np.diff(self.offsets)
+
+    def series_index_per_point(self) -> np.ndarray:
+        """各点が属する系列の位置"""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.lengths())
+
+    def points_at(self, i: int) -> XYPoints:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return XYPoints(
+            data=[XYPoint(x=x, y=y) for x, y in zip(self.x[start:end].tolist(), self.y[start:end].tolist())],
+            updated_at=self.updated_at[i],
+            sid=self.sid[i],
+            figure_id=self.figure_id[i],
+            sample_id=self.sample_id[i],
+            composition=self.composition[i],
+        )
+
+    def take(self, indices: Union[Sequence[int], np.ndarray]) -> "XYSeries":
+        """指定した位置の系列をその順序で抜き出した新しいXYSeriesを返す"""
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = self.lengths()[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        point_index = np.repeat(self.offsets[:-1][indices] - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+        taken = XYSeries.from_columns(
+            x=self.x[point_index],
+            y=self.y[point_index],
+            offsets=offsets,
+            updated_at=self.updated_at[indices],
+            sid=self.sid[indices],
+            figure_id=self.figure_id[indices],
+            sample_id=self.sample_id[indices],
+            composition=self.composition[indices],
+        )
+        if self._updated_at_epoch is not None:
+            taken._updated_at_epoch = _readonly(self._updated_at_epoch[indices])
+        return taken
+
+    def select_points(self, mask: np.ndarray) -> "XYSeries":
+        """
+        点ごとの真偽値maskがTrueの点だけを残した新しいXYSeriesを返す。
+        系列は（点がなくなっても）すべて残すので、系列の位置とメタデータ・時刻列・索引はそのまま使える。
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if len(mask) != self.n_points:
+            raise ValueError(f"mask must have one entry per point ({self.n_points}), got {len(mask)}")
+        kept_before = np.zeros(len(mask) + 1, dtype=np.int64)
+        np.cumsum(mask, out=kept_before[1:])
+        selected = XYSeries.from_columns(
+            x=self.x[mask],
+            y=self.y[mask],
+            offsets=kept_before[self.offsets],
+            updated_at=self.updated_at,
+            sid=self.sid,
+            figure_id=self.figure_id,
+            sample_id=self.sample_id,
+            composition=self.composition,
+        )
+        # 系列単位の情報は変わらないので共有する
+        selected._updated_at_epoch = self._updated_at_epoch
+        selected._encoded = self._encoded
+        selected._lazy = self._lazy
+        selected._index = self._index
+        return selected
+
+
+def _as_object_column(values: Iterable[Any]) -> np.ndarray:
+    if isinstance(values, np.ndarray) and values.dtype == object and values.ndim == 1:
+        return values
+    return _object_array(values)
 
 
 @dataclass(frozen=False)
@@ -73,26 +421,178 @@ class GraphRepository(ABC):
         """指定されたプロパティと単位に基づいてグラフを取得する"""
         pass
 
+class AsyncGraphRepository(ABC):
+    """グラフデータのリポジトリインターフェース（非同期版）"""
+    @abstractmethod
+    async def get_graph_by_property(self, property_x: str, property_y: str) -> XYSeries:
+        """指定されたプロパティに基づいてグラフを取得する"""
+        pass
+
+    @abstractmethod
+    async def get_graph_by_property_and_unit(
+        self,
+        property_x: str,
+        property_y: str,
+        unit_x: str,
+        unit_y: str
+    ) -> XYSeries:
+        """指定されたプロパティと単位に基づいてグラフを取得する"""
+        pass
+
 class HighlightCondition(ABC):
-    """データ点のハイライト条件の抽象基底クラス"""
+    """データ点のハイライト条件の抽象基底クラス（&, |, ~ で組み合わせられる）"""
     def is_match_points(self, points):
         """
         ダミー実装（後方互換性のため）
         """
         raise NotImplementedError("Use is_match_points for batch operations.")
 
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        """
+        XYSeriesの各系列がハイライト対象かどうかを真偽値配列で返す。
+        既定実装は系列ごとにis_match_pointsを呼ぶので、サブクラスでは列演算で上書きすること。
+        """
+        return np.fromiter((self.is_match_points(points) for points in series.data), dtype=bool, count=len(series))
+
+    def mask(self, series: XYSeries) -> np.ndarray:
+        """
+        match_maskの結果を (series.version, 条件) ごとにメモ化して返す（読み取り専用）。
+        値で比較できる条件（frozenなdataclass）だけをメモ化し、それ以外は毎回match_maskを呼ぶ。
+        """
+        if not (dataclasses.is_dataclass(self) and self.__dataclass_params__.frozen):
+            return np.asarray(self.match_mask(series), dtype=bool)
+        try:
+            key = (series.version, self)
+            hash(key)
+        except TypeError:
+            return np.asarray(self.match_mask(series), dtype=bool)
+        with _mask_cache_lock:
+            cached = _mask_cache.get(key)
+            if cached is not None:
+                _mask_cache.move_to_end(key)
+                return cached
+        mask = _readonly(np.array(self.match_mask(series), dtype=bool))
+        with _mask_cache_lock:
+            _mask_cache[key] = mask
+            while len(_mask_cache) > _MASK_CACHE_SIZE:
+                _mask_cache.popitem(last=False)
+        return mask
+
+    def __and__(self, other: "HighlightCondition") -> "HighlightCondition":
+        return AndHighlightCondition(_flatten(AndHighlightCondition, self) + _flatten(AndHighlightCondition, other))
+
+    def __or__(self, other: "HighlightCondition") -> "HighlightCondition":
+        return OrHighlightCondition(_flatten(OrHighlightCondition, self) + _flatten(OrHighlightCondition, other))
+
+    def __invert__(self) -> "HighlightCondition":
+        return NotHighlightCondition(self)
+
+
+# (XYSeriesの型, version, 条件) → マスク
+_MASK_CACHE_SIZE = 128
+_mask_cache: "OrderedDict[Any, np.ndarray]" = OrderedDict()
+_mask_cache_lock = threading.Lock()
+
+
+def _flatten(cls, condition: HighlightCondition) -> Tuple[HighlightCondition, ...]:
+    return condition.conditions if isinstance(condition, cls) else (condition,)
+
+
+@dataclass(frozen=True)
+class AndHighlightCondition(HighlightCondition):
+    """すべての条件に一致する系列をハイライトする"""
+    conditions: Tuple[HighlightCondition, ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "conditions", tuple(self.conditions))
+
+    def is_match_points(self, points: XYPoints) -> bool:
+        return all(c.is_match_points(points) for c in self.conditions)
+
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        mask = np.ones(len(series), dtype=bool)
+        for condition in self.conditions:
+            if not mask.any():
+                break  # 残りの条件は結果を変えない
+            mask &= condition.mask(series)
+        return mask
+
+
+@dataclass(frozen=True)
+class OrHighlightCondition(HighlightCondition):
+    """いずれかの条件に一致する系列をハイライトする"""
+    conditions: Tuple[HighlightCondition, ...]
+
+    def __post_init__(self):
+        object.__setattr__(self, "conditions", tuple(self.conditions))
+
+    def is_match_points(self, points: XYPoints) -> bool:
+        return any(c.is_match_points(points) for c in self.conditions)
+
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        mask = np.zeros(len(series), dtype=bool)
+        for condition in self.conditions:
+            if mask.all():
+                break  # 残りの条件は結果を変えない
+            mask |= condition.mask(series)
+        return mask
+
+
+@dataclass(frozen=True)
+class NotHighlightCondition(HighlightCondition):
+    """条件に一致しない系列をハイライトする"""
+    condition: HighlightCondition
+
+    def is_match_points(self, points: XYPoints) -> bool:
+        return not self.condition.is_match_points(points)
+
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        return ~self.condition.mask(series)
+
 @dataclass(frozen=True)
 class DateHighlightCondition(HighlightCondition):
+    """
+    updated_atが期間内の系列をハイライトする条件。
+    日付のみの指定はtimezoneでのその日の0時から翌日0時の直前まで、時刻付きの指定はその時刻ちょうどまでを含む。
+    タイムゾーンのない時刻指定はtimezone、タイムゾーンのないupdated_atはUTCとみなす。
+    """
     date_from: str  # ISO8601形式の日付（YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS+0900）
     date_to: str    # ISO8601形式の日付
+    timezone: str = "UTC"  # 日付の区切りに使うIANAタイムゾーン名（例: "Asia/Tokyo"）
 
     def is_match_points(self, points: XYPoints) -> bool:
         if not hasattr(points, 'updated_at') or not points.updated_at:
             return False
-        point_date = points.updated_at[:10]
-        from_date = self.date_from[:10]
-        to_date = self.date_to[:10]
-        return from_date <= point_date <= to_date
+        return bool(self._match_epoch(parse_iso8601([points.updated_at]))[0])
+
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        start, end = self.bounds()
+        return series.index.mask(len(series), series.index.positions_between(start, end))
+
+    def bounds(self) -> "tuple[np.datetime64, np.datetime64]":
+        """UTCのdatetime64[us]で [開始, 終了) の半開区間を返す"""
+        return self._parse_bound(self.date_from, end=False), self._parse_bound(self.date_to, end=True)
+
+    def _match_epoch(self, epoch: np.ndarray) -> np.ndarray:
+        start, end = self.bounds()
+        # NaTとの比較はFalseになるので、updated_atのない系列はハイライトされない
+        return (epoch >= start) & (epoch < end)
+
+    def _parse_bound(self, value: str, end: bool) -> np.datetime64:
+        s = value[:-1] + "+00:00" if value.endswith("Z") else value
+        if len(s) > 5 and s[-5] in "+-" and s[-4:].isdigit():
+            s = s[:-2] + ":" + s[-2:]  # +0900 → +09:00
+        dt = datetime.fromisoformat(s)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=ZoneInfo(self.timezone))
+        if end:
+            # 日付のみなら翌日0時（タイムゾーンの壁時計で1日進める）、時刻付きならその時刻を含める
+            dt = dt + (timedelta(days=1) if len(value) == 10 else timedelta(microseconds=1))
+        micros = (dt - _EPOCH) // timedelta(microseconds=1)
+        return np.datetime64(micros, "us")
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 @dataclass(frozen=True)
 class SIDHighlightCondition(HighlightCondition):
@@ -100,10 +600,72 @@ class SIDHighlightCondition(HighlightCondition):
     def is_match_points(self, points: XYPoints) -> bool:
         return getattr(points, "sid", None) == self.sid
 
-# 今後の拡張例:
-# @dataclass(frozen=True)
-# class CompositionHighlightCondition(HighlightCondition):
-#     composition: str
-#     def is_match(self, point: XYPoint) -> bool:
-#         return getattr(point, "composition", None) == self.composition
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        return series.index.mask(len(series), series.index.positions("sid", self.sid))
+
+
+def _match_encoded(series: XYSeries, name: str, predicate) -> np.ndarray:
+    """列の異なる値ごとにpredicateを1回だけ評価し、系列に展開する"""
+    values, codes = series.dictionary_encode(name)
+    hit = np.fromiter((predicate(v) for v in values), dtype=bool, count=len(values))
+    return hit[codes]
+
+
+@dataclass(frozen=True)
+class SIDInHighlightCondition(HighlightCondition):
+    """SIDが集合に含まれる系列をハイライトする"""
+    sids: FrozenSet[str]
+
+    def __post_init__(self):
+        object.__setattr__(self, "sids", frozenset(self.sids))
+
+    def is_match_points(self, points: XYPoints) -> bool:
+        return getattr(points, "sid", None) in self.sids
+
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        return series.index.mask(len(series), series.index.positions_in("sid", self.sids))
+
+
+@dataclass(frozen=True)
+class FigureIdInHighlightCondition(HighlightCondition):
+    """figure_idが集合に含まれる系列をハイライトする"""
+    figure_ids: FrozenSet[str]
+
+    def __post_init__(self):
+        object.__setattr__(self, "figure_ids", frozenset(self.figure_ids))
+
+    def is_match_points(self, points: XYPoints) -> bool:
+        return getattr(points, "figure_id", None) in self.figure_ids
+
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        return series.index.mask(len(series), series.index.positions_in("figure_id", self.figure_ids))
+
+
+@dataclass(frozen=True)
+class SampleIdInHighlightCondition(HighlightCondition):
+    """sample_idが集合に含まれる系列をハイライトする"""
+    sample_ids: FrozenSet[str]
+
+    def __post_init__(self):
+        object.__setattr__(self, "sample_ids", frozenset(self.sample_ids))
+
+    def is_match_points(self, points: XYPoints) -> bool:
+        return getattr(points, "sample_id", None) in self.sample_ids
+
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        return series.index.mask(len(series), series.index.positions_in("sample_id", self.sample_ids))
+
+
+@dataclass(frozen=True)
+class CompositionHighlightCondition(HighlightCondition):
+    """compositionが正規表現patternに部分一致する系列をハイライトする（compositionのない系列は対象外）"""
+    pattern: str
+
+    def is_match_points(self, points: XYPoints) -> bool:
+        return self._matches(getattr(points, "composition", None))
+
+    def match_mask(self, series: XYSeries) -> np.ndarray:
+        return _match_encoded(series, "composition", self._matches)
 
+    def _matches(self, composition: Optional[str]) -> bool:
+        return composition is not None and re.search(self.pattern, composition) is not None
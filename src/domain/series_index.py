@@ -0,0 +1,100 @@
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# 連結で積み重なった層がこれを超えたら1層に作り直す
+MAX_LAYERS = 8
+
+
+class _LayerIndex:
+    """
+    1つのXYSeries（連結していないもの）に対する索引。
+    メタデータ列ごとの値→系列位置のハッシュマップと、updated_at昇順の並びを、初回参照時に作って保持する。
+    """
+
+    def __init__(self, series):
+        self._series = series
+        self._keys: Dict[str, Tuple[Dict[Any, int], np.ndarray, np.ndarray]] = {}
+        self._time: Tuple[np.ndarray, np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def positions(self, name: str, value: Any) -> np.ndarray:
+        code_of, order, bounds = self._key_index(name)
+        code = code_of.get(value)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return order[bounds[code]:bounds[code + 1]]
+
+    def positions_between(self, start: np.datetime64, end: np.datetime64) -> np.ndarray:
+        order, sorted_epoch = self._time_index()
+        lo, hi = np.searchsorted(sorted_epoch, [start, end], side="left")
+        return order[lo:hi]
+
+    def _key_index(self, name: str) -> Tuple[Dict[Any, int], np.ndarray, np.ndarray]:
+        if name not in self._keys:
+            values, codes = self._series.dictionary_encode(name)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+            self._keys[name] = ({v: i for i, v in enumerate(values.tolist())}, order, bounds)
+        return self._keys[name]
+
+    def _time_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._time is None:
+            epoch = self._series.updated_at_epoch
+            # NaTは末尾に並ぶので、どの範囲検索にも含まれない
+            order = np.argsort(epoch, kind="stable")
+            self._time = (order, epoch[order])
+        return self._time
+
+
+class SeriesIndex:
+    """
+    XYSeriesの索引。SID・figure_id・sample_idから系列位置をO(1)で、updated_atの範囲から系列位置をO(log n)で引く。
+    連結したXYSeriesでは連結元ごとの索引を層として重ねるので、bulk dataにdeltaを追記しても
+    bulk側の索引は作り直さず、追記された層の分だけ作ればよい。
+    """
+
+    def __init__(self, layers: Iterable[Tuple[int, _LayerIndex]]):
+        self._layers: List[Tuple[int, _LayerIndex]] = list(layers)
+
+    @classmethod
+    def build(cls, series) -> "SeriesIndex":
+        return cls([(0, _LayerIndex(series))])
+
+    @classmethod
+    def concat(cls, indexes: Iterable["SeriesIndex"], lengths: Iterable[int]) -> "SeriesIndex":
+        """連結元の索引を、連結後の位置にずらして重ねる"""
+        layers = []
+        base = 0
+        for index, length in zip(indexes, lengths):
+            layers.extend((base + offset, layer) for offset, layer in index._layers)
+            base += length
+        return cls(layers)
+
+    @property
+    def n_layers(self) -> int:
+        return len(self._layers)
+
+    def positions(self, name: str, value: Any) -> np.ndarray:
+        """列nameの値がvalueである系列の位置"""
+        return self._collect(lambda layer: layer.positions(name, value))
+
+    def positions_in(self, name: str, values: Iterable[Any]) -> np.ndarray:
+        """列nameの値がvaluesのいずれかである系列の位置"""
+        values = list(values)
+        return self._collect(lambda layer: np.concatenate([layer.positions(name, v) for v in values]) if values else np.empty(0, dtype=np.int64))
+
+    def positions_between(self, start: np.datetime64, end: np.datetime64) -> np.ndarray:
+        """updated_atが [start, end) にある系列の位置"""
+        return self._collect(lambda layer: layer.positions_between(start, end))
+
+    def mask(self, n: int, positions: np.ndarray) -> np.ndarray:
+        mask = np.zeros(n, dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def _collect(self, lookup) -> np.ndarray:
+        found = [lookup(layer) + offset for offset, layer in self._layers]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
@@ -0,0 +1,127 @@
+from typing import Iterable, Optional
+
+import numpy as np
+
+# ISO8601文字列の各位置の文字コード
+_DOT = ord(".")
+_COLON = ord(":")
+_PLUS = ord("+")
+_MINUS = ord("-")
+_Z = ord("Z")
+_ZERO = ord("0")
+# "YYYY-MM-DDTHH:MM:SS" の長さ（小数秒・タイムゾーンはこの後ろに続く）
+_BASE_LENGTH = 19
+_US_PER_MINUTE = 60 * 1_000_000
+
+
+def parse_iso8601(values: Iterable[Optional[str]], default_offset_minutes: int = 0) -> np.ndarray:
+    """
+    ISO8601文字列の列を一括でUTCのdatetime64[us]配列に変換する。
+    "YYYY-MM-DD", "YYYY-MM-DDTHH:MM:SS[.ffffff][Z|±HH:MM|±HHMM]" を受け付け、
+    タイムゾーンのない値はdefault_offset_minutes（既定はUTC）とみなす。None・空文字・解釈できない値はNaTになる。
+    文字列を1件ずつPythonで処理せず、文字コードの2次元配列に対する列演算で日時・小数秒・オフセットを読む。
+    """
+    arr = np.asarray(values if isinstance(values, np.ndarray) else list(values), dtype=object)
+    n = len(arr)
+    if n == 0:
+        return np.empty(0, dtype="datetime64[us]")
+    strs = np.where(arr == None, "", arr).astype(str)  # noqa: E711
+    if strs.dtype.itemsize // 4 < _BASE_LENGTH + 1:
+        strs = strs.astype(f"U{_BASE_LENGTH + 1}")
+    width = strs.dtype.itemsize // 4
+    codes = strs.view(np.uint32).reshape(n, width)
+    # 固定長文字列の末尾はNULで埋まっているので、NUL以外の文字数が長さになる
+    lengths = np.count_nonzero(codes, axis=1)
+    rows = np.arange(n)
+
+    base = _parse_base(codes, lengths, strs)
+
+    # 小数秒（6桁まで）
+    frac_us = np.zeros(n, dtype=np.int64)
+    in_digits = (lengths > _BASE_LENGTH) & (codes[:, _BASE_LENGTH] == _DOT)
+    for k in range(6):
+        col = _BASE_LENGTH + 1 + k
+        if col >= width:
+            break
+        digit = codes[:, col].astype(np.int64) - _ZERO
+        in_digits &= (digit >= 0) & (digit <= 9) & (col < lengths)
+        frac_us += np.where(in_digits, digit * 10 ** (5 - k), 0)
+
+    # タイムゾーン（Z, ±HH:MM, ±HHMM）
+    def char_at(pos: np.ndarray) -> np.ndarray:
+        return codes[rows, np.clip(pos, 0, width - 1)].astype(np.int64)
+
+    def two_digits(pos: np.ndarray) -> np.ndarray:
+        return (char_at(pos) - _ZERO) * 10 + (char_at(pos + 1) - _ZERO)
+
+    is_z = (lengths > _BASE_LENGTH) & (char_at(lengths - 1) == _Z)
+    pos_colon = lengths - 6
+    sign_colon = char_at(pos_colon)
+    is_colon = (pos_colon >= _BASE_LENGTH) & ((sign_colon == _PLUS) | (sign_colon == _MINUS)) & (char_at(pos_colon + 3) == _COLON)
+    pos_compact = lengths - 5
+    sign_compact = char_at(pos_compact)
+    is_compact = ~is_colon & (pos_compact >= _BASE_LENGTH) & ((sign_compact == _PLUS) | (sign_compact == _MINUS))
+    offset_colon = np.where(sign_colon == _MINUS, -1, 1) * (two_digits(pos_colon + 1) * 60 + two_digits(pos_colon + 4))
+    offset_compact = np.where(sign_compact == _MINUS, -1, 1) * (two_digits(pos_compact + 1) * 60 + two_digits(pos_compact + 3))
+    offset_minutes = np.select(
+        [is_z, is_colon, is_compact],
+        [0, offset_colon, offset_compact],
+        default=default_offset_minutes,
+    )
+
+    result = base.astype(np.int64) + frac_us - offset_minutes * _US_PER_MINUTE
+    result[np.isnat(base)] = np.iinfo(np.int64).min
+    return result.view("datetime64[us]")
+
+
+def _digits(codes: np.ndarray, start: int, count: int) -> np.ndarray:
+    value = np.zeros(len(codes), dtype=np.int64)
+    for col in range(start, start + count):
+        value = value * 10 + (codes[:, col].astype(np.int64) - _ZERO)
+    return value
+
+
+def _parse_base(codes: np.ndarray, lengths: np.ndarray, strs: np.ndarray) -> np.ndarray:
+    """
+    先頭19文字（日付のみなら10文字）をdatetime64[us]にする。
+    "YYYY-MM-DD[THH:MM:SS]" の形の値は数字の列から直接計算し、それ以外の値だけ個別にnumpyで解釈する（解釈できなければNaT）。
+    """
+    digit_cols = [0, 1, 2, 3, 5, 6, 8, 9]
+    time_cols = [11, 12, 14, 15, 17, 18]
+    is_digit = (codes >= _ZERO) & (codes <= _ZERO + 9)
+    date_ok = is_digit[:, digit_cols].all(axis=1) & (codes[:, 4] == _MINUS) & (codes[:, 7] == _MINUS)
+    sep = codes[:, 10]
+    time_ok = (
+        is_digit[:, time_cols].all(axis=1) & ((sep == ord("T")) | (sep == ord(" ")))
+        & (codes[:, 13] == _COLON) & (codes[:, 16] == _COLON) & (lengths >= _BASE_LENGTH)
+    )
+    date_only = date_ok & (lengths == 10)
+    fast = date_ok & (time_ok | date_only)
+
+    year, month, day = _digits(codes, 0, 4), _digits(codes, 5, 2), _digits(codes, 8, 2)
+    hour, minute, second = _digits(codes, 11, 2), _digits(codes, 14, 2), _digits(codes, 17, 2)
+    in_range = (month >= 1) & (month <= 12) & (day >= 1) & (hour <= 23) & (minute <= 59) & (second <= 60)
+    months = np.where(in_range, (year - 1970) * 12 + month - 1, 0)
+    first_of_month = months.astype("datetime64[M]").astype("datetime64[D]")
+    next_month = (months + 1).astype("datetime64[M]").astype("datetime64[D]")
+    day_ok = in_range & (first_of_month + (day - 1) < next_month)
+    days = (first_of_month - np.datetime64("1970-01-01", "D")).astype(np.int64) + day - 1
+    seconds_of_day = np.where(date_only, 0, hour * 3600 + minute * 60 + second)
+    micros = (days * 86400 + seconds_of_day) * 1_000_000
+    micros[~(fast & day_ok)] = np.iinfo(np.int64).min
+    parsed = micros.view("datetime64[us]")
+
+    # 形の違う値（空文字・不正な値など）だけ1件ずつ解釈する
+    for i in np.flatnonzero(~fast & (lengths > 0)).tolist():
+        try:
+            parsed[i] = np.datetime64(strs[i][:_BASE_LENGTH], "us")
+        except ValueError:
+            pass
+    return parsed
+
+
+def to_epoch_millis(epoch: np.ndarray) -> np.ndarray:
+    """datetime64の列をエポックミリ秒（float64）にする。NaTはNaNになる"""
+    millis = epoch.astype("datetime64[ms]").astype(np.int64).astype(np.float64)
+    millis[np.isnat(epoch)] = np.nan
+    return millis
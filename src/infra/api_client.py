@@ -1,6 +1,18 @@
-from typing import List, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import chain
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional
+
+import numpy as np
 from pydantic import BaseModel
 
+from infra.http_session import HttpSessionPool, get_session_pool
+from infra.metrics import get_metrics
+
+if TYPE_CHECKING:
+    from infra.bulk_data_cache import BulkDataDiskCache
+    from infra.xy_decoders import XYDecoder
+
 # XYApiResponseは下記APIレスポンス仕様を参考にしています：
 # - https://starrydata.github.io/bulk-data-api/v1/index.html#/default/get__prop_x___prop_y__json
 # - https://www.starrydata2.org/paperlist/openapi/#/default/get_xy_data_api_
@@ -13,25 +25,180 @@ class XYApiResponse(BaseModel):
     sample_id: List[str]
     composition: List[Optional[str]]
 
+@dataclass
+class XYApiColumns:
+    """
+    XYApiResponseと同じ内容を型付きの連続バッファで持つ形式。
+    x, yは全系列を連結したfloat64配列で、x_offsets/y_offsets（長さ=系列数+1）が系列の境界を表す。
+    """
+    x: np.ndarray
+    x_offsets: np.ndarray
+    y: np.ndarray
+    y_offsets: np.ndarray
+    updated_at: List[str]
+    SID: List[str]
+    figure_id: List[str]
+    sample_id: List[str]
+    composition: List[Optional[str]]
+
+    @classmethod
+    def from_response(cls, api_data: XYApiResponse) -> "XYApiColumns":
+        return cls(
+            x=_flatten(api_data.x),
+            x_offsets=_offsets(api_data.x),
+            y=_flatten(api_data.y),
+            y_offsets=_offsets(api_data.y),
+            updated_at=api_data.updated_at,
+            SID=api_data.SID,
+            figure_id=api_data.figure_id,
+            sample_id=api_data.sample_id,
+            composition=api_data.composition,
+        )
+
+
+def _offsets(lists: List[List[float]]) -> np.ndarray:
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, lists), dtype=np.int64, count=len(lists)), out=offsets[1:])
+    return offsets
+
+
+def _flatten(lists: List[List[float]]) -> np.ndarray:
+    return np.fromiter(chain.from_iterable(lists), dtype=np.float64)
+
+
+def _decoder_from_env() -> "XYDecoder":
+    from infra.xy_decoders import XYDecoder
+    return XYDecoder.from_env()
+
+
 class Starrydata2ApiClient:
-    def __init__(self, host: str):
+    def __init__(self, host: str, session_pool: Optional[HttpSessionPool] = None, decoder: Optional["XYDecoder"] = None):
         self.host = host
+        self.session_pool = session_pool or get_session_pool()
+        self.decoder = decoder or _decoder_from_env()
 
     def fetch_xy_data(self, params: dict) -> XYApiResponse:
-        import requests
-        response = requests.get(f"{self.host}/", params=params)
-        response.raise_for_status()
-        data = response.json().get("data", {})
-        return XYApiResponse(**data)
+        metrics = get_metrics()
+        with metrics.span("http_fetch", api="starrydata2"):
+            response = self.session_pool.get(f"{self.host}/", params=params)
+            response.raise_for_status()
+        if metrics.enabled:
+            metrics.count("bytes_downloaded", len(response.content))
+        with metrics.span("decode", api="starrydata2", decoder=self.decoder.backend):
+            return self.decoder.load_response(response)
 
 class CleansingDatasetApiClient:
-    def __init__(self, host: str):
+    # ストリーミング受信時のチャンクサイズ（バイト）
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(
+        self,
+        host: str,
+        streaming: bool = True,
+        cache: Optional["BulkDataDiskCache"] = None,
+        session_pool: Optional[HttpSessionPool] = None,
+        decoder: Optional["XYDecoder"] = None,
+    ):
         self.host = host
+        self.streaming = streaming
+        self.cache = cache
+        self.session_pool = session_pool or get_session_pool()
+        # 本文をまとめてデコードするとき（fetch_xy_data、streaming=False）に使う
+        self.decoder = decoder or _decoder_from_env()
 
     def fetch_xy_data(self, property_x: str, property_y: str) -> XYApiResponse:
-        import requests
         path = f"{self.host}/{property_x}-{property_y}.json"
-        response = requests.get(path)
-        response.raise_for_status()
-        data = response.json().get("data", {})
-        return XYApiResponse(**data)
+        metrics = get_metrics()
+        with metrics.span("http_fetch", api="bulk"):
+            response = self.session_pool.get(path)
+            response.raise_for_status()
+        if metrics.enabled:
+            metrics.count("bytes_downloaded", len(response.content))
+        with metrics.span("decode", api="bulk", decoder=self.decoder.backend):
+            return self.decoder.load_response(response)
+
+    def fetch_xy_columns(self, property_x: str, property_y: str) -> XYApiColumns:
+        """
+        XYデータを型付きバッファ形式で取得する。
+        streamingが有効ならレスポンス本文をチャンクごとに受信しながらデコードし、
+        生のJSON・dict・pydanticモデルを同時にメモリへ載せない。
+        """
+        metrics = get_metrics()
+        # ストリーミングでは受信とデコードが交互に進むので、まとめて1つの区間として計る
+        with metrics.span("fetch_decode", api="bulk", streaming=self.streaming), self._open_payload(property_x, property_y) as chunks:
+            if not self.streaming:
+                return self.decoder.decode_columns(b"".join(chunks))
+            from infra.xy_stream_decoder import XYStreamDecoder
+            decoder = XYStreamDecoder()
+            for chunk in chunks:
+                decoder.feed(chunk)
+            return decoder.close()
+
+    def fetch_xy_body(self, property_x: str, property_y: str) -> bytes:
+        """レスポンス本文をデコードせずにそのまま取得する（キャッシュがあればそれを使う）"""
+        with get_metrics().span("http_fetch", api="bulk"), self._open_payload(property_x, property_y) as chunks:
+            return b"".join(chunks)
+
+    @contextmanager
+    def _open_payload(self, property_x: str, property_y: str) -> Iterator[Iterable[bytes]]:
+        """
+        レスポンス本文をチャンクのイテレータとして開く。
+        キャッシュがあれば、バックアップ周期内に確認済みのファイルはそのまま返し、
+        それ以外はIf-None-Match/If-Modified-Since付きで再検証し、新しい本文は受信しながら保存する。
+        """
+        path = f"{self.host}/{property_x}-{property_y}.json"
+        if self.cache is None:
+            with self.session_pool.get(path, stream=True) as response:
+                response.raise_for_status()
+                yield _count_downloaded(response.iter_content(chunk_size=self.CHUNK_SIZE))
+            return
+        key = self.cache.key(property_x, property_y)
+        entry = self.cache.lookup(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            with self.cache.open_payload(key) as chunks:
+                if chunks is not None:
+                    self.cache.record_hit()
+                    yield chunks
+                    return
+            # lookupの後に追い出されていたらキャッシュがないものとして取得する
+            entry = None
+        with self._fetch_to_cache(path, key, property_x, property_y, entry) as chunks:
+            yield chunks
+
+    @contextmanager
+    def _fetch_to_cache(self, path: str, key: str, property_x: str, property_y: str, entry) -> Iterator[Iterable[bytes]]:
+        """entryがあれば条件付きで取得し、304ならキャッシュ済みの本文を、それ以外は受信しながら保存する本文を返す"""
+        with self.session_pool.get(path, headers=self.cache.conditional_headers(entry), stream=True) as response:
+            if entry is None or response.status_code != 304:
+                response.raise_for_status()
+                self.cache.record_miss()
+                with self.cache.writer(
+                    key,
+                    property_x=property_x,
+                    property_y=property_y,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                ) as writer:
+                    yield writer.tee(_count_downloaded(response.iter_content(chunk_size=self.CHUNK_SIZE)))
+                return
+            self.cache.mark_validated(key)
+            with self.cache.open_payload(key) as chunks:
+                if chunks is not None:
+                    self.cache.record_hit()
+                    yield chunks
+                    return
+        # 304を受けた後に追い出されていたら条件なしで取得し直す
+        with self._fetch_to_cache(path, key, property_x, property_y, None) as chunks:
+            yield chunks
+
+
+def _count_downloaded(chunks: Iterable[bytes]) -> Iterable[bytes]:
+    """受信したチャンクのバイト数をbytes_downloadedに数える（計測が無効ならそのまま返す）"""
+    metrics = get_metrics()
+    if not metrics.enabled:
+        return chunks
+    def counted():
+        for chunk in chunks:
+            metrics.count("bytes_downloaded", len(chunk))
+            yield chunk
+    return counted()
@@ -0,0 +1,16 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# bulk data apiは毎日JST 0時にバックアップされる
+JST = timezone(timedelta(hours=9), "JST")
+
+
+def latest_backup_at(now: Optional[datetime] = None) -> datetime:
+    """直近（now以前）のbulk dataバックアップ時刻（JST 0時）を返す"""
+    now = (now or datetime.now(timezone.utc)).astimezone(JST)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_backup_at(now: Optional[datetime] = None) -> datetime:
+    """次回（nowより後）のbulk dataバックアップ時刻（JST 0時）を返す"""
+    return latest_backup_at(now) + timedelta(days=1)
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+from infra.backup_schedule import latest_backup_at
+from infra.metrics import get_metrics
+
+DEFAULT_MAX_BYTES = 1 << 30  # 1GiB
+_READ_CHUNK_SIZE = 1 << 16
+
+_instances: Dict[str, "BulkDataDiskCache"] = {}
+_instances_lock = threading.Lock()
+
+
+@dataclass
+class BulkDataCacheEntry:
+    """キャッシュ済みbulk dataファイルのメタデータ"""
+    property_x: str
+    property_y: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    validated_at: float  # 最後にサーバーと内容を確認したUNIX時刻
+    size: int
+
+
+class BulkDataDiskCache:
+    """
+    bulk data API（{prop_x}-{prop_y}.json）のレスポンスを保存するディスクキャッシュ。
+    プロパティの組ごとに本文とETag/Last-Modifiedを保存し、
+    バックアップ（JST 0時）以降に一度でも確認済みなら再検証せずにローカルのファイルを返す。
+    書き込みは一時ファイル経由のrenameで原子的に行い、合計サイズがmax_bytesを超えたら
+    最終アクセスが古いものから削除する。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["BulkDataDiskCache"]:
+        """
+        STARRYDATA_BULK_DATA_CACHE_DIRが設定されていればキャッシュを返す。
+        ヒット数などのカウンタをプロセス内で共有するため、ディレクトリごとに同じインスタンスを返す。
+        """
+        directory = os.environ.get("STARRYDATA_BULK_DATA_CACHE_DIR")
+        if not directory:
+            return None
+        max_bytes = int(os.environ.get("STARRYDATA_BULK_DATA_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        with _instances_lock:
+            cache = _instances.get(directory)
+            if cache is None:
+                cache = _instances[directory] = cls(directory, max_bytes=max_bytes)
+                get_metrics().register_collector("bulk_data_cache", cache.stats)
+            cache.max_bytes = max_bytes
+            return cache
+
+    # --- 参照 ---
+
+    @staticmethod
+    def key(property_x: str, property_y: str) -> str:
+        # プロパティ名には空白や記号が含まれるのでハッシュをファイル名にする
+        return hashlib.sha256(f"{property_x}\0{property_y}".encode("utf-8")).hexdigest()[:32]
+
+    def lookup(self, key: str) -> Optional[BulkDataCacheEntry]:
+        try:
+            with open(self._meta_path(key), encoding="utf-8") as f:
+                entry = BulkDataCacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        if not os.path.exists(self._payload_path(key)):
+            return None
+        return entry
+
+    def is_fresh(self, entry: BulkDataCacheEntry, now: Optional[datetime] = None) -> bool:
+        """直近のバックアップ以降に確認済みならTrue（再検証は1バックアップ周期に1回まで）"""
+        return entry.validated_at >= latest_backup_at(now).timestamp()
+
+    def conditional_headers(self, entry: Optional[BulkDataCacheEntry]) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    @contextmanager
+    def open_payload(self, key: str) -> Iterator[Optional[Iterable[bytes]]]:
+        """
+        キャッシュ済みの本文をチャンクのイテレータとして開く（LRU用にアクセス時刻を更新する）。
+        lookupの後に他のスレッド・プロセスが追い出していればNoneを返す（呼び出し側はミスとして取得し直す）。
+        """
+        path = self._payload_path(key)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            yield None
+            return
+        with f:
+            try:
+                os.utime(f.fileno() if os.utime in os.supports_fd else path)
+            except FileNotFoundError:
+                pass  # 開いた後に追い出された（開いたファイルはそのまま読める）
+            yield iter(lambda: f.read(_READ_CHUNK_SIZE), b"")
+
+    # --- 更新 ---
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def mark_validated(self, key: str) -> None:
+        """304 Not Modifiedを受けたエントリの確認時刻を更新する"""
+        entry = self.lookup(key)
+        if entry is None:
+            return
+        entry.validated_at = time.time()
+        self._write_meta(key, entry)
+        with self._lock:
+            self.revalidations += 1
+
+    @contextmanager
+    def writer(self, key: str, property_x: str, property_y: str, etag: Optional[str], last_modified: Optional[str]):
+        """
+        受信中の本文を一時ファイルへ書き込むライター。
+        withブロックが正常終了した時だけ本文とメタデータを置き換え、例外時は一時ファイルを捨てる。
+        置き換えは 古いメタデータの削除 → 本文のrename → 新しいメタデータのrename の順に行う。
+        途中で止まってもメタデータのない本文が残るだけで（lookupはミスになる）、
+        古いETagと新しい本文（またはその逆）の組み合わせを返すことはない。
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".payload")
+        writer = _PayloadWriter(os.fdopen(fd, "wb"))
+        try:
+            yield writer
+            writer.file.close()
+            try:
+                os.unlink(self._meta_path(key))
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, self._payload_path(key))
+        except BaseException:
+            writer.file.close()
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._write_meta(key, BulkDataCacheEntry(
+            property_x=property_x,
+            property_y=property_y,
+            etag=etag,
+            last_modified=last_modified,
+            validated_at=time.time(),
+            size=writer.size,
+        ))
+        self.evict(keep=key)
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """合計サイズがmax_bytesを超えていれば、最終アクセスが古いエントリから削除する"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".payload") or name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name[:-len(".payload")]))
+            total = sum(size for _, size, _ in entries)
+            for _, size, key in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                for path in (self._meta_path(key), self._payload_path(key)):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "revalidations": self.revalidations}
+
+    # --- 内部処理 ---
+
+    def _payload_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.payload")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _write_meta(self, key: str, entry: BulkDataCacheEntry) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(asdict(entry), f, ensure_ascii=False)
+            os.replace(tmp_path, self._meta_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class _PayloadWriter:
+    def __init__(self, file):
+        self.file = file
+        self.size = 0
+
+    def tee(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """チャンクを一時ファイルに書きながらそのまま呼び出し元へ流す"""
+        for chunk in chunks:
+            self.file.write(chunk)
+            self.size += len(chunk)
+            yield chunk
+
@@ -0,0 +1,44 @@
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from domain.graph import XYSeries
+
+# (property_x, property_y, unit_x, unit_y)
+DeltaKey = Tuple[str, str, str, str]
+
+
+@dataclass(frozen=True)
+class DeltaState:
+    """プロパティの組ごとに取得済みのStarrydata2 delta"""
+    window_start: datetime         # 取得対象期間の開始（JST前日0時）
+    watermark: Optional[datetime]  # 取得済みレコードの最新updated_at
+    series: XYSeries               # 期間内に取得済みの全レコード
+
+
+class DeltaLog:
+    """Starrydata2 deltaの取得状態をプロセス全体で保持する"""
+
+    def __init__(self):
+        self._states: Dict[DeltaKey, DeltaState] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: DeltaKey) -> Optional[DeltaState]:
+        with self._lock:
+            return self._states.get(key)
+
+    def put(self, key: DeltaKey, state: DeltaState) -> None:
+        with self._lock:
+            self._states[key] = state
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+
+_default_log = DeltaLog()
+
+
+def get_delta_log() -> DeltaLog:
+    return _default_log
@@ -1,16 +1,90 @@
+import asyncio
+import contextvars
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
+import numpy as np
 import requests
-from domain.graph import XYPoint, XYPoints, XYSeries, GraphRepository
-from infra.api_client import Starrydata2ApiClient, CleansingDatasetApiClient, XYApiResponse
+from domain.graph import XYSeries, GraphRepository, AsyncGraphRepository
+from domain.timestamps import parse_iso8601
+from infra.backup_schedule import JST, latest_backup_at
+from infra.bulk_data_cache import BulkDataDiskCache
+from infra.delta_log import DeltaLog, DeltaState, get_delta_log
+from infra.metrics import get_metrics
+from infra.snapshot import SnapshotStore
+from infra.api_client import Starrydata2ApiClient, CleansingDatasetApiClient, XYApiResponse, XYApiColumns
 
+logger = logging.getLogger(__name__)
+
+
+def _to_xy_series(api_data: XYApiColumns) -> XYSeries:
+    """
+    APIレスポンスを列指向のXYSeriesに変換する。
+    x, yが空でなく長さが一致する系列だけを採用し、点ごとのオブジェクトは作らない。
+    updated_atは取り込み時に一括でUTCの時刻列にパースする（どちらのAPIでも同じ扱い）。
+    """
+    metrics = get_metrics()
+    with metrics.span("convert") as span:
+        series = _columns_to_series(api_data, metrics)
+        span.set(series=len(series), points=series.n_points)
+    metrics.count("series_processed", len(series))
+    metrics.count("points_processed", series.n_points)
+    return series
+
+
+def _columns_to_series(api_data: XYApiColumns, metrics) -> XYSeries:
+    updated_at_lists = api_data.updated_at
+    n_series = min(len(api_data.x_offsets), len(api_data.y_offsets)) - 1
+    sid_lists = api_data.SID or [str(i) for i in range(n_series)]
+    x_lengths = np.diff(api_data.x_offsets)[:n_series]
+    y_lengths = np.diff(api_data.y_offsets)[:n_series]
+    indices = np.flatnonzero((x_lengths > 0) & (x_lengths == y_lengths))
+    n_updated_at = len(updated_at_lists) if updated_at_lists else 0
+    missing = indices[indices >= n_updated_at]
+    if len(missing):
+        raise ValueError("updated_at is required for each data series, but missing at index {}".format(missing[0]))
+    lengths = x_lengths[indices]
+    offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if len(indices) == n_series and len(api_data.x) == len(api_data.y) == offsets[-1]:
+        # 全系列が有効なら数値バッファをそのまま使う
+        x, y = api_data.x, api_data.y
+    else:
+        within = np.arange(offsets[-1], dtype=np.int64) - np.repeat(offsets[:-1], lengths)
+        x = api_data.x[np.repeat(api_data.x_offsets[indices], lengths) + within]
+        y = api_data.y[np.repeat(api_data.y_offsets[indices], lengths) + within]
+    index_list = indices.tolist()
+    updated_at = [updated_at_lists[i] for i in index_list]
+    with metrics.span("normalize"):
+        updated_at_epoch = parse_iso8601(updated_at)
+    return XYSeries.from_columns(
+        x=x,
+        y=y,
+        offsets=offsets,
+        updated_at=updated_at,
+        sid=[sid_lists[i] for i in index_list],
+        figure_id=[api_data.figure_id[i] for i in index_list],
+        sample_id=[api_data.sample_id[i] for i in index_list],
+        composition=[api_data.composition[i] for i in index_list],
+        updated_at_epoch=updated_at_epoch,
+    )
 
 class GraphRepositoryApiStarrydata2(GraphRepository):
-    def __init__(self, api_client=None):
+    # 1リクエストで取得する系列数
+    PAGE_SIZE = 100
+    # ページングの上限（新しい系列を含むページが続く限り取得するので、その安全弁）
+    MAX_PAGES = 1000
+
+    def __init__(self, api_client=None, delta_log: Optional[DeltaLog] = None, page_size: Optional[int] = None):
         host = os.environ.get("STARRYDATA2_API_XY_DATA")
         if not host:
             raise ValueError("STARRYDATA2_API_XY_DATA environment variable is not set.")
         self.api_client = api_client or Starrydata2ApiClient(host)
+        self.delta_log = delta_log if delta_log is not None else get_delta_log()
+        self.page_size = page_size or self.PAGE_SIZE
 
     def get_graph_by_property(self, property_x: str, property_y: str) -> XYSeries:
         # API呼び出し・データ取得処理は省略（必要に応じて実装）
@@ -20,68 +94,151 @@ class GraphRepositoryApiStarrydata2(GraphRepository):
         """
         bulk data apiはJST前日0時のバックアップなので、
         最新データはJSTで前日0時以降のデータのみ取得すれば全件網羅できる。
-        date_from, date_toが指定されていない場合は、date_fromをJST前日0時、date_toを現在時刻に自動設定する。
+        date_fromをJST前日0時、date_toを現在時刻として、期間を取り切るまでページングして取得する。
+        2回目以降は組ごとに記録した最新updated_at（watermark）以降だけを取得し、取得済みのdeltaに追記する。
+        バックアップで期間の開始が変わったら記録を捨てて取り直す。
         """
-
-        import pytz
-        from datetime import datetime, timedelta
-        JST = pytz.timezone('Asia/Tokyo')
         now = datetime.now(JST)
-        date_from_dt = (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        date_from = date_from_dt.isoformat()
-        date_to = now.isoformat()
+        window_start = latest_backup_at(now) - timedelta(days=1)
+        key = (property_x, property_y, unit_x, unit_y)
+        state = self.delta_log.get(key)
+        if state is None or state.window_start != window_start:
+            state = DeltaState(window_start=window_start, watermark=None, series=XYSeries())
+        date_from = (state.watermark or window_start).isoformat()
         params = {
             "property_x": property_x,
             "property_y": property_y,
             "unit_x": unit_x,
             "unit_y": unit_y,
             "date_from": date_from,
-            "date_to": date_to,
-            "limit": 100
+            "date_to": now.isoformat(),
         }
-        api_data: XYApiResponse = self.api_client.fetch_xy_data(params)
-        x_lists = api_data.x
-        y_lists = api_data.y
-        updated_at_lists = api_data.updated_at
-        sid_lists = api_data.SID or [str(i) for i in range(len(x_lists))]
-        xy_series = []
-        for i, (x_list, y_list) in enumerate(zip(x_lists, y_lists)):
-            if x_list and y_list and len(x_list) == len(y_list):
-                if not (updated_at_lists and i < len(updated_at_lists)):
-                    raise ValueError("updated_at is required for each data series, but missing at index {}".format(i))
-                updated_at = updated_at_lists[i]
-                figure_id = api_data.figure_id[i]
-                sample_id = api_data.sample_id[i]
-                composition = api_data.composition[i]
-                points = [XYPoint(x=xi, y=yi) for xi, yi in zip(x_list, y_list)]
-                xy_series.append(XYPoints(data=points, updated_at=updated_at, sid=sid_lists[i], figure_id=figure_id, sample_id=sample_id, composition=composition))
-        return XYSeries(data=xy_series)
+        new_series = self._fetch_all_pages(params)
+        series = _append_delta(state.series, new_series)
+        watermark = max([t for t in [state.watermark, _latest_updated_at(new_series)] if t is not None], default=None)
+        self.delta_log.put(key, DeltaState(window_start=window_start, watermark=watermark, series=series))
+        return series
+
+    def _fetch_all_pages(self, params: dict) -> XYSeries:
+        """
+        date_fromを取得済みの最新updated_atへ進めながらページングする（APIはupdated_at順に返す）。
+        境界の時刻のレコードは次のページでも返るので、同じ系列（SID, figure_id, sample_id）は後のページの方を残す。
+        返ってきた系列数がlimit未満になるか、新しい系列を含まないページが返ったら終える。
+        """
+        pages = []
+        seen = set()
+        date_from = params["date_from"]
+        for page in range(self.MAX_PAGES):
+            api_data: XYApiResponse = self.api_client.fetch_xy_data({**params, "date_from": date_from, "limit": self.page_size})
+            keys = set(zip(api_data.SID, api_data.figure_id, api_data.sample_id))
+            if page and not keys - seen:
+                if len(api_data.x) >= self.page_size:
+                    # 同じ時刻のレコードが1ページに収まらない、またはAPIがdate_fromを無視している
+                    logger.warning("delta paging stopped: page %d from %s has no new series", page, date_from)
+                break
+            seen |= keys
+            series = _to_xy_series(XYApiColumns.from_response(api_data))
+            pages.append(series)
+            latest = _latest_updated_at(series)
+            if len(api_data.x) < self.page_size or latest is None:
+                break
+            date_from = latest.isoformat()
+        return _drop_superseded(XYSeries.concat(pages))
+
+
+def _latest_updated_at(series: XYSeries) -> Optional[datetime]:
+    """取り込み時にパース済みの時刻列の最新値（空・不正なupdated_at（NaT）は無視する。なければNone）"""
+    epoch = series.updated_at_epoch
+    valid = epoch[~np.isnat(epoch)]
+    if len(valid) == 0:
+        return None
+    return valid.max().astype(datetime).replace(tzinfo=timezone.utc)
+
+
+def _drop_superseded(series: XYSeries) -> XYSeries:
+    """同じ系列（SID, figure_id, sample_id）が複数あれば最後のものだけを残す"""
+    last = {key: i for i, key in enumerate(zip(series.sid, series.figure_id, series.sample_id))}
+    if len(last) == len(series):
+        return series
+    return series.take(sorted(last.values()))
+
+
+def _append_delta(cached: XYSeries, new_series: XYSeries) -> XYSeries:
+    """
+    取得済みのdeltaに新しいレコードを追記する。
+    同じ系列（SID, figure_id, sample_id）が再取得された場合は古い方を捨てて新しい方を残す。
+    """
+    if len(new_series) == 0:
+        return cached
+    new_keys = set(zip(new_series.sid, new_series.figure_id, new_series.sample_id))
+    keep = [i for i, k in enumerate(zip(cached.sid, cached.figure_id, cached.sample_id)) if k not in new_keys]
+    # 置き換えがなければ取得済みの系列をそのまま使い、その索引も引き継ぐ
+    kept = cached if len(keep) == len(cached) else cached.take(keep)
+    return XYSeries.concat([kept, new_series])
 
 class GraphRepositoryApiCleansingDataset(GraphRepository):
     def __init__(self, api_client=None):
         host = os.environ.get("STARRYDATA_BULK_DATA_API")
         if not host:
             raise ValueError("STARRYDATA_BULK_DATA_API environment variable is not set.")
-        self.api_client = api_client or CleansingDatasetApiClient(host)
+        self.api_client = api_client or CleansingDatasetApiClient(host, cache=BulkDataDiskCache.from_env())
 
     def get_graph_by_property(self, property_x: str, property_y: str) -> XYSeries:
-        api_data: XYApiResponse = self.api_client.fetch_xy_data(property_x, property_y)
-        x_lists = api_data.x
-        y_lists = api_data.y
-        updated_at_lists = api_data.updated_at
-        sid_lists = api_data.SID or [str(i) for i in range(len(x_lists))]
-        xy_series = []
-        for i, (x_list, y_list) in enumerate(zip(x_lists, y_lists)):
-            if x_list and y_list and len(x_list) == len(y_list):
-                if not (updated_at_lists and i < len(updated_at_lists)):
-                    raise ValueError("updated_at is required for each data series, but missing at index {}".format(i))
-                updated_at = updated_at_lists[i]
-                figure_id = api_data.figure_id[i]
-                sample_id = api_data.sample_id[i]
-                composition = api_data.composition[i]
-                points = [XYPoint(x=xi, y=yi) for xi, yi in zip(x_list, y_list)]
-                xy_series.append(XYPoints(data=points, updated_at=updated_at, sid=sid_lists[i], figure_id=figure_id, sample_id=sample_id, composition=composition))
-        return XYSeries(data=xy_series)
+        api_data: XYApiColumns = self.api_client.fetch_xy_columns(property_x, property_y)
+        return _to_xy_series(api_data)
 
     def get_graph_by_property_and_unit(self, property_x: str, property_y: str, unit_x: str, unit_y: str) -> XYSeries:
         raise NotImplementedError("get_graph_by_property_and_unit is not implemented for bulk data API.")
+
+
+class GraphRepositorySnapshot(GraphRepository):
+    """
+    ローカルのスナップショット（infra.snapshot）からbulk dataを読むリポジトリ。
+    ファイルをmmapして列をコピーせずに参照するので、取得・パースなしに組を開ける。
+    スナップショットのない組は、fallbackがあればそちら（通常はbulk data API）から取得する。
+    """
+    def __init__(self, store: Optional[SnapshotStore] = None, fallback: Optional[GraphRepository] = None):
+        store = store or SnapshotStore.from_env()
+        if store is None:
+            raise ValueError("STARRYDATA_SNAPSHOT_DIR environment variable is not set.")
+        self.store = store
+        self.fallback = fallback
+
+    def get_graph_by_property(self, property_x: str, property_y: str) -> XYSeries:
+        with get_metrics().span("snapshot_open") as span:
+            snapshot = self.store.open(property_x, property_y)
+            span.set(found=snapshot is not None, bytes=snapshot.size if snapshot else 0)
+        if snapshot is not None:
+            return snapshot.series
+        if self.fallback is None:
+            raise FileNotFoundError(f"No snapshot for {property_x}-{property_y} in {self.store.directory}")
+        return self.fallback.get_graph_by_property(property_x, property_y)
+
+    def get_graph_by_property_and_unit(self, property_x: str, property_y: str, unit_x: str, unit_y: str) -> XYSeries:
+        raise NotImplementedError("get_graph_by_property_and_unit is not implemented for snapshots.")
+
+
+# 非同期リポジトリが同期I/Oを実行するためのスレッドプール（プロセス全体で共有）
+_async_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("STARRYDATA_REPOSITORY_WORKERS", 8)), thread_name_prefix="graph-repository")
+
+
+class AsyncGraphRepositoryAdapter(AsyncGraphRepository):
+    """
+    同期のGraphRepositoryを非同期インターフェースで提供する実装。
+    HTTP通信はスレッドセーフな接続プール（infra.http_session）を使うため、
+    呼び出しをワーカースレッドで実行するだけで複数のリポジトリを並行に取得できる。
+    ワーカースレッドでは呼び出し元のcontextvars（計測のtraceなど）を引き継ぐ。
+    """
+    def __init__(self, repository: GraphRepository):
+        self.repository = repository
+
+    async def get_graph_by_property(self, property_x: str, property_y: str) -> XYSeries:
+        return await _run_in_executor(self.repository.get_graph_by_property, property_x, property_y)
+
+    async def get_graph_by_property_and_unit(self, property_x: str, property_y: str, unit_x: str, unit_y: str) -> XYSeries:
+        return await _run_in_executor(self.repository.get_graph_by_property_and_unit, property_x, property_y, unit_x, unit_y)
+
+
+async def _run_in_executor(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_async_executor, contextvars.copy_context().run, func, *args)
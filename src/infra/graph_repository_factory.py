@@ -1,12 +1,20 @@
+import os
+from typing import Optional
 
-
-from domain.graph import GraphRepository
-from infra.graph_repository import GraphRepositoryApiStarrydata2, GraphRepositoryApiCleansingDataset
+from domain.graph import GraphRepository, AsyncGraphRepository
+from infra.graph_repository import GraphRepositoryApiStarrydata2, GraphRepositoryApiCleansingDataset, GraphRepositorySnapshot, AsyncGraphRepositoryAdapter
+from infra.snapshot import SnapshotStore
 from enum import Enum
 
 class ApiHostName(Enum):
     STARRYDATA2 = "starrydata2"
     CLEANSING_DATASET = "cleansing_dataset"
+    SNAPSHOT = "snapshot"
+
+    @classmethod
+    def bulk_from_env(cls) -> "ApiHostName":
+        """bulk dataの取得元（STARRYDATA_BULK_DATA_SOURCE: cleansing_dataset/snapshot、既定はcleansing_dataset）"""
+        return cls(os.environ.get("STARRYDATA_BULK_DATA_SOURCE", cls.CLEANSING_DATASET.value).strip().lower() or cls.CLEANSING_DATASET.value)
 
 class GraphRepositoryFactory:
     @staticmethod
@@ -15,5 +23,24 @@ class GraphRepositoryFactory:
             return GraphRepositoryApiStarrydata2()
         elif api_host_name.value == ApiHostName.CLEANSING_DATASET.value:
             return GraphRepositoryApiCleansingDataset()
+        elif api_host_name.value == ApiHostName.SNAPSHOT.value:
+            # スナップショットのない組はbulk data APIから取得する（APIが設定されていれば）
+            fallback = GraphRepositoryApiCleansingDataset() if os.environ.get("STARRYDATA_BULK_DATA_API") else None
+            return GraphRepositorySnapshot(fallback=fallback)
         else:
             raise ValueError(f"Unknown api_: {api_host_name}")
+
+    @staticmethod
+    def bulk_generation() -> Optional[str]:
+        """
+        bulk dataの世代。スナップショットから読む場合は現在の世代（SnapshotStore.generation）、
+        それ以外は世代を持たないのでNone
+        """
+        if ApiHostName.bulk_from_env() is not ApiHostName.SNAPSHOT:
+            return None
+        store = SnapshotStore.from_env()
+        return store.generation() if store is not None else None
+
+    @staticmethod
+    def create_async(api_host_name: ApiHostName) -> AsyncGraphRepository:
+        return AsyncGraphRepositoryAdapter(GraphRepositoryFactory.create(api_host_name))
@@ -0,0 +1,137 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from infra.metrics import get_metrics
+
+
+@dataclass(frozen=True)
+class HttpPolicy:
+    """API通信の接続プール・タイムアウト・リトライ設定"""
+    pool_size: int = 10
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    retries: int = 3
+    backoff_factor: float = 0.5
+    status_forcelist: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    @classmethod
+    def from_env(cls) -> "HttpPolicy":
+        default = cls()
+        return cls(
+            pool_size=int(os.environ.get("STARRYDATA_HTTP_POOL_SIZE", default.pool_size)),
+            connect_timeout=float(os.environ.get("STARRYDATA_HTTP_CONNECT_TIMEOUT", default.connect_timeout)),
+            read_timeout=float(os.environ.get("STARRYDATA_HTTP_READ_TIMEOUT", default.read_timeout)),
+            retries=int(os.environ.get("STARRYDATA_HTTP_RETRIES", default.retries)),
+            backoff_factor=float(os.environ.get("STARRYDATA_HTTP_BACKOFF_FACTOR", default.backoff_factor)),
+        )
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.connect_timeout, self.read_timeout)
+
+    def retry(self) -> Retry:
+        # GET/HEADは冪等なので、接続失敗・読み込み失敗・一時的なステータスを指数バックオフで再試行する
+        return Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.status_forcelist,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        )
+
+
+class HttpSessionPool:
+    """
+    ホストごとにkeep-aliveのrequests.Sessionを共有する接続プール。
+    同じホストへのリクエストはTCP/TLS接続を再利用し、タイムアウトとリトライの方針を一律に適用する。
+    """
+
+    def __init__(self, policy: Optional[HttpPolicy] = None):
+        self.policy = policy or HttpPolicy()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, url: str) -> requests.Session:
+        host = _host_of(url)
+        session = self._sessions.get(host)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.policy.pool_size,
+                    max_retries=self.policy.retry(),
+                    pool_block=False,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.policy.timeout)
+        return self.session_for(url).get(url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        ホストごとのリクエスト数・新規接続数・接続再利用数を返す。
+        reused が requests に近いほどハンドシェイクが償却できている。
+        """
+        result: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for host, session in sessions:
+            n_requests = 0
+            n_connections = 0
+            adapter = session.get_adapter(host)
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                n_requests += pool.num_requests
+                n_connections += pool.num_connections
+            result[host] = {
+                "requests": n_requests,
+                "connections": n_connections,
+                "reused": max(n_requests - n_connections, 0),
+            }
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+def _host_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+_default_pool: Optional[HttpSessionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> HttpSessionPool:
+    """プロセス全体で共有する接続プールを返す（設定は環境変数から読む）"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HttpSessionPool(HttpPolicy.from_env())
+            get_metrics().register_collector("http", _default_pool.stats)
+        return _default_pool
@@ -0,0 +1,270 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_PREFIX = "starrydata"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@dataclass(frozen=True)
+class SpanRecord:
+    """計測した1つの区間"""
+    name: str
+    seconds: float
+    fields: Dict[str, Any]
+    error: bool = False
+
+
+@dataclass
+class Trace:
+    """1回の処理（ページの1回の描画など）の間に記録された区間とカウンタ"""
+    spans: List[SpanRecord] = field(default_factory=list)
+    counters: Dict[str, float] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, record: SpanRecord) -> None:
+        with self._lock:
+            self.spans.append(record)
+
+    def add_count(self, name: str, value: float) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def total_seconds(self, name: str) -> float:
+        with self._lock:
+            return sum(record.seconds for record in self.spans if record.name == name)
+
+
+# 実行中のtrace（asyncioのタスク・contextvarsをコピーしたスレッドに引き継がれる）
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("metrics_trace", default=None)
+
+
+class _NullSpan:
+    """無効時のspan（何も計らない。共有の1インスタンスを使い回す）"""
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+    def set(self, **fields) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, metrics: "Metrics", name: str, fields: Dict[str, Any]):
+        self._metrics = metrics
+        self._name = name
+        self._fields = fields
+        self._started = 0.0
+
+    def __enter__(self) -> "_Span":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        seconds = time.perf_counter() - self._started
+        self._metrics._record(SpanRecord(self._name, seconds, self._fields, error=exc_type is not None))
+
+    def set(self, **fields) -> None:
+        """区間の途中で分かった値（件数など）を記録に加える"""
+        self._fields.update(fields)
+
+
+class Metrics:
+    """
+    処理段階ごとの所要時間（span）とカウンタを集計する。
+    区間はプロセス全体の集計（回数・合計・最大）に加え、実行中のtraceがあればそこにも記録し、INFOが有効なら1行のJSONでログに出す。
+    無効なとき（既定）はspanが共有の何もしないオブジェクトを返し、countはすぐに戻るので、計測箇所のコストはほぼない。
+    キャッシュなど他の部品の統計はregister_collectorで登録し、snapshot・Prometheus形式の出力に含める。
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._spans: Dict[str, List[float]] = {}  # name -> [回数, 合計秒, 最大秒, エラー回数]
+        self._counters: Dict[str, float] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        return cls(enabled=os.environ.get("STARRYDATA_METRICS", "").lower() in ("1", "true", "yes"))
+
+    def span(self, name: str, **fields):
+        """with文で囲んだ区間の時間を計る（fieldsは構造化ログとtraceに載せる付加情報）"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, fields)
+
+    def count(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_count(name, value)
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        """統計を返す関数を登録する（同じ名前は置き換える）"""
+        with self._lock:
+            self._collectors[name] = collect
+
+    @contextmanager
+    def trace(self) -> Iterator[Optional[Trace]]:
+        """このwith文の中（と、そこから起動したタスク）で記録された区間を集める。無効ならNoneを返す"""
+        if not self.enabled:
+            yield None
+            return
+        trace = Trace()
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = {
+                name: {"count": int(n), "total_seconds": total, "max_seconds": longest, "errors": int(errors)}
+                for name, (n, total, longest, errors) in self._spans.items()
+            }
+            counters = dict(self._counters)
+            collectors = dict(self._collectors)
+        return {"spans": spans, "counters": counters, "collectors": _collect(collectors)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def prometheus_text(self) -> str:
+        """Prometheusのテキスト形式（区間はsummaryの_sum/_countと最大値のgauge、カウンタはcounter、統計はgauge）"""
+        snapshot = self.snapshot()
+        lines = []
+        if snapshot["spans"]:
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_span_seconds summary")
+            for name, span in sorted(snapshot["spans"].items()):
+                label = _labels(span=name)
+                lines.append(f"{PROMETHEUS_PREFIX}_span_seconds_sum{label} {span['total_seconds']!r}")
+                lines.append(f"{PROMETHEUS_PREFIX}_span_seconds_count{label} {span['count']}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_span_seconds_max gauge")
+            for name, span in sorted(snapshot["spans"].items()):
+                lines.append(f"{PROMETHEUS_PREFIX}_span_seconds_max{_labels(span=name)} {span['max_seconds']!r}")
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = f"{PROMETHEUS_PREFIX}_{_metric_name(name)}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value!r}")
+        for collector, stats in sorted(snapshot["collectors"].items()):
+            for key, value in sorted(stats.items()):
+                if isinstance(value, dict):
+                    # ホストごとの統計などは、外側のキーをラベルにする
+                    for inner, inner_value in sorted(value.items()):
+                        if _is_number(inner_value):
+                            metric = f"{PROMETHEUS_PREFIX}_{_metric_name(collector)}_{_metric_name(inner)}"
+                            lines.append(f"{metric}{_labels(key=key)} {float(inner_value)!r}")
+                elif _is_number(value):
+                    lines.append(f"{PROMETHEUS_PREFIX}_{_metric_name(collector)}_{_metric_name(key)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+    def _record(self, record: SpanRecord) -> None:
+        with self._lock:
+            aggregate = self._spans.get(record.name)
+            if aggregate is None:
+                aggregate = self._spans[record.name] = [0, 0.0, 0.0, 0]
+            aggregate[0] += 1
+            aggregate[1] += record.seconds
+            aggregate[2] = max(aggregate[2], record.seconds)
+            aggregate[3] += record.error
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(record)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(
+                {"event": "span", "span": record.name, "seconds": round(record.seconds, 6), "error": record.error, **record.fields},
+                default=str,
+            ))
+
+
+def _collect(collectors: Dict[str, Callable[[], Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    result = {}
+    for name, collect in collectors.items():
+        try:
+            result[name] = collect()
+        except Exception as e:  # 統計の取得失敗で計測全体を止めない
+            logger.warning("metrics collector %s failed: %s", name, e)
+    return result
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels(**labels) -> str:
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels.items())
+    return "{" + body + "}"
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def start_metrics_server(port: int, metrics: Optional[Metrics] = None, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """GET /metrics でPrometheus形式の統計を返すHTTPサーバーをデーモンスレッドで起動する"""
+    metrics = metrics if metrics is not None else get_metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("metrics server: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+_default_metrics = Metrics.from_env()
+_started_server: Optional[ThreadingHTTPServer] = None
+_start_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """プロセス全体で共有する計測器を返す"""
+    return _default_metrics
+
+
+def start_metrics_server_once() -> Optional[ThreadingHTTPServer]:
+    """計測が有効でSTARRYDATA_METRICS_PORTが設定されていれば、プロセスにつき1回だけ/metricsのサーバーを起動する"""
+    global _started_server
+    port = os.environ.get("STARRYDATA_METRICS_PORT")
+    if not port or not _default_metrics.enabled:
+        return None
+    with _start_lock:
+        if _started_server is None:
+            _started_server = start_metrics_server(int(port))
+        return _started_server
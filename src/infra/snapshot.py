@@ -0,0 +1,222 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+from domain.graph import METADATA_COLUMNS, XYSeries
+
+# ファイル形式（1ファイル = 1つのプロパティの組）
+#   magic(8バイト) | ヘッダ長(uint64 LE) | ヘッダ(UTF-8のJSON) | 0埋め | データ部
+# データ部の各領域はALIGNバイト境界に置き、位置はデータ部の先頭からのバイト数でヘッダに書く。
+#   arrays: 数値列（x, y, offsets, updated_at_epoch）と辞書符号化したメタデータ列の位置（codes）
+#   dictionaries: メタデータ列ごとの値の一覧（UTF-8のJSON配列。nullを含みうる）
+MAGIC = b"XYSNAP\x00\x01"
+FORMAT_VERSION = 1
+ALIGN = 64
+SUFFIX = ".xysnap"
+# 世代を切り替えて更新するストアで、現在の世代を指すシンボリックリンクの名前
+CURRENT = "current"
+
+
+_PREAMBLE = struct.Struct("<8sQ")
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """読み込んだスナップショット。seriesの数値列と符号はファイルをmmapしたメモリをそのまま参照する"""
+    property_x: str
+    property_y: str
+    created_at: str
+    metadata: Dict[str, Any]
+    series: XYSeries
+    size: int
+
+
+def write_snapshot(path: str, series: XYSeries, property_x: str, property_y: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+    """
+    XYSeriesをスナップショットとして書き出し、書き込んだバイト数を返す。
+    同じディレクトリの一時ファイルに書いてからrenameするので、読み手が書きかけのファイルを見ることはない。
+    metadataには取得元の情報（ETagや本文のハッシュなど）をJSONで表せる形で渡す。
+    """
+    regions: Dict[str, bytes] = {}
+    arrays: Dict[str, Dict[str, Any]] = {}
+    dictionaries: Dict[str, Dict[str, Any]] = {}
+
+    def add_array(name: str, values: np.ndarray, dtype: str) -> None:
+        regions[f"array:{name}"] = np.ascontiguousarray(values, dtype=dtype).tobytes()
+        arrays[name] = {"dtype": dtype, "count": len(values)}
+
+    add_array("x", series.x, "<f8")
+    add_array("y", series.y, "<f8")
+    add_array("offsets", series.offsets, "<i8")
+    add_array("updated_at_epoch", series.updated_at_epoch.astype("datetime64[us]").view(np.int64), "<i8")
+    for name in METADATA_COLUMNS:
+        values, codes = series.dictionary_encode(name)
+        add_array(f"{name}_codes", codes, "<u4")
+        blob = json.dumps(values.tolist(), ensure_ascii=False).encode("utf-8")
+        regions[f"dictionary:{name}"] = blob
+        dictionaries[name] = {"length": len(blob), "count": len(values)}
+
+    position = 0
+    for region, blob in regions.items():
+        kind, name = region.split(":", 1)
+        (arrays if kind == "array" else dictionaries)[name]["offset"] = position
+        position = _align(position + len(blob))
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "property_x": property_x,
+        "property_y": property_y,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "n_series": len(series),
+        "n_points": series.n_points,
+        "metadata": metadata or {},
+        "arrays": arrays,
+        "dictionaries": dictionaries,
+    }, ensure_ascii=False).encode("utf-8")
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, len(header)))
+            f.write(header)
+            f.write(b"\0" * (data_start - f.tell()))
+            for blob in regions.values():
+                f.write(blob)
+                f.write(b"\0" * (_align(f.tell() - data_start) - (f.tell() - data_start)))
+            size = f.tell()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return size
+
+
+def read_snapshot(path: str) -> Snapshot:
+    """
+    スナップショットをmmapで開く。x, y, offsets, 時刻列, 符号はファイルのページをコピーせずに参照し、
+    メタデータ列（値の一覧のデコードと系列ごとの列）は初めて使われた時に作るので、開く手間は系列数・点数によらない。
+    同じファイルを開いた複数のプロセスはOSのページキャッシュを共有する。
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _PREAMBLE.size:
+            raise ValueError(f"Not a snapshot file: {path}")
+        # mmapはファイルを閉じても有効で、配列が参照している間は解放されない
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header, data_start = _parse_header(buffer, path)
+
+    def array(name: str) -> np.ndarray:
+        spec = header["arrays"][name]
+        return np.frombuffer(buffer, dtype=spec["dtype"], count=spec["count"], offset=data_start + spec["offset"])
+
+    def dictionary(name: str):
+        spec = header["dictionaries"][name]
+        start = data_start + spec["offset"]
+        # 値の一覧は列が初めて使われた時にデコードする
+        return lambda: json.loads(buffer[start:start + spec["length"]])
+
+    series = XYSeries.from_encoded(
+        x=array("x"),
+        y=array("y"),
+        offsets=array("offsets"),
+        dictionaries={name: (dictionary(name), array(f"{name}_codes")) for name in METADATA_COLUMNS},
+        updated_at_epoch=array("updated_at_epoch").view("datetime64[us]"),
+    )
+    return Snapshot(
+        property_x=header["property_x"],
+        property_y=header["property_y"],
+        created_at=header["created_at"],
+        metadata=header["metadata"],
+        series=series,
+        size=size,
+    )
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    """列を開かずにヘッダ（組の名前、系列数、metadataなど）だけを読む"""
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) < _PREAMBLE.size:
+            raise ValueError(f"Not a snapshot file: {path}")
+        return _parse_header(preamble + f.read(_PREAMBLE.unpack(preamble)[1]), path)[0]
+
+
+def _parse_header(buffer, path: str):
+    """ヘッダとデータ部の開始位置を返す"""
+    magic, header_length = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"Not a snapshot file: {path}")
+    header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length]))
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {header.get('format_version')}: {path}")
+    return header, _align(_PREAMBLE.size + header_length)
+
+
+def _align(position: int) -> int:
+    return -(-position // ALIGN) * ALIGN
+
+
+class SnapshotStore:
+    """
+    プロパティの組ごとのスナップショットを置くディレクトリ。
+    プロパティ名には空白や記号が含まれるのでハッシュをファイル名にし、組の名前はファイルのヘッダに持つ。
+    世代ごとに作り直す場合（application.snapshot_builder）は、ルートのcurrent（現在の世代へのシンボリックリンク）を
+    ディレクトリにする。パスは開くたびに解決されるので、世代が切り替わると次に開く組から新しい世代を読む。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @classmethod
+    def from_env(cls) -> Optional["SnapshotStore"]:
+        """STARRYDATA_SNAPSHOT_DIRが設定されていればストアを返す（世代のcurrentがあればそれを使う）"""
+        directory = os.environ.get("STARRYDATA_SNAPSHOT_DIR")
+        if not directory:
+            return None
+        current = os.path.join(directory, CURRENT)
+        return cls(current if os.path.isdir(current) else directory)
+
+    @staticmethod
+    def key(property_x: str, property_y: str) -> str:
+        return hashlib.sha256(f"{property_x}\0{property_y}".encode("utf-8")).hexdigest()[:32]
+
+    def generation(self) -> str:
+        """
+        読んでいる世代の識別子（currentの指す先の実パス）。世代が切り替わると変わるので、
+        スナップショットから読んだ系列をキャッシュする側はこの値が変わったら読み直す。
+        """
+        return os.path.realpath(self.directory)
+
+    def path(self, property_x: str, property_y: str) -> str:
+        return os.path.join(self.directory, self.key(property_x, property_y) + SUFFIX)
+
+    def open(self, property_x: str, property_y: str) -> Optional[Snapshot]:
+        """組のスナップショットを開く（なければNone）"""
+        try:
+            return read_snapshot(self.path(property_x, property_y))
+        except FileNotFoundError:
+            return None
+
+    def write(self, property_x: str, property_y: str, series: XYSeries, metadata: Optional[Dict[str, Any]] = None) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        return write_snapshot(self.path(property_x, property_y), series, property_x, property_y, metadata)
+
+    def __iter__(self) -> Iterator[Snapshot]:
+        """ディレクトリ内のスナップショットを順に開く"""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(SUFFIX) and not name.startswith(".tmp-"):
+                yield read_snapshot(os.path.join(self.directory, name))
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from enum import Enum
+
+from pydantic import BaseModel
+from pydantic_core import from_json
+
+from infra.api_client import XYApiColumns, XYApiResponse
+from infra.xy_stream_decoder import NUMERIC_KEYS, STRING_KEYS
+
+try:
+    import orjson
+except ImportError:  # orjsonは任意の依存（requirements.txtには含めない）
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# json: 標準ライブラリのjson.loads（従来の経路。requestsのレスポンスはresponse.json()で読む）
+# pydantic: pydantic-coreのJSONパーサ。fullでは本文から直接XYApiResponseへ検証しながらデコードする
+# orjson: orjson.loads（インストールされている場合のみ）
+BACKENDS = ("json", "pydantic", "orjson")
+
+
+class Strictness(Enum):
+    # pydanticで全要素の型を検証する
+    FULL = "full"
+    # 信頼できる取得元向け。キーの有無と配列の入れ子の形だけを確かめ、要素の型は検証しない
+    TRUSTED = "trusted"
+
+
+class _XYApiEnvelope(BaseModel):
+    data: XYApiResponse
+
+
+def available_backends() -> tuple:
+    """この環境で使えるバックエンド"""
+    return tuple(name for name in BACKENDS if name != "orjson" or orjson is not None)
+
+
+@dataclass(frozen=True)
+class XYDecoder:
+    """
+    XYデータのレスポンス本文（{"data": {...}}）をXYApiResponse/XYApiColumnsにデコードする設定。
+    backendでJSONパーサを、strictnessで検証の厳しさを選ぶ。
+    TRUSTEDでは検証を形の確認だけにして、pydanticモデルを作らずに型付きバッファへ変換する。
+    """
+    backend: str = "json"
+    strictness: Strictness = Strictness.FULL
+
+    def __post_init__(self):
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown JSON decoder backend: {self.backend}")
+        if self.backend not in available_backends():
+            raise ValueError(f"JSON decoder backend is not installed: {self.backend}")
+
+    @classmethod
+    def from_env(cls) -> "XYDecoder":
+        """
+        STARRYDATA_JSON_DECODER（json/pydantic/orjson/auto、既定はjson）と
+        STARRYDATA_JSON_STRICTNESS（full/trusted、既定はfull）から作る。
+        autoはfullならpydantic、trustedならorjson（なければpydantic）を選ぶ。
+        指定したバックエンドがインストールされていなければ警告してjsonを使う。
+        """
+        strictness = Strictness(os.environ.get("STARRYDATA_JSON_STRICTNESS", "full").strip().lower() or "full")
+        backend = os.environ.get("STARRYDATA_JSON_DECODER", "json").strip().lower() or "json"
+        if backend == "auto":
+            backend = "orjson" if strictness is Strictness.TRUSTED and orjson is not None else "pydantic"
+        if backend in BACKENDS and backend not in available_backends():
+            logger.warning("JSON decoder backend %s is not installed; falling back to json", backend)
+            backend = "json"
+        return cls(backend=backend, strictness=strictness)
+
+    def loads(self, body: bytes) -> object:
+        """本文をPythonのオブジェクトにパースする（検証はしない）"""
+        if self.backend == "orjson":
+            return orjson.loads(body)
+        if self.backend == "pydantic":
+            return from_json(body)
+        return json.loads(body)
+
+    def decode_response(self, body: bytes) -> XYApiResponse:
+        if self.backend == "pydantic" and self.strictness is Strictness.FULL:
+            # パースと検証を1回の走査で行い、中間のdictを作らない
+            return _XYApiEnvelope.model_validate_json(body).data
+        return self._to_response(self.loads(body).get("data", {}))
+
+    def decode_columns(self, body: bytes) -> XYApiColumns:
+        return XYApiColumns.from_response(self.decode_response(body))
+
+    def load_response(self, response) -> XYApiResponse:
+        """requestsのレスポンスを読む。jsonバックエンドは従来どおりresponse.json()（requestsの文字コード判定）を使う"""
+        if self.backend == "json":
+            return self._to_response(response.json().get("data", {}))
+        return self.decode_response(response.content)
+
+    def _to_response(self, data: dict) -> XYApiResponse:
+        if self.strictness is Strictness.FULL:
+            return XYApiResponse(**data)
+        check_shape(data)
+        return XYApiResponse.model_construct(**data)
+
+
+def check_shape(data: object) -> None:
+    """
+    TRUSTED用の形の確認。必須キーがそろい、x, yが配列の配列、文字列の列が配列であることだけを確かめる。
+    数値でない要素はXYApiColumnsへの変換時にnumpyがエラーにする。
+    """
+    if not isinstance(data, dict):
+        raise ValueError("XY data must be an object")
+    missing = [key for key in (*NUMERIC_KEYS, *STRING_KEYS) if key not in data]
+    if missing:
+        raise ValueError(f"XY data is missing fields: {', '.join(missing)}")
+    for key in NUMERIC_KEYS:
+        values = data[key]
+        if not isinstance(values, list) or not all(type(v) is list for v in values):
+            raise ValueError(f"XY data field {key} must be a list of lists")
+    for key in STRING_KEYS:
+        if not isinstance(data[key], list):
+            raise ValueError(f"XY data field {key} must be a list")
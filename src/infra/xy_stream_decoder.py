@@ -0,0 +1,246 @@
+import codecs
+import json
+import re
+import warnings
+from array import array
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from infra.api_client import XYApiColumns
+
+NUMERIC_KEYS = ("x", "y")
+STRING_KEYS = ("updated_at", "SID", "figure_id", "sample_id", "composition")
+NULLABLE_KEYS = ("composition",)
+
+# 消費済みの先頭部分がこの文字数を超えたらバッファを詰める
+_COMPACT_THRESHOLD = 1 << 16
+
+# バッファ内で完結している配列要素の連続をまとめて切り出すための正規表現
+_NUMERIC_ITEM = r"\[[^\[\]]*\]"
+_STRING_ITEM = r'(?:"(?:[^"\\]|\\.)*"|null)'
+_NUMERIC_RUN = re.compile(r"{0}(?:\s*,\s*{0})*".format(_NUMERIC_ITEM))
+_STRING_RUN = re.compile(r"{0}(?:\s*,\s*{0})*".format(_STRING_ITEM))
+_NUMERIC_BODY = re.compile(r"\[([^\[\]]*)\]")
+
+
+class _NeedMoreData(Exception):
+    """バッファ内のデータだけでは次のトークンを読み切れない"""
+
+
+class XYStreamDecoder:
+    """
+    bulk data APIのJSON（{"data": {"x": [[...]], "y": [[...]], "SID": [...], ...}}）を
+    チャンク単位で受け取りながら逐次デコードするパーサ。
+    数値配列は辞書やfloatオブジェクトを経由せずfloat64の連続バッファへ直接書き込むため、
+    ピークメモリは最終データ＋受信中のチャンク程度に収まる。
+    """
+
+    def __init__(self):
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._final = False
+        # パース状態: 現在の階層と、値を読み込み中のキー
+        self._state = "start"
+        self._key: Optional[str] = None
+        self._values: Dict[str, array] = {key: array("d") for key in NUMERIC_KEYS}
+        self._offsets: Dict[str, array] = {key: array("q", [0]) for key in NUMERIC_KEYS}
+        self._strings: Dict[str, List[Optional[str]]] = {}
+        self._seen_keys = set()
+
+    def feed(self, chunk: bytes) -> None:
+        """受信したチャンクを追加し、読み切れる所までデコードする"""
+        self._buf += self._text_decoder.decode(chunk)
+        self._parse()
+
+    def close(self) -> XYApiColumns:
+        """入力の終端を通知し、デコード結果を返す"""
+        self._buf += self._text_decoder.decode(b"", final=True)
+        self._final = True
+        self._parse()
+        if self._state != "done":
+            raise ValueError("Unexpected end of JSON input while decoding xy data")
+        missing = [key for key in NUMERIC_KEYS + STRING_KEYS if key not in self._seen_keys]
+        if missing:
+            raise ValueError("xy data response is missing required fields: {}".format(", ".join(missing)))
+        return XYApiColumns(
+            x=np.frombuffer(self._values["x"], dtype=np.float64),
+            x_offsets=np.frombuffer(self._offsets["x"], dtype=np.int64),
+            y=np.frombuffer(self._values["y"], dtype=np.float64),
+            y_offsets=np.frombuffer(self._offsets["y"], dtype=np.int64),
+            updated_at=self._strings["updated_at"],
+            SID=self._strings["SID"],
+            figure_id=self._strings["figure_id"],
+            sample_id=self._strings["sample_id"],
+            composition=self._strings["composition"],
+        )
+
+    # --- 内部処理 ---
+
+    def _parse(self) -> None:
+        while self._state != "done":
+            saved_pos = self._pos
+            try:
+                self._step()
+            except _NeedMoreData:
+                self._pos = saved_pos
+                if self._final:
+                    raise ValueError("Unexpected end of JSON input while decoding xy data")
+                break
+        if self._pos > _COMPACT_THRESHOLD:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+
+    def _step(self) -> None:
+        state = self._state
+        if state == "start":
+            self._expect("{")
+            self._state = "top_key"
+        elif state == "top_key":
+            key = self._read_key_or_end("done")
+            if key is None:
+                return
+            if key == "data":
+                self._expect("{")
+                self._state = "data_key"
+            else:
+                self._skip_value()
+        elif state == "data_key":
+            key = self._read_key_or_end("top_key")
+            if key is None:
+                return
+            if key in NUMERIC_KEYS or key in STRING_KEYS:
+                self._expect("[")
+                self._key = key
+                self._seen_keys.add(key)
+                if key in STRING_KEYS:
+                    self._strings[key] = []
+                self._state = "array_first"
+            else:
+                self._skip_value()
+        elif state in ("array_first", "array_next"):
+            self._read_array_item()
+
+    def _read_key_or_end(self, end_state: str) -> Optional[str]:
+        """オブジェクトの次のキーを読む。閉じ括弧ならend_stateへ遷移してNoneを返す"""
+        ch = self._peek()
+        if ch == ",":
+            self._pos = self._skip_ws(self._pos + 1)
+            ch = self._peek()
+        if ch == "}":
+            self._pos += 1
+            self._state = end_state
+            return None
+        key = self._decode_value()
+        if not isinstance(key, str):
+            raise ValueError("Expected a string key in xy data JSON at position {}".format(self._pos))
+        self._expect(":")
+        return key
+
+    def _read_array_item(self) -> None:
+        """
+        現在のキーの配列要素を読み込む。
+        バッファ内で完結している要素の連続は正規表現で切り出してまとめてデコードし、
+        末尾で途切れている要素は次のチャンクが届いてから読み直す。
+        """
+        key = self._key
+        ch = self._peek()
+        if ch == "]":
+            self._pos += 1
+            self._key = None
+            self._state = "data_key"
+            return
+        if self._state == "array_next":
+            if ch != ",":
+                raise ValueError("Expected ',' or ']' in xy data JSON at position {}".format(self._pos))
+            self._pos = self._skip_ws(self._pos + 1)
+        is_numeric = key in NUMERIC_KEYS
+        run = (_NUMERIC_RUN if is_numeric else _STRING_RUN).match(self._buf, self._pos)
+        if run is None:
+            # 要素単体で読み、途切れ（追加データ待ち）と不正な値を区別する
+            if is_numeric:
+                self._read_numeric_list(key)
+            else:
+                self._read_string_item(key)
+        elif is_numeric:
+            self._append_numeric_lists(key, _NUMERIC_BODY.findall(run.group(0)))
+            self._pos = run.end()
+        else:
+            for value in json.loads("[" + run.group(0) + "]"):
+                self._append_string(key, value)
+            self._pos = run.end()
+        self._state = "array_next"
+
+    def _read_numeric_list(self, key: str) -> None:
+        if self._peek() != "[":
+            raise ValueError("Expected a list of numbers for '{}' at position {}".format(key, self._pos))
+        # 数値のリストは入れ子も文字列も含まないので、閉じ括弧の検索だけで範囲が確定する
+        end = self._buf.find("]", self._pos)
+        if end < 0:
+            raise _NeedMoreData()
+        self._append_numeric_lists(key, [self._buf[self._pos + 1:end]])
+        self._pos = end + 1
+
+    def _append_numeric_lists(self, key: str, bodies: List[str]) -> None:
+        """内側リストの中身（"1.0, 2.0"など）の並びを数値バッファとオフセットに追記する"""
+        counts = [body.count(",") + 1 if body.strip() else 0 for body in bodies]
+        joined = ",".join(body for body, count in zip(bodies, counts) if count)
+        values = np.empty(0, dtype=np.float64)
+        if joined:
+            with warnings.catch_warnings():
+                # 数値以外が混じるとNumPyは途中までの結果とDeprecationWarningを返すので、エラーとして扱う
+                warnings.simplefilter("error", DeprecationWarning)
+                try:
+                    values = np.fromstring(joined, dtype=np.float64, sep=",")
+                except (DeprecationWarning, ValueError):
+                    values = None
+        if values is None or len(values) != sum(counts):
+            raise ValueError("Invalid number in '{}' list near position {}".format(key, self._pos))
+        buffer = self._values[key]
+        base = len(buffer)
+        buffer.frombytes(values.tobytes())
+        self._offsets[key].frombytes((np.cumsum(counts, dtype=np.int64) + base).tobytes())
+
+    def _read_string_item(self, key: str) -> None:
+        self._append_string(key, self._decode_value())
+
+    def _append_string(self, key: str, value) -> None:
+        if value is None and key not in NULLABLE_KEYS:
+            raise ValueError("'{}' must not contain null values".format(key))
+        if value is not None and not isinstance(value, str):
+            raise ValueError("'{}' must contain only strings".format(key))
+        self._strings[key].append(value)
+
+    def _skip_value(self) -> None:
+        self._decode_value()
+
+    def _decode_value(self):
+        """バッファ上の次のJSON値を1つデコードする（末尾で途切れている可能性があれば追加データを待つ）"""
+        try:
+            value, end = self._json.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            raise _NeedMoreData()
+        # 数値リテラルなどはバッファ末尾で切れていても成功してしまうため、後続文字が来るまで確定しない
+        if end >= len(self._buf) and not self._final:
+            raise _NeedMoreData()
+        self._pos = self._skip_ws(end)
+        return value
+
+    def _expect(self, token: str) -> None:
+        if self._peek() != token:
+            raise ValueError("Expected '{}' in xy data JSON at position {}".format(token, self._pos))
+        self._pos = self._skip_ws(self._pos + 1)
+
+    def _peek(self) -> str:
+        self._pos = self._skip_ws(self._pos)
+        if self._pos >= len(self._buf):
+            raise _NeedMoreData()
+        return self._buf[self._pos]
+
+    def _skip_ws(self, pos: int) -> int:
+        buf = self._buf
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        return pos
@@ -1,12 +1,46 @@
+import threading
+import weakref
+from typing import Dict, Optional
+
+import numpy as np
+from bokeh.layouts import column
 from bokeh.plotting import figure
-from bokeh.models import HoverTool, ColumnDataSource, Range1d
+from bokeh.core.property.validation import validate
+from bokeh.models import CustomJSHover, HoverTool, ColumnDataSource, LinearColorMapper, Range1d
 
 from application.graph_data_service import GraphDataService, XYSeriesDTO, XYPointsDTO
+from application.viewport_culling import CullResult, ViewportCulling
 from domain.graph import Graph, Axis, AxisType, AxisRange
+from domain.timestamps import to_epoch_millis
+from infra.metrics import get_metrics
+from presentation.client_highlight import ClientDateHighlight
+from presentation.level_of_detail import LevelOfDetail, LodResult
+from presentation.wire_format import WireFormat, compact_dictionary, log_document_size, narrow_codes
+
+# updated_at列（UTCのエポックミリ秒）をJSTの表示文字列にする。ツールチップに表示される点についてだけブラウザで実行される
+UPDATED_AT_FORMATTER_CODE = """
+if (value == null || isNaN(value)) { return ""; }
+const jst = new Date(value + 9 * 60 * 60 * 1000);
+return jst.toISOString().slice(0, 19) + "+0900";
+"""
+# sid_code列（SIDの辞書の位置）をSID文字列に戻す
+SID_FORMATTER_CODE = "return sids[value];"
+# highlight列（0: 非ハイライト, 1: ハイライト）の色
+HIGHLIGHT_PALETTE = ["gray", "red"]
+
+# DTOごとの点単位の列（DTOが生きている間だけ保持する。ページ側でDTOをキャッシュすれば軸の変更で作り直さない）
+_point_columns_cache: "weakref.WeakKeyDictionary[XYSeriesDTO, Dict[str, np.ndarray]]" = weakref.WeakKeyDictionary()
+_point_columns_lock = threading.Lock()
+
 
 class BokehGraphCreator():
-    def __init__(self, graph_data_service: GraphDataService = GraphDataService()):
+    def __init__(self, graph_data_service: GraphDataService = GraphDataService(), wire_format: Optional[WireFormat] = None):
         self.graph_data_service = graph_data_service
+        # ブラウザに送る列の型（x/yをfloat32にしてよいかの軸ごとの許容誤差）
+        self.wire_format = wire_format if wire_format is not None else WireFormat.from_env()
+        # 直近のcreate_bokeh_figureでのカリング・間引きの結果（行わなかった場合はNone）
+        self.last_cull_result: Optional[CullResult] = None
+        self.last_lod_result: Optional[LodResult] = None
 
     def get_xy_series_with_axis(self, prop_x: str, prop_y: str, unit_x: str = "", unit_y: str = "") -> XYSeriesDTO:
         merged_data_dto = self.graph_data_service.get_merged_graph_data(prop_x, prop_y, unit_x, unit_y)
@@ -19,7 +53,43 @@ class BokehGraphCreator():
             return "log"
         return "linear" # デフォルトはlinear
 
-    def create_bokeh_figure(self, x_axis: Axis, y_axis: Axis, highlight_condition=None):
+    def create_bokeh_figure(
+        self,
+        x_axis: Axis,
+        y_axis: Axis,
+        highlight_condition=None,
+        level_of_detail: Optional[LevelOfDetail] = None,
+        viewport_culling: Optional[ViewportCulling] = None,
+    ):
+        """
+        viewport_cullingを渡すと、軸の表示範囲（+余白）の外の点と対数軸で0以下の点を落としてから送る。
+        level_of_detailを渡すと、軸の表示範囲とピクセル数に応じて点を間引いてから送る。
+        表示範囲を変えて再実行すると、その範囲の解像度で間引き直す。
+        """
+        # highlight_conditionがあれば渡す
+        if highlight_condition is not None:
+            xy_series_dto = self.graph_data_service.get_merged_graph_data(
+                x_axis.property, y_axis.property, x_axis.unit, y_axis.unit, highlight_condition=highlight_condition
+            )
+        else:
+            xy_series_dto = self.get_xy_series_with_axis(x_axis.property, y_axis.property, x_axis.unit, y_axis.unit)
+        return self.create_bokeh_figure_from_dto(xy_series_dto, x_axis, y_axis, level_of_detail, viewport_culling)
+
+    def create_bokeh_figure_from_dto(
+        self,
+        xy_series_dto: XYSeriesDTO,
+        x_axis: Axis,
+        y_axis: Axis,
+        level_of_detail: Optional[LevelOfDetail] = None,
+        viewport_culling: Optional[ViewportCulling] = None,
+        client_highlight: Optional[ClientDateHighlight] = None,
+    ):
+        """
+        取得済みのDTOから図を作る（データの取得・パースは行わない）。
+        点単位の列はDTOごとに1回だけ作るので、軸の範囲・スケールを変えたときはカリング・間引きと型の変換だけを行う。
+        client_highlightを渡すと、ハイライトをブラウザ側で行い、期間を選ぶピッカーと図を縦に並べたレイアウトを返す
+        （このとき間引きはピッカーで選べる期間に更新された点を残し、期間が限られていなければ間引かない）。
+        """
         p = figure(
             title=f"{x_axis.property} vs {y_axis.property}",
             x_axis_type=x_axis.axis_type.value,
@@ -29,15 +99,39 @@ class BokehGraphCreator():
             x_axis_label=f"{x_axis.property} ({x_axis.unit})",
             y_axis_label=f"{y_axis.property} ({y_axis.unit})",
         )
-
-        # highlight_conditionがあれば渡す
-        if highlight_condition is not None:
-            xy_series_dto = self.graph_data_service.get_merged_graph_data(
-                x_axis.property, y_axis.property, x_axis.unit, y_axis.unit, highlight_condition=highlight_condition
-            )
-        else:
-            xy_series_dto = self.get_xy_series_with_axis(x_axis.property, y_axis.property, x_axis.unit, y_axis.unit)
-        column_data_source = self.create_bokeh_data_source(xy_series_dto)
+        metrics = get_metrics()
+        columns = self.point_columns(xy_series_dto)
+        point_indices = None
+        self.last_cull_result = None
+        if viewport_culling is not None:
+            with metrics.span("cull"):
+                self.last_cull_result = viewport_culling.point_mask(columns["x"], columns["y"], x_axis, y_axis)
+                point_indices = np.flatnonzero(self.last_cull_result.keep)
+        self.last_lod_result = None
+        if level_of_detail is not None:
+            def selected(name):
+                return columns[name] if point_indices is None else columns[name][point_indices]
+            keep = selected("highlight").astype(bool)
+            if client_highlight is not None:
+                client_keep = client_highlight.lod_keep(selected("updated_at"))
+                # 選べる期間が限られていなければ、どの点もブラウザでハイライトされうるので間引かない
+                keep = None if client_keep is None else keep | client_keep
+            if keep is not None:
+                with metrics.span("lod"):
+                    self.last_lod_result = level_of_detail.decimate(selected("x"), selected("y"), x_axis, y_axis, keep=keep)
+                lod_indices = self.last_lod_result.indices
+                point_indices = lod_indices if point_indices is None else point_indices[lod_indices]
+        with metrics.span("cds") as span:
+            sids, _ = xy_series_dto.series.dictionary_encode("sid")
+            sent = columns
+            if point_indices is not None:
+                sent = {name: values[point_indices] for name, values in columns.items()}
+                # 送る点が参照するSIDだけの辞書に符号化し直す（ツールチップに全系列のSIDを送らない）
+                sent["sid_code"], sids = compact_dictionary(sent["sid_code"], sids)
+            column_data_source = self._data_source(sent, None, x_axis, y_axis)
+            n_sent = len(sent["x"])
+            span.set(points=n_sent, sids=len(sids))
+        metrics.count("points_sent", n_sent)
         renderer = p.scatter(
             "x",
             "y",
@@ -45,29 +139,74 @@ class BokehGraphCreator():
             fill_alpha=1,
             size=2,
             line_width=0,
-            color="color",  # 色分けのためにcolor列を指定
+            # highlight列を色に写像して色分けする
+            color={"field": "highlight", "transform": LinearColorMapper(palette=HIGHLIGHT_PALETTE, low=0, high=1)},
+        )
+        hover = HoverTool(
+            tooltips=[("SID", "@sid_code{custom}"), ("Updated", "@updated_at{custom}")],
+            formatters={
+                "@sid_code": CustomJSHover(args=dict(sids=sids.tolist()), code=SID_FORMATTER_CODE),
+                "@updated_at": CustomJSHover(code=UPDATED_AT_FORMATTER_CODE),
+            },
+            renderers=[renderer],
+            mode="mouse",
+            point_policy="follow_mouse",
         )
-        hover = HoverTool(tooltips=[("SID", "@SID")], renderers=[renderer], mode="mouse", point_policy="follow_mouse")
         p.add_tools(hover)
+        log_document_size(p, f"{x_axis.property} - {y_axis.property}")
+        if client_highlight is not None:
+            picker = client_highlight.attach(p, column_data_source, renderer)
+            return column(picker, p, sizing_mode="stretch_width")
         return p
 
-    def create_bokeh_data_source(self, xy_series_dto: XYSeriesDTO) -> ColumnDataSource:
-        from itertools import chain
-        # XYPointsDTOごとにis_highlightedを展開
-        all_points = []
-        color = []
-        for dto in xy_series_dto.data:
-            all_points.extend(dto.data)
-            color.extend(["red" if dto.is_highlighted else "gray"] * len(dto.data))
-        # SIDを各点に割り当てる
-        sid_list = []
-        for dto in xy_series_dto.data:
-            sid_list.extend([dto.sid] * len(dto.data))
-        data = dict(
-            x=[point.x for point in all_points],
-            y=[point.y for point in all_points],
-            SID=sid_list,
-            color=color,
-        )
-        return ColumnDataSource(data=data)
+    def create_bokeh_data_source(
+        self,
+        xy_series_dto: XYSeriesDTO,
+        point_indices: Optional[np.ndarray] = None,
+        x_axis: Optional[Axis] = None,
+        y_axis: Optional[Axis] = None,
+    ) -> ColumnDataSource:
+        """
+        列配列から直接ColumnDataSourceを作る（数値列はNumPy配列のままバイナリで送られる）。
+        point_indicesを渡すとその位置の点だけを送る。軸を渡すと、許容誤差内ならx/yをfloat32で送る。
+        """
+        return self._data_source(self.point_columns(xy_series_dto), point_indices, x_axis, y_axis)
+
+    def point_columns(self, xy_series_dto: XYSeriesDTO) -> Dict[str, np.ndarray]:
+        """
+        DTOを点単位の列にする（DTOごとにキャッシュする）。
+        色は点ごとの文字列ではなくhighlight列（uint8）をカラーマッパーで写像し、
+        SIDは辞書（dictionary_encodeの値の一覧）の位置sid_codeとして、辞書の大きさに収まる最小の整数型で持つ。
+        """
+        with _point_columns_lock:
+            columns = _point_columns_cache.get(xy_series_dto)
+        if columns is not None:
+            return columns
+        series = xy_series_dto.series
+        with get_metrics().span("point_columns", points=series.n_points):
+            lengths = series.lengths()
+            sids, sid_codes = series.dictionary_encode("sid")
+            columns = dict(
+                x=series.x,
+                y=series.y,
+                highlight=np.repeat(xy_series_dto.is_highlighted.astype(np.uint8), lengths),
+                sid_code=np.repeat(narrow_codes(sid_codes, len(sids)), lengths),
+                updated_at=np.repeat(to_epoch_millis(series.updated_at_epoch), lengths),
+            )
+        with _point_columns_lock:
+            _point_columns_cache[xy_series_dto] = columns
+        return columns
 
+    def _data_source(
+        self,
+        columns: Dict[str, np.ndarray],
+        point_indices: Optional[np.ndarray],
+        x_axis: Optional[Axis],
+        y_axis: Optional[Axis],
+    ) -> ColumnDataSource:
+        data = dict(columns) if point_indices is None else {name: column[point_indices] for name, column in columns.items()}
+        data["x"] = self.wire_format.encode_x(data["x"], x_axis)
+        data["y"] = self.wire_format.encode_y(data["y"], y_axis)
+        # 列は型の決まったNumPy配列なので、要素ごとにPythonで回るBokehのプロパティ検証は行わない
+        with validate(False):
+            return ColumnDataSource(data=data)
@@ -0,0 +1,70 @@
+import datetime
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from bokeh.models import CDSView, ColumnDataSource, CustomJS, CustomJSFilter, DateRangePicker, GlyphRenderer
+
+# sourceはフィルター対象のデータソース（Bokehが渡す）。updated_at列（UTCのエポックミリ秒）が、ピッカーの期間（ブラウザのタイムゾーンでの開始日0時〜終了日の翌日0時）にある点を返す
+DATE_RANGE_FILTER_CODE = """
+const value = picker.value;
+if (value == null || value[0] == null || value[1] == null) { return []; }
+const toDay = (v) => typeof v === "number" ? new Date(v).toISOString().slice(0, 10) : String(v).slice(0, 10);
+const start = new Date(toDay(value[0]) + "T00:00:00").getTime();
+const endDate = new Date(toDay(value[1]) + "T00:00:00");
+endDate.setDate(endDate.getDate() + 1);
+const end = endDate.getTime();
+const updatedAt = source.data.updated_at;
+const indices = [];
+for (let i = 0; i < updatedAt.length; i++) {
+    const t = updatedAt[i];
+    if (t >= start && t < end) { indices.push(i); }
+}
+return indices;
+"""
+# 期間が変わったらハイライト用のビューだけを計算し直す（データソース全体の更新は起こさない）
+REFILTER_CODE = "date_filter.change.emit();"
+
+
+@dataclass(frozen=True)
+class ClientDateHighlight:
+    """
+    ハイライトをブラウザ側で行うモード。
+    CDSのupdated_at列をCustomJSFilterで絞り込んだビューを、全点の上にハイライト色で重ねて描く。
+    期間はBokehのDateRangePickerで選び、変更してもサーバーへの往復（Streamlitの再実行）は起きない。
+    min_dateを指定すると、ピッカーで選べる期間をその日以降に限り、間引きでもその日以降に更新された点を残す
+    （指定しなければどの点もハイライトされうるので、サーバー側の間引きは行わない）。
+    """
+    date_from: Optional[datetime.date] = None
+    date_to: Optional[datetime.date] = None
+    color: str = "red"
+    min_date: Optional[datetime.date] = None
+
+    def lod_keep(self, updated_at_millis: np.ndarray) -> Optional[np.ndarray]:
+        """
+        間引きで残すべき点（選べる期間に更新された点）のマスク。min_dateがなければNone（間引かない）。
+        ピッカーの日付はブラウザのタイムゾーンで解釈されるので、UTCの前日0時から残す。
+        """
+        if self.min_date is None:
+            return None
+        cutoff = datetime.datetime.combine(self.min_date - datetime.timedelta(days=1), datetime.time(), datetime.timezone.utc)
+        return np.asarray(updated_at_millis) >= cutoff.timestamp() * 1000
+
+    def attach(self, p, source: ColumnDataSource, base_renderer: GlyphRenderer) -> DateRangePicker:
+        """図にハイライト用のレンダラーを追加し、期間を選ぶピッカーを返す"""
+        value = (self.date_from, self.date_to) if self.date_from and self.date_to else None
+        picker = DateRangePicker(title="Highlight", value=value, min_date=self.min_date)
+        date_filter = CustomJSFilter(args=dict(picker=picker), code=DATE_RANGE_FILTER_CODE)
+        glyph = base_renderer.glyph
+        p.scatter(
+            "x",
+            "y",
+            source=source,
+            view=CDSView(filter=date_filter),
+            fill_alpha=1,
+            size=glyph.size,
+            line_width=0,
+            color=self.color,
+        )
+        picker.js_on_change("value", CustomJS(args=dict(date_filter=date_filter), code=REFILTER_CODE))
+        return picker
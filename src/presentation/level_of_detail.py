@@ -0,0 +1,127 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from domain.graph import Axis
+
+DEFAULT_POINT_BUDGET = 200_000
+
+
+@dataclass(frozen=True)
+class LodResult:
+    """間引きの結果"""
+    indices: np.ndarray  # 送る点の位置（元の点の順序を保つ）
+    n_input: int         # 間引き前の点数
+    n_forced: int        # ハイライトとして予算と関係なく残した点数
+    cell_px: int         # 最終的に使ったセルの大きさ（ピクセル）
+
+    @property
+    def n_output(self) -> int:
+        return len(self.indices)
+
+
+@dataclass(frozen=True)
+class LevelOfDetail:
+    """
+    表示範囲とピクセル数から画面をcell_px四方のセルに区切り、セルごとにmax_per_cell点だけ残す間引き。
+    疎なセル（点数がoutlier_max_count以下）にある外れ値もそのセルの大きさで残す。
+    ハイライトされた点は必ず残し、それ以外（外れ値を含む）がpoint_budgetからハイライトの点数を引いた予算を
+    超える場合はセルを2倍ずつ大きくして予算内に収める（最大のセルでも超える分は等間隔に間引く）。
+    表示範囲の外も上下左右1画面分までは同じ格子で間引くので、ブラウザ側でパンしても周辺の分布は見える
+    （それより遠い点は格子の端のセルにまとめる）。
+    """
+    width_px: int = 600
+    height_px: int = 600
+    cell_px: int = 2
+    max_per_cell: int = 1
+    outlier_max_count: int = 1
+    point_budget: int = DEFAULT_POINT_BUDGET
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "LevelOfDetail":
+        kwargs.setdefault("point_budget", int(os.environ.get("STARRYDATA_LOD_POINT_BUDGET", DEFAULT_POINT_BUDGET)))
+        return cls(**kwargs)
+
+    def decimate(self, x: np.ndarray, y: np.ndarray, x_axis: Axis, y_axis: Axis, keep: Optional[np.ndarray] = None) -> LodResult:
+        n = len(x)
+        px = _to_pixels(x, x_axis, self.width_px)
+        py = _to_pixels(y, y_axis, self.height_px)
+        # 対数軸の0以下など、描画できない点は送らない
+        drawable = np.isfinite(px) & np.isfinite(py)
+        forced = np.zeros(n, dtype=bool) if keep is None else np.asarray(keep, dtype=bool) & drawable
+
+        cell_px = max(self.cell_px, 1)
+        candidates = np.flatnonzero(drawable & ~forced)
+        n_forced = int(forced.sum())
+
+        # 外れ値もハイライト以外の点と同じく予算に数え、予算に収まらなければセルを大きくして判定し直す
+        budget = max(self.point_budget - n_forced, 0)
+        selected = np.empty(0, dtype=np.int64)
+        while len(candidates) and budget:
+            selected = candidates[self._select(px[candidates], py[candidates], cell_px)]
+            if len(selected) <= budget or cell_px >= max(self.width_px, self.height_px):
+                break
+            cell_px *= 2
+        if len(selected) > budget:
+            # 最大のセルでも収まらなければ等間隔に間引く
+            selected = selected[np.linspace(0, len(selected) - 1, budget).astype(np.int64)] if budget else selected[:0]
+
+        indices = np.union1d(np.flatnonzero(forced), selected)
+        return LodResult(indices=indices, n_input=n, n_forced=n_forced, cell_px=cell_px)
+
+    def _select(self, px: np.ndarray, py: np.ndarray, cell_px: int) -> np.ndarray:
+        """cell_px四方のセルごとに先頭からmax_per_cell点と、疎なセル（点数がoutlier_max_count以下）の点の位置（昇順）"""
+        cell, n_cells = self._cells(px, py, cell_px)
+        selected = _first_per_cell(cell, n_cells, self.max_per_cell)
+        if self.outlier_max_count > self.max_per_cell:
+            isolated = np.flatnonzero(np.bincount(cell, minlength=n_cells)[cell] <= self.outlier_max_count)
+            selected = np.union1d(selected, isolated)
+        return selected
+
+    def _cells(self, px: np.ndarray, py: np.ndarray, cell_px: int):
+        """各点のセル番号と、セルの総数（表示範囲の上下左右1画面分を含む3x3画面の格子）"""
+        nx = -(-self.width_px // cell_px)
+        ny = -(-self.height_px // cell_px)
+        cx = np.clip(np.floor(px / cell_px) + nx, 0, 3 * nx - 1).astype(np.int64)
+        cy = np.clip(np.floor(py / cell_px) + ny, 0, 3 * ny - 1).astype(np.int64)
+        return cx * (3 * ny) + cy, 9 * nx * ny
+
+
+def _to_pixels(values: np.ndarray, axis: Axis, size_px: int) -> np.ndarray:
+    """
+    値を表示範囲の左端（下端）からのピクセル位置にする（範囲外は負や size_px 以上になる）。
+    対数軸で範囲の端が0以下の場合など、範囲から幅が決まらなければデータの（正の値の）範囲を使う。
+    """
+    lo, hi = axis.axis_range.min_value, axis.axis_range.max_value
+    values = np.asarray(values, dtype=np.float64)
+    if axis.axis_type.is_log():
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.where(values > 0, np.log10(values), np.nan)
+            lo, hi = (np.log10(lo) if lo > 0 else np.nan), (np.log10(hi) if hi > 0 else np.nan)
+    if not np.isfinite(hi - lo) or hi <= lo:
+        finite = values[np.isfinite(values)]
+        if len(finite) == 0:
+            return np.zeros_like(values)
+        data_lo, data_hi = float(finite.min()), float(finite.max())
+        lo = lo if np.isfinite(lo) and lo < data_hi else data_lo
+        hi = hi if np.isfinite(hi) and hi > lo else data_hi
+    span = hi - lo
+    if not np.isfinite(span) or span <= 0:
+        return np.zeros_like(values)
+    return (values - lo) / span * size_px
+
+
+def _first_per_cell(cell: np.ndarray, n_cells: int, max_per_cell: int) -> np.ndarray:
+    """セルごとに先頭からmax_per_cell点の位置（昇順）"""
+    if max_per_cell == 1:
+        # 逆順に書き込むと、重複したセルには最後に書いた値（＝先頭の点）が残る
+        first = np.full(n_cells, -1, dtype=np.int64)
+        first[cell[::-1]] = np.arange(len(cell) - 1, -1, -1)
+        return np.sort(first[first >= 0])
+    order = np.argsort(cell, kind="stable")
+    sorted_cell = cell[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cell[1:] != sorted_cell[:-1]])
+    rank = np.arange(len(cell)) - np.repeat(starts, np.diff(np.r_[starts, len(cell)]))
+    return np.sort(order[rank < max_per_cell])
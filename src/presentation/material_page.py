@@ -1,17 +1,82 @@
 import os
+import threading
+from typing import Dict, Tuple
+
 import streamlit as st
 from streamlit_javascript import st_javascript
-import datetime
-import pytz
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from presentation.bokeh_graph_creator import BokehGraphCreator
+from presentation.client_highlight import ClientDateHighlight
+from presentation.level_of_detail import LevelOfDetail
+from application.viewport_culling import ViewportCulling
+from application.cache_warmer import start_cache_warmer_once
+from application.graph_data_service import GraphDataService, XYSeriesDTO
+from infra.metrics import Trace, get_metrics, start_metrics_server_once
 from streamlit_bokeh import streamlit_bokeh
 
 from domain.material_type import MaterialType
 from domain.graph import Axis, AxisRange, AxisType
 from domain.graph_config_factory import get_graph_configs
-from domain.graph import DateHighlightCondition
+from domain.graph import DateHighlightCondition, XYSeries
+
+
+# 取得・パース済みの系列と連結結果はプロセス共有のSeriesStore（合計サイズに上限がある）がセッション間で共有する。
+# ここでは重ねてキャッシュしない（deltaの有効期限が切れると、次の再実行で最新データを取り込む）。
+def load_merged_series(prop_x: str, prop_y: str, unit_x: str, unit_y: str) -> XYSeries:
+    with st.spinner("Loading data..."):
+        return GraphDataService().load_merged_series(prop_x, prop_y, unit_x, unit_y)
+
+
+# ハイライト適用後のDTOは組ごとに最新の1つだけを残す。条件があるとDTOは連結済み系列を並べ替えたコピーを持つので、
+# 条件ごとには溜めない。軸の範囲・スケールだけを変えた再実行ではこのDTOと点単位の列がそのまま使われる。
+_highlighted: Dict[Tuple[str, str, str, str], Tuple[tuple, XYSeriesDTO]] = {}
+_highlighted_lock = threading.Lock()
+
+
+def highlight_series(pair: Tuple[str, str, str, str], date_from: str, date_to: str, timezone: str, series: XYSeries) -> XYSeriesDTO:
+    """pairは (prop_x, prop_y, unit_x, unit_y)。同じ組で系列のversionとハイライト条件が同じなら前回のDTOを返す"""
+    key = (series.version, date_from, date_to, timezone)
+    with _highlighted_lock:
+        cached = _highlighted.get(pair)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    highlight_condition = None
+    if date_from and date_to:
+        # 日付の区切り（0時〜翌0時）はブラウザのタイムゾーンで判定する
+        highlight_condition = DateHighlightCondition(date_from=date_from, date_to=date_to, timezone=timezone)
+    dto = GraphDataService().highlight(series, highlight_condition)
+    with _highlighted_lock:
+        _highlighted[pair] = (key, dto)
+    return dto
+
+
+def main(material_type: MaterialType, point_budget: int = None):
+    """point_budgetはページごとの送信点数の上限の既定値（省略時はSTARRYDATA_LOD_POINT_BUDGET）"""
+    # STARRYDATA_CACHE_WARMERが有効なら、全グラフのbulk dataをバックグラウンドで温める（プロセスにつき1回）
+    start_cache_warmer_once()
+    # STARRYDATA_METRICSとSTARRYDATA_METRICS_PORTが設定されていれば、/metricsを公開する（プロセスにつき1回）
+    start_metrics_server_once()
+
+    # 計測が有効なら、この描画で実行された段階の時間をデバッグ用のパネルに出す
+    with get_metrics().trace() as trace:
+        render(material_type, point_budget)
+    if trace is not None:
+        show_metrics(trace)
+
 
-def main(material_type: MaterialType):
+def show_metrics(trace: Trace):
+    with st.expander("Debug: timings", expanded=False):
+        # キャッシュから返した段階は実行されないので表に出ない
+        st.dataframe(
+            [{"stage": r.name, "ms": round(r.seconds * 1000, 1), "error": r.error, **r.fields} for r in trace.spans],
+            use_container_width=True,
+        )
+        if trace.counters:
+            st.json(trace.counters)
+        st.json(get_metrics().snapshot()["collectors"])
+
+
+def render(material_type: MaterialType, point_budget: int = None):
     # configファイルをPythonファイルから読み込む
     CONFIG_GRAPHS = get_graph_configs(material_type)
 
@@ -28,6 +93,8 @@ def main(material_type: MaterialType):
             date_from = st.date_input("From", key="main_date_from")
         with col2:
             date_to = st.date_input("To", key="main_date_to")
+        # ブラウザ側でハイライトする場合、ここの日付は初期値になり、以降は図の上のピッカーで期間を変える（再実行なし）
+        highlight_in_browser = st.checkbox("Highlight in browser", value=False, key=f"client_highlight_{material_type.value}")
         # (Add more highlight conditions here in the future)
 
     # JavaScriptでブラウザのタイムゾーンを取得
@@ -35,15 +102,10 @@ def main(material_type: MaterialType):
     if not user_timezone_str:
         user_timezone_str = "UTC"  # 取得できなければUTCをデフォルトに
 
-    user_timezone = pytz.timezone(user_timezone_str)
-
-    if date_from:
-        date_from_dt = datetime.datetime.combine(date_from, datetime.time(0, 0, 0))
-        date_from_dt = user_timezone.localize(date_from_dt)
-
-    if date_to:
-        date_to_dt = datetime.datetime.combine(date_to, datetime.time(23, 59, 59))
-        date_to_dt = user_timezone.localize(date_to_dt)
+    try:
+        ZoneInfo(user_timezone_str)
+    except (ZoneInfoNotFoundError, ValueError):
+        user_timezone_str = "UTC"
     prop_x, prop_y = selected_graph
 
     config = next(
@@ -60,6 +122,20 @@ def main(material_type: MaterialType):
     x_type = st.sidebar.selectbox("X Axis Scale", ["linear", "log"], index=0 if x_axis.axis_type.value=="linear" else 1)
     y_type = st.sidebar.selectbox("Y Axis Scale", ["linear", "log"], index=0 if y_axis.axis_type.value=="linear" else 1)
 
+    # 表示範囲・ピクセル数に応じた間引き（軸の範囲を変えると再実行され、その範囲で間引き直す）
+    level_of_detail = None
+    if st.sidebar.checkbox("Level of detail", value=True, key=f"lod_{material_type.value}"):
+        default_lod = LevelOfDetail.from_env() if point_budget is None else LevelOfDetail(point_budget=point_budget)
+        budget = st.sidebar.number_input(
+            "Point budget", min_value=1000, value=default_lod.point_budget, step=10000, key=f"lod_budget_{material_type.value}"
+        )
+        level_of_detail = LevelOfDetail(point_budget=int(budget))
+
+    # 表示範囲（+パン用の余白）の外の点と、対数軸で描けない0以下の点を送らない
+    viewport_culling = None
+    if st.sidebar.checkbox("Cull points outside axis range", value=True, key=f"cull_{material_type.value}"):
+        viewport_culling = ViewportCulling()
+
     graph_creator = BokehGraphCreator()
     new_x_axis = Axis(
         property=prop_x,
@@ -79,14 +155,42 @@ def main(material_type: MaterialType):
             max_value=y_max
         )
     )
-    highlight_condition = None
-    if date_from and date_to:
-        highlight_condition = DateHighlightCondition(date_from=str(date_from), date_to=str(date_to))
+    # データの取得（組ごとにキャッシュ）とハイライト（組ごとに直前の条件の結果を保持）は軸の設定に依存しない
+    pair = (prop_x, prop_y, x_axis.unit, y_axis.unit)
+    merged_series = load_merged_series(*pair)
+    client_highlight = None
+    if highlight_in_browser:
+        # サーバー側ではハイライトせず、updated_at列を使ってブラウザで色を付ける
+        # ピッカーで選べるのはFromの日以降に限り、間引きではその期間に更新された点を残す
+        client_highlight = ClientDateHighlight(date_from=date_from or None, date_to=date_to or None, min_date=date_from or None)
+        xy_series_dto = highlight_series(pair, "", "", user_timezone_str, merged_series)
+    else:
+        xy_series_dto = highlight_series(
+            pair,
+            str(date_from) if date_from else "",
+            str(date_to) if date_to else "",
+            user_timezone_str,
+            merged_series,
+        )
 
-    bokeh_figure = graph_creator.create_bokeh_figure(
+    bokeh_figure = graph_creator.create_bokeh_figure_from_dto(
+        xy_series_dto,
         x_axis=new_x_axis,
         y_axis=new_y_axis,
-        highlight_condition=highlight_condition
+        level_of_detail=level_of_detail,
+        viewport_culling=viewport_culling,
+        client_highlight=client_highlight,
     )
+    cull_result = graph_creator.last_cull_result
+    if cull_result is not None and cull_result.n_input != cull_result.n_output:
+        st.caption(
+            f"{cull_result.n_outside:,} points outside the axis range and "
+            f"{cull_result.n_non_positive:,} non-positive points on log axes were not sent"
+        )
+    lod_result = graph_creator.last_lod_result
+    if lod_result is not None:
+        st.caption(f"{lod_result.n_output:,} / {lod_result.n_input:,} points sent (cell {lod_result.cell_px}px)")
+    elif level_of_detail is not None and client_highlight is not None:
+        st.caption("Level of detail is off while highlighting in browser without a From date")
 
     streamlit_bokeh(bokeh_figure, use_container_width=True, theme="streamlit", key="my_unique_key")
@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+from bokeh.embed import json_item
+
+from domain.graph import Axis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCE = 1e-5
+
+
+def _tolerance_from_env(name: str) -> Optional[float]:
+    value = os.environ.get(name, "").strip().lower()
+    if not value:
+        return DEFAULT_TOLERANCE
+    if value in ("none", "off", "float64"):
+        return None
+    return float(value)
+
+
+@dataclass(frozen=True)
+class WireFormat:
+    """
+    ブラウザに送る列の型を決める設定。
+    x/yは、float32にしたときの誤差が軸ごとの許容値以下ならfloat32で送る（Noneなら常にfloat64）。
+    許容値は線形軸では表示範囲の幅に対する比、対数軸では値そのものに対する比で測る。
+    """
+    x_tolerance: Optional[float] = DEFAULT_TOLERANCE
+    y_tolerance: Optional[float] = DEFAULT_TOLERANCE
+
+    @classmethod
+    def from_env(cls) -> "WireFormat":
+        return cls(
+            x_tolerance=_tolerance_from_env("STARRYDATA_WIRE_X_TOLERANCE"),
+            y_tolerance=_tolerance_from_env("STARRYDATA_WIRE_Y_TOLERANCE"),
+        )
+
+    def encode_x(self, values: np.ndarray, axis: Optional[Axis]) -> np.ndarray:
+        return encode_float(values, axis, self.x_tolerance)
+
+    def encode_y(self, values: np.ndarray, axis: Optional[Axis]) -> np.ndarray:
+        return encode_float(values, axis, self.y_tolerance)
+
+
+def encode_float(values: np.ndarray, axis: Optional[Axis], tolerance: Optional[float]) -> np.ndarray:
+    """誤差が許容値以下ならfloat32に、そうでなければfloat64のまま返す"""
+    if tolerance is None or axis is None or len(values) == 0:
+        return values
+    narrowed = values.astype(np.float32)
+    with np.errstate(invalid="ignore", over="ignore"):
+        error = np.abs(narrowed.astype(np.float64) - values)
+        if axis.axis_type.is_log():
+            scale = np.abs(values)
+        else:
+            scale = abs(axis.axis_range.max_value - axis.axis_range.min_value)
+        # NaN同士・同じ無限大は誤差0とみなす
+        error = np.where(np.isnan(values) | (narrowed == values), 0.0, error)
+        ok = bool(np.all(error <= tolerance * scale))
+    return narrowed if ok else values
+
+
+def narrow_codes(codes: np.ndarray, n_values: int) -> np.ndarray:
+    """0..n_values-1 の符号をそれが収まる最小の符号なし整数型にする（Bokehが型付き配列で送れる型のみ）"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n_values <= np.iinfo(dtype).max + 1:
+            return codes.astype(dtype, copy=False)
+    return codes.astype(np.int64, copy=False)
+
+
+def compact_dictionary(codes: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    辞書符号化した列を、実際に使われている値だけの辞書で符号化し直す。
+    (新しい符号, 新しい値の一覧) を返す。符号は新しい辞書の大きさに収まる最小の整数型にする。
+    """
+    used, inverse = np.unique(codes, return_inverse=True)
+    return narrow_codes(inverse, len(used)), values[used]
+
+
+def log_document_size(fig, label: str) -> Optional[int]:
+    """
+    図をシリアライズしたJSONのバイト数をINFOでログに出す（INFOが無効なら計測しない）。
+    列のバイト数（型付き配列のままの大きさ）も併せて出し、ワイヤ形式の効果を比べられるようにする。
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return None
+    size = len(json.dumps(json_item(fig)))
+    column_bytes = sum(
+        column.nbytes
+        for renderer in fig.renderers
+        for column in renderer.data_source.data.values()
+        if isinstance(column, np.ndarray)
+    )
+    logger.info("bokeh document %s: %d bytes serialized, %d bytes of typed columns", label, size, column_bytes)
+    return size
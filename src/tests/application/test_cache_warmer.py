@@ -0,0 +1,69 @@
+import threading
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+from application.cache_warmer import CacheWarmer, parse_priority
+from application.series_store import SeriesStore
+from application.graph_data_service import GraphDataService
+from src.tests.domain.graph_mock_factory import make_xy_points, make_xy_series
+
+
+def test_parse_priority():
+    assert parse_priority("Temperature-ZT, Temperature-Seebeck coefficient,") == [
+        ("Temperature", "ZT"),
+        ("Temperature", "Seebeck coefficient"),
+    ]
+    with pytest.raises(ValueError):
+        parse_priority("Temperature")
+
+
+def test_keys_cover_all_material_types_with_priority_first():
+    warmer = CacheWarmer(store=SeriesStore(), priority=[("Discharge capacity", "Voltage"), ("Temperature", "ZT")])
+    keys = warmer.keys()
+    assert len(keys) == len(set(keys))
+    assert keys[0][:2] == ("Discharge capacity", "Voltage")
+    assert keys[1][:2] == ("Temperature", "ZT")
+    assert ("Temperature", "Seebeck coefficient", "K", "V/K") in keys
+    assert any(k[1] == "Magnetization" for k in keys)
+
+
+def test_warm_all_stores_series_and_reports_failures():
+    store = SeriesStore()
+    series = make_xy_series()
+    active = []
+    peak = []
+    lock = threading.Lock()
+    def fetch(key):
+        with lock:
+            active.append(key)
+            peak.append(len(active))
+        time.sleep(0.01)
+        with lock:
+            active.remove(key)
+        if key[1] == "ZT":
+            raise RuntimeError("upstream error")
+        return series
+    warmer = CacheWarmer(store=store, fetch=fetch, max_workers=2)
+    results = warmer.warm_all()
+    assert len(results) == len(warmer.keys())
+    assert max(peak) <= 2
+    failed = [r for r in results if r.error]
+    assert [r.key[1] for r in failed] == ["ZT"]
+    ok = [r for r in results if not r.error]
+    assert all(r.n_points == series.n_points and r.seconds >= 0 for r in ok)
+    assert store.get(ok[0].key) is series
+    assert store.get(failed[0].key) is None
+
+
+@patch("infra.graph_repository_factory.GraphRepositoryFactory.create")
+def test_get_merged_graph_data_reads_warmed_bulk_data(mock_factory):
+    store = SeriesStore()
+    bulk = make_xy_series([make_xy_points(sid="bulk")])
+    store.put(("Temperature", "ZT", "K", ""), bulk, datetime.now(timezone.utc) + timedelta(hours=1))
+    mock_today_repo = MagicMock()
+    mock_today_repo.get_graph_by_property_and_unit.return_value = make_xy_series([make_xy_points(sid="today")])
+    mock_factory.side_effect = [mock_today_repo]
+    merged = GraphDataService(series_store=store).get_merged_graph_data("Temperature", "ZT", "K", "")
+    assert [dto.sid for dto in merged.data] == ["bulk", "today"]
+    assert mock_factory.call_count == 1
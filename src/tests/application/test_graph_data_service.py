@@ -7,6 +7,14 @@ def make_point(x, y):
     from domain.graph import XYPoint
     return XYPoint(x, y)
 
+@pytest.fixture(autouse=True)
+def clear_series_store():
+    # get_merged_graph_dataはプロセス共有のキャッシュを使うので、テストごとに空にする
+    from application.series_store import get_series_store
+    get_series_store().clear()
+    yield
+    get_series_store().clear()
+
 @pytest.fixture
 def mock_bulk_data_series():
     # bulk側のDataPointsSeries
@@ -39,3 +47,130 @@ def test_get_merged_graph_data(mock_factory, mock_bulk_data_series, mock_today_d
     assert merged.data[1].data == mock_today_data_series.data[0].data
     assert merged.data[0].is_highlighted is False
     assert merged.data[1].is_highlighted is False
+
+@patch("infra.graph_repository_factory.GraphRepositoryFactory.create")
+def test_get_merged_graph_data_fetches_concurrently(mock_factory, mock_bulk_data_series, mock_today_data_series):
+    import threading
+    # 両方の取得がそろうまで待つ。逐次に取得していれば先の取得がタイムアウトする
+    both_started = threading.Barrier(2, timeout=5)
+    def waiting(result):
+        def fetch(*args, **kwargs):
+            both_started.wait()
+            return result
+        return fetch
+    mock_bulk_repo = MagicMock()
+    mock_bulk_repo.get_graph_by_property.side_effect = waiting(mock_bulk_data_series)
+    mock_today_repo = MagicMock()
+    mock_today_repo.get_graph_by_property_and_unit.side_effect = waiting(mock_today_data_series)
+    mock_factory.side_effect = [mock_bulk_repo, mock_today_repo]
+    merged = GraphDataService().get_merged_graph_data("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert len(merged.data) == 2
+    assert not both_started.broken
+
+@patch("infra.graph_repository_factory.GraphRepositoryFactory.create")
+def test_get_merged_graph_data_inside_running_event_loop(mock_factory, mock_bulk_data_series, mock_today_data_series):
+    import asyncio
+    mock_bulk_repo = MagicMock()
+    mock_bulk_repo.get_graph_by_property.return_value = mock_bulk_data_series
+    mock_today_repo = MagicMock()
+    mock_today_repo.get_graph_by_property_and_unit.return_value = mock_today_data_series
+    mock_factory.side_effect = [mock_bulk_repo, mock_today_repo]
+    async def call_sync_wrapper():
+        return GraphDataService().get_merged_graph_data("Temperature", "Seebeck coefficient")
+    merged = asyncio.run(call_sync_wrapper())
+    assert len(merged.data) == 2
+
+@patch("infra.graph_repository_factory.GraphRepositoryFactory.create")
+def test_get_merged_graph_data_uses_series_cache(mock_factory, mock_bulk_data_series, mock_today_data_series):
+    from application.series_store import SeriesStore
+    mock_bulk_repo = MagicMock()
+    mock_bulk_repo.get_graph_by_property.return_value = mock_bulk_data_series
+    mock_today_repo = MagicMock()
+    mock_today_repo.get_graph_by_property_and_unit.return_value = mock_today_data_series
+    mock_factory.side_effect = [mock_bulk_repo, mock_today_repo]
+    store = SeriesStore()
+    service = GraphDataService(series_store=store)
+    first = service.get_merged_graph_data("Temperature", "Seebeck coefficient", "K", "V/K")
+    second = service.get_merged_graph_data("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert mock_factory.call_count == 2
+    assert [dto.sid for dto in first.data] == [dto.sid for dto in second.data]
+    stats = store.stats()
+    assert stats["bulk_hits"] == 1 and stats["bulk_misses"] == 1
+    assert stats["delta_hits"] == 1 and stats["delta_misses"] == 1
+    assert stats["bulk_hit_rate"] == 0.5
+
+
+@patch("infra.graph_repository_factory.GraphRepositoryFactory.create")
+def test_load_merged_series_and_highlight_separately(mock_factory, mock_bulk_data_series, mock_today_data_series):
+    from domain.graph import DateHighlightCondition
+    mock_bulk_repo = MagicMock()
+    mock_bulk_repo.get_graph_by_property.return_value = mock_bulk_data_series
+    mock_today_repo = MagicMock()
+    mock_today_repo.get_graph_by_property_and_unit.return_value = mock_today_data_series
+    mock_factory.side_effect = [mock_bulk_repo, mock_today_repo]
+    service = GraphDataService()
+    merged = service.load_merged_series("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert merged.sid.tolist() == [mock_bulk_data_series.sid[0], mock_today_data_series.sid[0]]
+    # ハイライトの適用では取得し直さない
+    dto = service.highlight(merged, DateHighlightCondition(date_from="2024-01-01", date_to="2024-01-01"))
+    assert dto.is_highlighted.tolist() == [False, True]
+    assert service.highlight(merged, None).is_highlighted.tolist() == [False, False]
+    assert mock_factory.call_count == 2
+
+
+@patch("infra.graph_repository_factory.GraphRepositoryFactory.create")
+def test_load_merged_series_reuses_merge_until_delta_changes(mock_factory, mock_bulk_data_series, mock_today_data_series):
+    from application.series_store import DELTA, SeriesStore
+    mock_bulk_repo = MagicMock()
+    mock_bulk_repo.get_graph_by_property.return_value = mock_bulk_data_series
+    mock_today_repo = MagicMock()
+    mock_today_repo.get_graph_by_property_and_unit.return_value = mock_today_data_series
+    mock_factory.side_effect = [mock_bulk_repo, mock_today_repo]
+    store = SeriesStore()
+    service = GraphDataService(series_store=store)
+    key = ("Temperature", "Seebeck coefficient", "K", "V/K")
+    first = service.load_merged_series(*key)
+    # deltaを取り直しても内容（version）が同じなら連結し直さない
+    store.put(key, mock_today_data_series, kind=DELTA)
+    assert service.load_merged_series(*key) is first
+    assert store.stats()["merged_hits"] == 1
+    # deltaが変わったら連結し直す
+    newer = make_xy_series([make_xy_points([make_point(7, 8)], updated_at="2024-01-03T00:00:00Z")])
+    store.put(key, newer, kind=DELTA)
+    second = service.load_merged_series(*key)
+    assert second is not first
+    assert second.x.tolist() == [1.0, 3.0, 7.0]
+    # deltaが空ならbulk dataをコピーせずにそのまま返す
+    store.put(key, make_xy_series([]), kind=DELTA)
+    assert service.load_merged_series(*key) is store.get(key)
+
+
+def test_bulk_cache_follows_snapshot_generation(tmp_path, monkeypatch):
+    import asyncio
+    import os
+    from application.series_store import BULK, SeriesStore
+    from infra.snapshot import SnapshotStore
+    monkeypatch.setenv("STARRYDATA_BULK_DATA_SOURCE", "snapshot")
+    monkeypatch.setenv("STARRYDATA_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.delenv("STARRYDATA_BULK_DATA_API", raising=False)
+
+    def publish(name, x):
+        # snapshot_builderと同じく、世代のディレクトリに書いてからcurrentのリンクを置き換える
+        series = make_xy_series([make_xy_points([make_point(x, 1.0)])])
+        SnapshotStore(str(tmp_path / "generations" / name)).write("Temperature", "ZT", series)
+        os.symlink(os.path.join("generations", name), tmp_path / ".tmp-current")
+        os.replace(tmp_path / ".tmp-current", tmp_path / "current")
+
+    service = GraphDataService(series_store=SeriesStore())
+    key = ("Temperature", "ZT", "", "")
+    def load_bulk():
+        return asyncio.run(service._load_cached(key, BULK, lambda: service._fetch_bulk("Temperature", "ZT")))
+
+    publish("1", 1.0)
+    assert load_bulk().x.tolist() == [1.0]
+    assert load_bulk().x.tolist() == [1.0]
+    # バックアップ後に世代が切り替わったら、次のバックアップを待たずに新しい世代を読む
+    publish("2", 2.0)
+    assert load_bulk().x.tolist() == [2.0]
+    stats = service.series_store.stats()
+    assert stats["bulk_hits"] == 1 and stats["bulk_misses"] == 2
@@ -1,6 +1,6 @@
 import pytest
-from src.domain.graph import XYPoint, XYPoints, XYSeries, DateHighlightCondition, HighlightCondition
-from src.application.graph_data_service import GraphDataService, XYPointsDTO, XYSeriesDTO
+from domain.graph import XYPoint, XYPoints, XYSeries, DateHighlightCondition, HighlightCondition
+from application.graph_data_service import GraphDataService, XYPointsDTO, XYSeriesDTO
 from src.tests.domain.graph_mock_factory import make_xy_points
 
 class DummyHighlightCondition(HighlightCondition):
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+
+from application.series_store import SeriesStore
+from src.tests.domain.graph_mock_factory import make_xy_series
+
+
+def test_series_store_expires_entries():
+    store = SeriesStore()
+    series = make_xy_series()
+    store.put(("a", "b", "", ""), series, datetime.now(timezone.utc) - timedelta(seconds=1))
+    assert store.get(("a", "b", "", "")) is None
+    store.put(("a", "b", "", ""), series, datetime.now(timezone.utc) + timedelta(hours=1))
+    assert store.get(("a", "b", "", "")) is series
+
+
+def test_series_store_delta_ttl_and_lru_eviction():
+    series = make_xy_series()
+    store = SeriesStore(delta_ttl=timedelta(seconds=-1))
+    store.put(("a", "b", "", ""), series, kind="delta")
+    assert store.get(("a", "b", "", ""), kind="delta") is None
+    store = SeriesStore(max_bytes=2 * 400)
+    store.put(("a", "y", "", ""), series)
+    store.put(("b", "y", "", ""), series)
+    assert store.get(("a", "y", "", "")) is series
+    store.put(("c", "y", "", ""), series)
+    # 容量を超えたら最近使われていないもの（b）から追い出す
+    assert store.stats()["evictions"] == 1
+    assert store.get(("b", "y", "", "")) is None
+    assert store.get(("a", "y", "", "")) is series
+    assert store.get(("c", "y", "", "")) is series
@@ -0,0 +1,73 @@
+import json
+import os
+
+import pytest
+
+from application.snapshot_builder import CURRENT, GENERATIONS, MANIFEST, SnapshotBuilder, main, property_pairs
+from benchmarks.api_server import ServerConfig, StandInApiServer
+from infra.graph_repository_factory import ApiHostName, GraphRepositoryFactory
+from infra.snapshot import SnapshotStore
+
+PAIRS = [("Temperature", "Seebeck coefficient"), ("Temperature", "ZT")]
+
+
+@pytest.fixture
+def server():
+    with StandInApiServer(ServerConfig(bulk_series=30, points_mean=5)) as server:
+        yield server
+
+
+def test_property_pairs_cover_every_material_type():
+    pairs = property_pairs()
+    assert len(pairs) == len(set(pairs))
+    assert ("Temperature", "Seebeck coefficient") in pairs
+
+
+def test_build_swaps_generation_and_skips_unchanged_pairs(server, tmp_path, monkeypatch):
+    root = str(tmp_path / "snapshots")
+    builder = SnapshotBuilder(root, server.bulk_url, workers=0, pairs=PAIRS)
+    first = builder.build()
+    assert [p.skipped for p in first.pairs] == [False, False]
+    assert all(p.downloaded_bytes > 0 and p.snapshot_bytes > 0 and p.n_series == 30 for p in first.pairs)
+    assert os.readlink(os.path.join(root, CURRENT)) == os.path.join(GENERATIONS, first.generation)
+
+    # 本文が変わっていなければパースせずに前の世代を引き継ぐ
+    second = builder.build()
+    assert [p.skipped for p in second.pairs] == [True, True]
+    assert all(p.parse_seconds == 0 and p.n_series == 30 for p in second.pairs)
+    forced = builder.build(force=True)
+    assert [p.skipped for p in forced.pairs] == [False, False]
+    # 残す世代数は2
+    assert sorted(os.listdir(os.path.join(root, GENERATIONS))) == [second.generation, forced.generation]
+    manifest = json.loads((tmp_path / "snapshots" / GENERATIONS / forced.generation / MANIFEST).read_text())
+    assert manifest["built"] == 2
+
+    monkeypatch.setenv("STARRYDATA_SNAPSHOT_DIR", root)
+    monkeypatch.delenv("STARRYDATA_BULK_DATA_API", raising=False)
+    series = GraphRepositoryFactory.create(ApiHostName.SNAPSHOT).get_graph_by_property(*PAIRS[1])
+    assert len(series) == 30
+
+
+def test_failed_pair_keeps_previous_snapshot(tmp_path):
+    root = str(tmp_path / "snapshots")
+    with StandInApiServer(ServerConfig(bulk_series=10, points_mean=5)) as server:
+        SnapshotBuilder(root, server.bulk_url, workers=0, pairs=PAIRS[:1]).build()
+    with StandInApiServer(ServerConfig(bulk_series=10, error_rate=1.0, error_status=404)) as server:
+        report = SnapshotBuilder(root, server.bulk_url, workers=0, pairs=PAIRS[:1]).build()
+    assert len(report.failed) == 1
+    assert len(SnapshotStore(os.path.join(root, CURRENT)).open(*PAIRS[0]).series) == 10
+
+
+def test_main_builds_with_process_pool(server, tmp_path, capsys):
+    report_path = tmp_path / "report.json"
+    code = main([
+        "--root", str(tmp_path / "snapshots"),
+        "--host", server.bulk_url,
+        "--workers", "2",
+        "--pairs", ",".join(f"{x}-{y}" for x, y in PAIRS),
+        "--report", str(report_path),
+    ])
+    assert code == 0
+    report = json.loads(report_path.read_text())
+    assert report["built"] == 2 and report["wall_seconds"] > 0
+    assert "total: 2 built" in capsys.readouterr().out
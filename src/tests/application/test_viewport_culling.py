@@ -0,0 +1,35 @@
+import numpy as np
+
+from application.graph_data_service import XYSeriesDTO
+from application.viewport_culling import ViewportCulling
+from domain.graph import Axis, AxisType, AxisRange, XYPoint, XYPoints, XYSeries
+
+
+def axis(lo, hi, axis_type=AxisType.LINEAR):
+    return Axis(property="p", axis_type=axis_type, unit="", axis_range=AxisRange(lo, hi))
+
+
+def make_dto():
+    def points(xs, sid):
+        return XYPoints(data=[XYPoint(x, 1.0) for x in xs], updated_at="", sid=sid, figure_id="f", sample_id="s", composition=None)
+    series = XYSeries([points([-1.0, 0.5, 5.0], "a"), points([1.2, 100.0], "b")])
+    return XYSeriesDTO.from_series(series, np.array([False, True]))
+
+
+def test_cull_outside_range_with_margin():
+    result = ViewportCulling(margin=0.5).cull(make_dto(), axis(0, 1), axis(0, 2))
+    assert result.n_input == 5
+    assert result.n_outside == 3
+    assert result.n_non_positive == 0
+    assert result.dto.series.x.tolist() == [0.5, 1.2]
+    # 系列の並び・ハイライトはそのまま（点がなくなった系列も残る）
+    assert result.dto.series.lengths().tolist() == [1, 1]
+    assert result.dto.is_highlighted.tolist() == [False, True]
+
+
+def test_cull_non_positive_on_log_axis():
+    result = ViewportCulling(margin=0.0).cull(make_dto(), axis(0.1, 10, AxisType.LOGARITHMIC), axis(0, 2))
+    assert result.n_non_positive == 1
+    assert result.n_outside == 1
+    assert result.dto.series.x.tolist() == [0.5, 5.0, 1.2]
+    assert result.n_output == 3
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+import requests
+
+from benchmarks.api_server import ServerConfig, StandInApiServer
+from infra.api_client import CleansingDatasetApiClient
+from infra.delta_log import DeltaLog
+from infra.graph_repository import GraphRepositoryApiCleansingDataset, GraphRepositoryApiStarrydata2
+from infra.http_session import HttpPolicy, HttpSessionPool
+
+
+@pytest.fixture
+def server():
+    with StandInApiServer(ServerConfig(bulk_series=40, delta_series=12, points_mean=5)) as server:
+        yield server
+
+
+def test_bulk_route_through_repository(server, monkeypatch):
+    monkeypatch.setenv("STARRYDATA_BULK_DATA_API", server.bulk_url)
+    monkeypatch.delenv("STARRYDATA_BULK_DATA_CACHE_DIR", raising=False)
+    repository = GraphRepositoryApiCleansingDataset(
+        api_client=CleansingDatasetApiClient(server.bulk_url, session_pool=HttpSessionPool())
+    )
+    series = repository.get_graph_by_property("Temperature", "Seebeck coefficient")
+    assert len(series) == 40
+    # 同じ組は同じデータ、違う組は違うデータ
+    again = repository.get_graph_by_property("Temperature", "Seebeck coefficient")
+    other = repository.get_graph_by_property("Temperature", "Electrical conductivity")
+    assert again.x.tolist() == series.x.tolist()
+    assert other.x.tolist() != series.x.tolist()
+    assert server.stats()["bulk_requests"] == 3
+
+
+def test_xy_data_route_pages_through_recent_window(server, monkeypatch):
+    monkeypatch.setenv("STARRYDATA2_API_XY_DATA", server.xy_data_url)
+    repository = GraphRepositoryApiStarrydata2(delta_log=DeltaLog(), page_size=5)
+    repository.api_client.session_pool = HttpSessionPool()
+    series = repository.get_graph_by_property_and_unit("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert len(series) == 12
+    # 12系列を5件ずつ取得する
+    assert server.stats()["xy_data_requests"] == 3
+    # 2回目は取得済みの最新updated_at以降だけを取りに行く
+    again = repository.get_graph_by_property_and_unit("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert len(again) == 12
+
+
+def test_xy_data_filters_by_date_and_limit(server):
+    url = server.xy_data_url + "/"
+    params = {"property_x": "a", "property_y": "b"}
+    everything = requests.get(url, params=params).json()["data"]
+    assert len(everything["SID"]) == 12
+    middle = sorted(everything["updated_at"])[6]
+    later = requests.get(url, params={**params, "date_from": middle, "limit": 3}).json()["data"]
+    assert len(later["SID"]) == 3
+    assert all(u >= middle for u in later["updated_at"])
+    assert requests.get(url, params={"property_x": "a"}).status_code == 422
+
+
+def test_bulk_etag_and_gzip():
+    with StandInApiServer(ServerConfig(bulk_series=10, gzip=True)) as server:
+        url = server.bulk_url + "/a-b.json"
+        first = requests.get(url)
+        assert first.headers["Content-Encoding"] == "gzip"
+        assert len(first.json()["data"]["SID"]) == 10
+        revalidated = requests.get(url, headers={"If-None-Match": first.headers["ETag"]})
+        assert revalidated.status_code == 304
+        since = requests.get(url, headers={"If-Modified-Since": first.headers["Last-Modified"]})
+        assert since.status_code == 304
+        assert server.stats()["not_modified"] == 2
+
+
+def test_latency_and_errors_are_injected():
+    config = ServerConfig(bulk_series=5, latency=0.05, error_rate=1.0)
+    with StandInApiServer(config) as server:
+        # リトライなしの接続プールで、注入したエラーがそのまま返ることを確かめる
+        pool = HttpSessionPool(HttpPolicy(retries=0))
+        started = time.perf_counter()
+        response = pool.get(server.bulk_url + "/a-b.json")
+        assert time.perf_counter() - started >= 0.05
+        assert response.status_code == 503
+        assert server.stats()["errors"] == 1
+
+
+def test_bandwidth_cap_slows_the_body():
+    with StandInApiServer(ServerConfig(bulk_series=200, bandwidth=200_000)) as server:
+        started = time.perf_counter()
+        body = requests.get(server.bulk_url + "/a-b.json").content
+        elapsed = time.perf_counter() - started
+    assert elapsed >= len(body) / 200_000 * 0.8
@@ -0,0 +1,13 @@
+import json
+
+from benchmarks.bench_decoders import BASELINE, STREAM, main
+
+
+def test_main_measures_every_available_decoder(tmp_path, capsys):
+    output = tmp_path / "result.json"
+    main(["--series", "30", "--points-mean", "5", "--output", str(output)])
+    decoders = json.loads(output.read_text())["runs"][0]["decoders"]
+    assert BASELINE in decoders and STREAM in decoders
+    assert all(result["matches_baseline"] for result in decoders.values())
+    assert all(result["seconds"] > 0 for result in decoders.values())
+    assert "json/trusted" in capsys.readouterr().out
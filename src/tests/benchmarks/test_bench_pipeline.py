@@ -0,0 +1,71 @@
+import json
+import time
+
+import numpy as np
+
+from benchmarks.bench_pipeline import STAGES, compare, main
+from benchmarks.measure import measure
+from benchmarks.synthetic import PayloadSpec, make_data, make_payload, point_counts
+from infra.api_client import XYApiResponse
+
+
+def test_synthetic_payload_is_deterministic_and_valid():
+    spec = PayloadSpec(n_series=50, points_mean=8, seed=3)
+    payload = make_payload(spec)
+    assert payload == make_payload(spec)
+    response = XYApiResponse(**json.loads(payload)["data"])
+    assert len(response.SID) == 50
+    assert [len(x) for x in response.x] == point_counts(spec).tolist()
+    assert all(x == sorted(x) for x in response.x)
+    assert all(v > 0 for y in response.y for v in y)
+
+
+def test_point_counts_distribution():
+    assert point_counts(PayloadSpec(n_series=10, points_mean=7, points_sigma=0)).tolist() == [7] * 10
+    counts = point_counts(PayloadSpec(n_series=20000, points_mean=20, max_points=100_000))
+    assert counts.min() >= 1
+    assert abs(counts.mean() - 20) < 1
+
+
+def test_delta_overlaps_the_tail_of_bulk():
+    spec = PayloadSpec(n_series=100)
+    delta_spec = spec.delta(20, overlap=0.25)
+    bulk, delta = make_data(spec), make_data(delta_spec)
+    bulk_keys = set(zip(bulk["SID"], bulk["figure_id"], bulk["sample_id"]))
+    delta_keys = list(zip(delta["SID"], delta["figure_id"], delta["sample_id"]))
+    assert sum(k in bulk_keys for k in delta_keys) == 5
+    assert min(delta["updated_at"]) > max(bulk["updated_at"])
+
+
+def test_measure_excludes_first_call_from_timing():
+    calls = []
+    def func(_):
+        # 初回だけ遅い（遅延importなど）
+        if not calls:
+            time.sleep(0.2)
+        calls.append(1)
+        return len(calls)
+    measured = measure(func)
+    assert measured["seconds"] < 0.2
+    assert measured["result"] == 2
+    assert len(calls) == 3  # warm-up・計測・割り当ての計測
+
+
+def test_main_writes_every_stage(tmp_path, capsys):
+    output = tmp_path / "result.json"
+    result = main(["--series", "30", "--points-mean", "5", "--output", str(output)])
+    written = json.loads(output.read_text())
+    assert written["runs"][0]["series"] == result["runs"][0]["series"]
+    stages = written["runs"][0]["stages"]
+    assert list(stages) == list(STAGES)
+    assert all(stage["seconds"] > 0 and stage["peak_bytes"] >= 0 for stage in stages.values())
+    assert stages["serialize"]["output_bytes"] > 0
+    assert "wrote" in capsys.readouterr().out
+
+
+def test_compare_reports_ratio_per_stage():
+    def result(seconds):
+        return {"environment": {"commit": "abc"}, "runs": [{"spec": {"n_series": 10}, "stages": {"decode": {"seconds": seconds, "peak_bytes": 100}}}]}
+    lines = compare(result(2.0), result(1.0))
+    assert lines[0] == "series 10: vs abc"
+    assert np.isclose(float(lines[1].split(":")[1].split("x")[0]), 2.0)
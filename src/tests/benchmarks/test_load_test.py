@@ -0,0 +1,49 @@
+import random
+
+import pytest
+import streamlit as st
+
+from application.series_store import get_series_store
+from benchmarks.api_server import ServerConfig
+from benchmarks.load_test import ACTIONS, LoadTestConfig, SimulatedSession, latency_summary, run
+from infra.delta_log import get_delta_log
+
+
+@pytest.fixture
+def clean_process_caches():
+    # 負荷試験はこのプロセスをレプリカとして使うので、共有のキャッシュを前後で空にする
+    def clear():
+        st.cache_resource.clear()
+        get_series_store().clear()
+        get_delta_log().clear()
+    clear()
+    yield
+    clear()
+
+
+def test_script_starts_with_open_and_uses_known_actions():
+    session = SimulatedSession(LoadTestConfig(steps=30), random.Random(1))
+    script = session.script()
+    assert script[0] == "open"
+    assert len(script) == 30
+    assert set(script) <= set(ACTIONS)
+
+
+def test_latency_summary_percentiles():
+    summary = latency_summary([0.001 * i for i in range(1, 101)])
+    assert summary["count"] == 100
+    assert round(summary["p50_ms"], 1) == 50.5
+    assert round(summary["max_ms"], 1) == 100.0
+    assert latency_summary([]) == {"count": 0}
+
+
+def test_run_drives_page_against_stand_in(clean_process_caches):
+    config = LoadTestConfig(sessions=2, steps=3, materials=("thermoelectric",), seed=3)
+    result = run(config, ServerConfig(bulk_series=20, delta_series=4, points_mean=3))
+    replica = result["replicas"][0]
+    assert replica["errors"] == 0, replica["error_samples"]
+    assert replica["steps"] == 6
+    assert replica["latency"]["open"]["count"] >= 2
+    assert result["upstream"]["bulk_requests"] >= 1
+    assert result["upstream"]["xy_data_requests"] >= 1
+    assert replica["rss"]["end_bytes"] > 0
@@ -1,4 +1,4 @@
-from src.domain.graph import XYPoint, XYPoints, XYSeries, Graph, Axis, AxisType, AxisRange
+from domain.graph import XYPoint, XYPoints, XYSeries, Graph, Axis, AxisType, AxisRange
 
 def make_xy_point(x=0.0, y=0.0):
     return XYPoint(x=x, y=y)
@@ -1,5 +1,11 @@
 import pytest
+import numpy as np
 from domain.graph import Axis, AxisType, AxisRange, XYPoint, XYPoints, XYSeries, Graph, DateHighlightCondition, SIDHighlightCondition
+from domain.graph import (
+    HighlightCondition, AndHighlightCondition, OrHighlightCondition, NotHighlightCondition,
+    SIDInHighlightCondition, FigureIdInHighlightCondition, SampleIdInHighlightCondition, CompositionHighlightCondition,
+)
+from dataclasses import dataclass
 from src.tests.domain.graph_mock_factory import make_xy_points
 
 
@@ -131,3 +137,169 @@ def test_filter_by_sid():
     filtered = [p for p in series.data if p.sid == "sidA"]
     assert len(filtered) == 2
     assert all(p.sid == "sidA" for p in filtered)
+
+
+def test_xy_series_columns():
+    points1 = make_xy_points([XYPoint(1, 2), XYPoint(3, 4)], sid="sidA")
+    points2 = make_xy_points([XYPoint(5, 6)], sid="sidB", composition=None)
+    series = XYSeries([points1, points2])
+    assert series.x.tolist() == [1.0, 3.0, 5.0]
+    assert series.y.tolist() == [2.0, 4.0, 6.0]
+    assert series.offsets.tolist() == [0, 2, 3]
+    assert series.sid.tolist() == ["sidA", "sidB"]
+    assert series.composition.tolist() == ["comp-1", None]
+    assert series.n_points == 3
+    assert series.data[1].sid == "sidB"
+    assert [(p.x, p.y) for p in series.data[0].data] == [(1.0, 2.0), (3.0, 4.0)]
+
+
+def test_xy_series_from_columns_rejects_bad_offsets():
+    with pytest.raises(ValueError):
+        XYSeries.from_columns(
+            x=np.array([1.0, 2.0]), y=np.array([3.0, 4.0]), offsets=np.array([0, 1]),
+            updated_at=["2024-01-01"], sid=["a"], figure_id=["f"], sample_id=["s"], composition=[None],
+        )
+
+
+def test_xy_series_take_and_concat():
+    points1 = make_xy_points([XYPoint(1, 2), XYPoint(3, 4)], sid="sidA")
+    points2 = make_xy_points([XYPoint(5, 6)], sid="sidB")
+    series = XYSeries([points1, points2])
+    reordered = series.take([1, 0])
+    assert reordered.x.tolist() == [5.0, 1.0, 3.0]
+    assert reordered.offsets.tolist() == [0, 1, 3]
+    assert reordered.sid.tolist() == ["sidB", "sidA"]
+    merged = XYSeries.concat([series, reordered])
+    assert len(merged) == 4
+    assert merged.offsets.tolist() == [0, 2, 3, 4, 6]
+    assert merged.data[3].sid == "sidA"
+    assert [(p.x, p.y) for p in merged.data[3].data] == [(1.0, 2.0), (3.0, 4.0)]
+
+
+def test_highlight_condition_match_mask():
+    series = XYSeries([
+        make_xy_points([XYPoint(1, 2)], updated_at="2024-01-15T12:00:00Z", sid="sidA"),
+        make_xy_points([XYPoint(3, 4)], updated_at="2024-02-01T00:00:00Z", sid="sidB"),
+    ])
+    date_cond = DateHighlightCondition(date_from="2024-01-01", date_to="2024-01-31")
+    assert date_cond.match_mask(series).tolist() == [True, False]
+    assert SIDHighlightCondition(sid="sidB").match_mask(series).tolist() == [False, True]
+
+
+def test_date_highlight_condition_respects_timezone():
+    series = XYSeries([
+        # JSTでは2024-01-01 08:00、UTCでは2023-12-31
+        make_xy_points([XYPoint(1, 2)], updated_at="2023-12-31T23:00:00Z"),
+        # JSTでは2024-01-02 00:30（期間外）
+        make_xy_points([XYPoint(1, 2)], updated_at="2024-01-01T15:30:00Z"),
+        make_xy_points([XYPoint(1, 2)], updated_at=""),
+    ])
+    utc_cond = DateHighlightCondition(date_from="2024-01-01", date_to="2024-01-01")
+    jst_cond = DateHighlightCondition(date_from="2024-01-01", date_to="2024-01-01", timezone="Asia/Tokyo")
+    assert utc_cond.match_mask(series).tolist() == [False, True, False]
+    assert jst_cond.match_mask(series).tolist() == [True, False, False]
+    assert [jst_cond.is_match_points(p) for p in series.data] == [True, False, False]
+
+
+def test_xy_series_updated_at_epoch_is_reused_by_concat_and_take():
+    a = XYSeries([make_xy_points([XYPoint(1, 2)], updated_at="2024-01-15T12:00:00Z")])
+    b = XYSeries([make_xy_points([XYPoint(3, 4)], updated_at="2024-01-16T12:00:00+09:00")])
+    merged = XYSeries.concat([a, b])
+    assert merged.updated_at_epoch[0] == a.updated_at_epoch[0]
+    assert merged.take([1]).updated_at_epoch[0] == np.datetime64("2024-01-16T03:00:00", "us")
+
+
+def _condition_series():
+    def points(sid, figure_id, sample_id, composition, updated_at):
+        return XYPoints(data=[XYPoint(1, 2)], updated_at=updated_at, sid=sid, figure_id=figure_id, sample_id=sample_id, composition=composition)
+    return XYSeries([
+        points("s1", "f1", "a", "Bi2Te3", "2024-01-15T12:00:00Z"),
+        points("s2", "f1", "b", "PbTe", "2024-02-15T12:00:00Z"),
+        points("s3", "f2", "c", None, "2024-01-20T12:00:00Z"),
+        points("s1", "f3", "d", "SnSe", "2024-03-01T12:00:00Z"),
+    ])
+
+
+def test_set_and_pattern_conditions():
+    series = _condition_series()
+    assert SIDInHighlightCondition({"s1", "s3"}).match_mask(series).tolist() == [True, False, True, True]
+    assert FigureIdInHighlightCondition(["f1"]).match_mask(series).tolist() == [True, True, False, False]
+    assert SampleIdInHighlightCondition({"d"}).match_mask(series).tolist() == [False, False, False, True]
+    assert CompositionHighlightCondition(r"Te").match_mask(series).tolist() == [True, True, False, False]
+    assert [CompositionHighlightCondition(r"^Sn").is_match_points(p) for p in series.data] == [False, False, False, True]
+
+
+def test_condition_algebra():
+    series = _condition_series()
+    january = DateHighlightCondition(date_from="2024-01-01", date_to="2024-01-31")
+    cond = (january & FigureIdInHighlightCondition({"f1"})) | ~CompositionHighlightCondition("Te")
+    assert isinstance(cond, OrHighlightCondition)
+    assert cond.mask(series).tolist() == [True, False, True, True]
+    assert [cond.is_match_points(p) for p in series.data] == [True, False, True, True]
+    # 同種の組み合わせは平坦化される
+    assert len((january & january & january).conditions) == 3
+    assert AndHighlightCondition([]).mask(series).tolist() == [True] * 4
+    assert NotHighlightCondition(SIDHighlightCondition("s2")).mask(series).tolist() == [True, False, True, True]
+
+
+@dataclass(frozen=True)
+class CountingCondition(HighlightCondition):
+    name: str
+    calls: list
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def match_mask(self, series):
+        self.calls.append(self.name)
+        return np.zeros(len(series), dtype=bool)
+
+
+def test_mask_is_memoized_per_series_version_and_short_circuits():
+    series = _condition_series()
+    calls = []
+    first = CountingCondition("first", calls)
+    second = CountingCondition("second", calls)
+    cond = AndHighlightCondition((first, second))
+    assert cond.mask(series).tolist() == [False] * 4
+    # firstで全系列が対象外になったのでsecondは評価しない
+    assert calls == ["first"]
+    cond.mask(series)
+    first.mask(series)
+    assert calls == ["first"]
+    # 同じ系列集合の連結は同じversionになる
+    assert XYSeries.concat([series, series]).version == XYSeries.concat([series, series]).version
+    other = series.take([0, 1])
+    first.mask(other)
+    assert calls == ["first", "first"]
+
+
+def test_xy_series_select_points_keeps_series():
+    series = XYSeries([
+        make_xy_points([XYPoint(1, 2), XYPoint(3, 4)], sid="a"),
+        make_xy_points([XYPoint(5, 6)], sid="b"),
+    ])
+    selected = series.select_points(np.array([False, True, False]))
+    assert len(selected) == 2
+    assert selected.offsets.tolist() == [0, 1, 1]
+    assert selected.x.tolist() == [3]
+    assert selected.sid.tolist() == ["a", "b"]
+
+
+def test_from_encoded_keeps_the_dictionaries():
+    series = XYSeries.from_encoded(
+        x=np.array([1.0, 2.0, 3.0]),
+        y=np.array([4.0, 5.0, 6.0]),
+        offsets=np.array([0, 1, 3]),
+        dictionaries={
+            "updated_at": (["2025-06-01T00:00:00Z"], np.array([0, 0])),
+            "sid": (["a", "b"], np.array([0, 1])),
+            "figure_id": (["f"], np.array([0, 0])),
+            "sample_id": (["s1", "s2"], np.array([1, 0])),
+            "composition": ([None], np.array([0, 0])),
+        },
+    )
+    assert series.sample_id.tolist() == ["s2", "s1"]
+    assert series.composition.tolist() == [None, None]
+    values, codes = series.dictionary_encode("sample_id")
+    assert values.tolist() == ["s1", "s2"] and codes.tolist() == [1, 0]
@@ -4,7 +4,7 @@ from domain.material_type import MaterialType
 from domain.thermoelectric import THERMOELECTRIC_GRAPHS
 from domain.battery import BATTERY_GRAPHS
 from src.tests.domain.graph_mock_factory import make_xy_points
-from src.domain.graph import XYPoint
+from domain.graph import XYPoint
 
 def test_get_graph_configs_thermoelectric():
     result = get_graph_configs(MaterialType.THERMOELECTRIC)
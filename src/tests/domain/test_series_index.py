@@ -0,0 +1,52 @@
+import numpy as np
+
+from domain.graph import XYPoint, XYPoints, XYSeries, DateHighlightCondition, SIDHighlightCondition
+from domain.series_index import MAX_LAYERS
+
+
+def make_series(rows):
+    return XYSeries([
+        XYPoints(data=[XYPoint(1, 2)], updated_at=updated_at, sid=sid, figure_id=figure_id, sample_id="s", composition=None)
+        for sid, figure_id, updated_at in rows
+    ])
+
+
+def test_positions_by_key():
+    series = make_series([("a", "f1", ""), ("b", "f1", ""), ("a", "f2", "")])
+    assert series.index.positions("sid", "a").tolist() == [0, 2]
+    assert series.index.positions("sid", "missing").tolist() == []
+    assert sorted(series.index.positions_in("figure_id", ["f1", "f2"]).tolist()) == [0, 1, 2]
+
+
+def test_positions_between_uses_sorted_updated_at():
+    series = make_series([
+        ("a", "f", "2024-01-03T00:00:00Z"),
+        ("b", "f", "2024-01-01T00:00:00Z"),
+        ("c", "f", ""),
+        ("d", "f", "2024-01-02T00:00:00Z"),
+    ])
+    start = np.datetime64("2024-01-01T00:00:00", "us")
+    end = np.datetime64("2024-01-03T00:00:00", "us")
+    assert sorted(series.index.positions_between(start, end).tolist()) == [1, 3]
+
+
+def test_concat_reuses_part_indexes_as_layers():
+    bulk = make_series([("a", "f", "2024-01-01T00:00:00Z"), ("b", "f", "2024-01-02T00:00:00Z")])
+    delta = make_series([("a", "f", "2024-01-05T00:00:00Z")])
+    bulk.index.positions("sid", "a")
+    bulk_layer = bulk.index._layers[0][1]
+    merged = XYSeries.concat([bulk, delta])
+    assert merged.index.n_layers == 2
+    assert merged.index._layers[0][1] is bulk_layer
+    assert merged.index.positions("sid", "a").tolist() == [0, 2]
+    assert SIDHighlightCondition("a").match_mask(merged).tolist() == [True, False, True]
+    cond = DateHighlightCondition(date_from="2024-01-02", date_to="2024-01-05")
+    assert cond.match_mask(merged).tolist() == [False, True, True]
+
+
+def test_concat_rebuilds_index_when_too_many_layers():
+    series = make_series([("a", "f", "")])
+    for _ in range(10):
+        series = XYSeries.concat([series, make_series([("b", "f", "")])])
+    assert series.index.n_layers <= MAX_LAYERS
+    assert series.index.positions("sid", "b").tolist() == list(range(1, 11))
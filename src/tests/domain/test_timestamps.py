@@ -0,0 +1,42 @@
+import numpy as np
+
+from domain.timestamps import parse_iso8601, to_epoch_millis
+
+
+def test_parse_iso8601_formats():
+    parsed = parse_iso8601([
+        "2024-01-15T12:00:00Z",
+        "2024-01-15T21:00:00+09:00",
+        "2024-01-15T21:00:00+0900",
+        "2024-01-15T07:00:00-0500",
+        "2024-01-15T12:00:00",
+        "2024-01-15T12:00:00.5Z",
+        "2024-01-15T21:00:00.123456+09:00",
+        "2024-01-15",
+    ])
+    assert parsed.dtype == np.dtype("datetime64[us]")
+    noon = np.datetime64("2024-01-15T12:00:00", "us")
+    assert parsed[:5].tolist() == [noon.item()] * 5
+    assert parsed[5] == noon + np.timedelta64(500000, "us")
+    assert parsed[6] == noon + np.timedelta64(123456, "us")
+    assert parsed[7] == np.datetime64("2024-01-15T00:00:00", "us")
+
+
+def test_parse_iso8601_missing_and_invalid_are_nat():
+    parsed = parse_iso8601([None, "", "not a date", "2024-01-15T12:00:00Z"])
+    assert np.isnat(parsed).tolist() == [True, True, True, False]
+
+
+def test_parse_iso8601_default_offset_for_naive_values():
+    parsed = parse_iso8601(["2024-01-15T21:00:00", "2024-01-15T12:00:00Z"], default_offset_minutes=9 * 60)
+    assert parsed[0] == parsed[1]
+
+
+def test_parse_iso8601_empty():
+    assert len(parse_iso8601([])) == 0
+
+
+def test_to_epoch_millis():
+    millis = to_epoch_millis(parse_iso8601(["1970-01-01T00:00:01.5Z", None]))
+    assert millis[0] == 1500.0
+    assert np.isnan(millis[1])
@@ -21,7 +21,7 @@ def test_starrydata2_api_client_fetch_xy_data_success():
             pass
         def json(self):
             return mock_json
-    with patch("requests.get", return_value=MockResponse()):
+    with patch("requests.Session.get", return_value=MockResponse()):
         client = Starrydata2ApiClient("http://dummy")
         params = {"property_x": "x", "property_y": "y"}
         result = client.fetch_xy_data(params)
@@ -53,7 +53,7 @@ def test_cleansing_dataset_api_client_fetch_xy_data_success():
             pass
         def json(self):
             return mock_json
-    with patch("requests.get", return_value=MockResponse()):
+    with patch("requests.Session.get", return_value=MockResponse()):
         client = CleansingDatasetApiClient("http://dummy")
         result = client.fetch_xy_data("x", "y")
         assert isinstance(result, XYApiResponse)
@@ -75,7 +75,7 @@ def test_starrydata2_api_client_invalid_response():
             pass
         def json(self):
             return mock_json
-    with patch("requests.get", return_value=MockResponse()):
+    with patch("requests.Session.get", return_value=MockResponse()):
         client = Starrydata2ApiClient("http://dummy")
         params = {"property_x": "x", "property_y": "y"}
         with pytest.raises(Exception):
@@ -90,7 +90,7 @@ def test_cleansing_dataset_api_client_invalid_response():
             pass
         def json(self):
             return mock_json
-    with patch("requests.get", return_value=MockResponse()):
+    with patch("requests.Session.get", return_value=MockResponse()):
         client = CleansingDatasetApiClient("http://dummy")
         with pytest.raises(Exception):
             client.fetch_xy_data("x", "y")
@@ -0,0 +1,137 @@
+import json
+import os
+import time
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+from infra.api_client import CleansingDatasetApiClient
+from infra.backup_schedule import JST, latest_backup_at, next_backup_at
+from infra.bulk_data_cache import BulkDataDiskCache
+
+PAYLOAD = json.dumps({
+    "data": {
+        "x": [[1.0, 2.0]],
+        "y": [[3.0, 4.0]],
+        "updated_at": ["2025-06-01T00:00:00Z"],
+        "SID": ["sid1"],
+        "figure_id": ["fig1"],
+        "sample_id": ["sample1"],
+        "composition": [None],
+    }
+}).encode("utf-8")
+
+
+class MockResponse:
+    def __init__(self, status_code=200, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        return False
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), 8):
+            yield self.body[i:i + 8]
+
+
+def test_backup_schedule_boundaries():
+    now = datetime(2025, 6, 1, 23, 30, tzinfo=JST)
+    assert latest_backup_at(now) == datetime(2025, 6, 1, tzinfo=JST)
+    assert next_backup_at(now) == datetime(2025, 6, 2, tzinfo=JST)
+
+
+def test_cache_miss_then_hit_without_revalidation(tmp_path):
+    cache = BulkDataDiskCache(str(tmp_path))
+    client = CleansingDatasetApiClient("http://dummy", cache=cache)
+    with patch("requests.Session.get", return_value=MockResponse(body=PAYLOAD, headers={"ETag": '"v1"'})) as mock_get:
+        first = client.fetch_xy_columns("x", "y")
+        second = client.fetch_xy_columns("x", "y")
+    assert mock_get.call_count == 1
+    assert first.x.tolist() == second.x.tolist() == [1.0, 2.0]
+    assert cache.stats() == {"hits": 1, "misses": 1, "revalidations": 0}
+    entry = cache.lookup(cache.key("x", "y"))
+    assert entry.etag == '"v1"'
+    assert entry.size == len(PAYLOAD)
+
+
+def test_cache_revalidates_once_after_backup(tmp_path):
+    cache = BulkDataDiskCache(str(tmp_path))
+    client = CleansingDatasetApiClient("http://dummy", cache=cache)
+    with patch("requests.Session.get", return_value=MockResponse(body=PAYLOAD, headers={"ETag": '"v1"', "Last-Modified": "Sun, 01 Jun 2025 00:00:00 GMT"})):
+        client.fetch_xy_columns("x", "y")
+    # 前回のバックアップより前に確認した状態にする
+    key = cache.key("x", "y")
+    entry = cache.lookup(key)
+    entry.validated_at = latest_backup_at().timestamp() - 60
+    cache._write_meta(key, entry)
+    with patch("requests.Session.get", return_value=MockResponse(status_code=304)) as mock_get:
+        columns = client.fetch_xy_columns("x", "y")
+        client.fetch_xy_columns("x", "y")
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"', "If-Modified-Since": "Sun, 01 Jun 2025 00:00:00 GMT"}
+    assert columns.SID == ["sid1"]
+    assert cache.stats()["revalidations"] == 1
+
+
+def test_cache_discards_partial_payload_on_decode_error(tmp_path):
+    cache = BulkDataDiskCache(str(tmp_path))
+    client = CleansingDatasetApiClient("http://dummy", cache=cache)
+    with patch("requests.Session.get", return_value=MockResponse(body=PAYLOAD[:-5])):
+        with pytest.raises(ValueError):
+            client.fetch_xy_columns("x", "y")
+    assert cache.lookup(cache.key("x", "y")) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = BulkDataDiskCache(str(tmp_path), max_bytes=2 * len(PAYLOAD))
+    for i, pair in enumerate([("a", "b"), ("c", "d"), ("e", "f")]):
+        with cache.writer(cache.key(*pair), *pair, etag=None, last_modified=None) as writer:
+            for _ in writer.tee([PAYLOAD]):
+                pass
+        os.utime(os.path.join(tmp_path, cache.key(*pair) + ".payload"), (time.time() - 100 + i, time.time() - 100 + i))
+        if pair == ("a", "b"):
+            # aを最近使ったことにする
+            with cache.open_payload(cache.key("a", "b")):
+                pass
+    cache.evict()
+    assert cache.lookup(cache.key("a", "b")) is not None
+    assert cache.lookup(cache.key("c", "d")) is None
+    assert cache.lookup(cache.key("e", "f")) is not None
+
+
+def test_cache_refetches_when_payload_is_evicted_after_lookup(tmp_path):
+    cache = BulkDataDiskCache(str(tmp_path))
+    client = CleansingDatasetApiClient("http://dummy", cache=cache)
+    with patch("requests.Session.get", return_value=MockResponse(body=PAYLOAD, headers={"ETag": '"v1"'})):
+        client.fetch_xy_columns("x", "y")
+    key = cache.key("x", "y")
+    entry = cache.lookup(key)
+    # lookupの直後に別のプロセスが追い出した状態
+    os.unlink(os.path.join(tmp_path, key + ".payload"))
+    with patch.object(cache, "lookup", return_value=entry), \
+            patch("requests.Session.get", return_value=MockResponse(body=PAYLOAD, headers={"ETag": '"v1"'})) as mock_get:
+        columns = client.fetch_xy_columns("x", "y")
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.kwargs["headers"] == {}
+    assert columns.SID == ["sid1"]
+    assert cache.stats() == {"hits": 0, "misses": 2, "revalidations": 0}
+
+
+def test_cache_never_pairs_old_meta_with_new_payload(tmp_path):
+    cache = BulkDataDiskCache(str(tmp_path))
+    key = cache.key("x", "y")
+    with cache.writer(key, "x", "y", etag='"v1"', last_modified=None) as writer:
+        for _ in writer.tee([PAYLOAD]):
+            pass
+    # 本文を置き換えた後、メタデータを書く前に止まった場合
+    with patch.object(cache, "_write_meta", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            with cache.writer(key, "x", "y", etag='"v2"', last_modified=None) as writer:
+                for _ in writer.tee([b"{}"]):
+                    pass
+    assert cache.lookup(key) is None
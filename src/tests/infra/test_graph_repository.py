@@ -70,7 +70,7 @@ def mock_response_property_missing_updated_at():
     return MockResponse()
 
 # --- Starrydata2 API テスト ---
-@patch("infra.graph_repository.requests.get")
+@patch("requests.Session.get")
 def test_get_graph_by_property_and_unit_format(mock_get):
     mock_get.return_value = mock_response_property_and_unit()
     os.environ["STARRYDATA2_API_XY_DATA"] = "http://dummy"
@@ -100,7 +100,7 @@ def test_get_graph_by_property_and_unit_format(mock_get):
     assert xy_series.data[1].sample_id == "sample2"
     assert xy_series.data[1].composition == "comp2"
 
-@patch("infra.graph_repository.requests.get")
+@patch("requests.Session.get")
 def test_get_graph_by_property_and_unit_missing_updated_at_raises(mock_get):
     mock_get.return_value = mock_response_property_and_unit_missing_updated_at()
     os.environ["STARRYDATA2_API_XY_DATA"] = "http://dummy"
@@ -113,3 +113,110 @@ def test_get_graph_by_property_and_unit_missing_updated_at_raises(mock_get):
             "K",
             "V/K"
         )
+
+# --- bulk data API テスト ---
+def test_cleansing_dataset_get_graph_by_property_skips_invalid_series():
+    from infra.api_client import XYApiColumns, XYApiResponse
+    from infra.graph_repository import GraphRepositoryApiCleansingDataset
+    api_data = XYApiResponse(
+        x=[[1.0, 2.0], [3.0], [], [4.0, 5.0]],
+        y=[[10.0, 20.0], [30.0, 31.0], [], [40.0, 50.0]],
+        updated_at=["2025-06-01T00:00:00Z"] * 4,
+        SID=["sid1", "sid2", "sid3", "sid4"],
+        figure_id=["fig1", "fig2", "fig3", "fig4"],
+        sample_id=["s1", "s2", "s3", "s4"],
+        composition=["c1", None, "c3", "c4"],
+    )
+    class StubClient:
+        def fetch_xy_columns(self, property_x, property_y):
+            return XYApiColumns.from_response(api_data)
+    os.environ["STARRYDATA_BULK_DATA_API"] = "http://dummy"
+    repo = GraphRepositoryApiCleansingDataset(api_client=StubClient())
+    xy_series = repo.get_graph_by_property("Temperature", "Seebeck coefficient")
+    assert xy_series.sid.tolist() == ["sid1", "sid4"]
+    assert xy_series.x.tolist() == [1.0, 2.0, 4.0, 5.0]
+    assert xy_series.y.tolist() == [10.0, 20.0, 40.0, 50.0]
+    assert xy_series.offsets.tolist() == [0, 2, 4]
+
+# --- Starrydata2 delta のページング・差分取得 ---
+class PagedStubClient:
+    """date_from以降のレコードを先頭からlimit件返すスタブ。recordsは(SID, updated_at, x)のリストで、updated_at順に並べる"""
+    def __init__(self, records, ignore_date_from=False):
+        self.records = records
+        self.ignore_date_from = ignore_date_from
+        self.calls = []
+    def fetch_xy_data(self, params):
+        from datetime import datetime
+        from infra.api_client import XYApiResponse
+        self.calls.append(params)
+        since = datetime.fromisoformat(params["date_from"])
+        def after(updated_at):
+            try:
+                return datetime.fromisoformat(updated_at) >= since
+            except ValueError:
+                return True  # 不正なupdated_atはどのページでも返す
+        page = [r for r in self.records if self.ignore_date_from or after(r[1])][:params["limit"]]
+        return XYApiResponse(
+            x=[[x] for _, _, x in page],
+            y=[[x * 10] for _, _, x in page],
+            updated_at=[u for _, u, _ in page],
+            SID=[sid for sid, _, _ in page],
+            figure_id=["fig-" + sid for sid, _, _ in page],
+            sample_id=["sample-" + sid for sid, _, _ in page],
+            composition=[None for _ in page],
+        )
+
+def test_starrydata2_paginates_until_window_exhausted():
+    from infra.delta_log import DeltaLog
+    os.environ["STARRYDATA2_API_XY_DATA"] = "http://dummy"
+    client = PagedStubClient([("sid%d" % i, "2099-01-01T00:00:0%dZ" % i, float(i)) for i in range(5)])
+    repo = GraphRepositoryApiStarrydata2(api_client=client, delta_log=DeltaLog(), page_size=2)
+    xy_series = repo.get_graph_by_property_and_unit("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert xy_series.sid.tolist() == ["sid0", "sid1", "sid2", "sid3", "sid4"]
+    # 次のページはそのページまでの最新updated_atから取る（offsetは使わない）
+    assert [c["date_from"] for c in client.calls[1:]] == ["2099-01-01T00:00:0%d+00:00" % i for i in (1, 2, 3, 4)]
+    assert all("offset" not in c and c["limit"] == 2 for c in client.calls)
+
+def test_starrydata2_stops_paging_when_api_ignores_date_from():
+    from infra.delta_log import DeltaLog
+    os.environ["STARRYDATA2_API_XY_DATA"] = "http://dummy"
+    client = PagedStubClient([("sid%d" % i, "2099-01-01T00:00:0%dZ" % i, float(i)) for i in range(5)], ignore_date_from=True)
+    repo = GraphRepositoryApiStarrydata2(api_client=client, delta_log=DeltaLog(), page_size=2)
+    xy_series = repo.get_graph_by_property_and_unit("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert xy_series.sid.tolist() == ["sid0", "sid1"]
+    assert len(client.calls) == 2
+
+def test_starrydata2_refresh_requests_only_records_after_watermark():
+    from infra.delta_log import DeltaLog
+    os.environ["STARRYDATA2_API_XY_DATA"] = "http://dummy"
+    delta_log = DeltaLog()
+    first = PagedStubClient([("sid1", "2099-01-01T00:00:01Z", 1.0), ("sid2", "2099-01-01T00:00:02Z", 2.0)])
+    repo = GraphRepositoryApiStarrydata2(api_client=first, delta_log=delta_log)
+    repo.get_graph_by_property_and_unit("Temperature", "Seebeck coefficient", "K", "V/K")
+    # 2回目: watermarkのレコード（sid2の再取得）と新しいレコード、更新されたsid1が返る
+    second = PagedStubClient([
+        ("sid2", "2099-01-01T00:00:02Z", 2.0),
+        ("sid3", "2099-01-01T00:00:03Z", 3.0),
+        ("sid1", "2099-01-01T00:00:04Z", 1.5),
+    ])
+    repo = GraphRepositoryApiStarrydata2(api_client=second, delta_log=delta_log)
+    xy_series = repo.get_graph_by_property_and_unit("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert second.calls[0]["date_from"] == "2099-01-01T00:00:02+00:00"
+    assert xy_series.sid.tolist() == ["sid2", "sid3", "sid1"]
+    assert xy_series.x.tolist() == [2.0, 3.0, 1.5]
+    assert delta_log.get(("Temperature", "Seebeck coefficient", "K", "V/K")).watermark.isoformat() == "2099-01-01T00:00:04+00:00"
+
+def test_starrydata2_watermark_ignores_empty_and_malformed_updated_at():
+    from infra.delta_log import DeltaLog
+    os.environ["STARRYDATA2_API_XY_DATA"] = "http://dummy"
+    delta_log = DeltaLog()
+    client = PagedStubClient([("sid1", "", 1.0), ("sid2", "2099-01-01T00:00:02Z", 2.0), ("sid3", "not a date", 3.0)])
+    repo = GraphRepositoryApiStarrydata2(api_client=client, delta_log=delta_log)
+    xy_series = repo.get_graph_by_property_and_unit("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert xy_series.sid.tolist() == ["sid1", "sid2", "sid3"]
+    assert delta_log.get(("Temperature", "Seebeck coefficient", "K", "V/K")).watermark.isoformat() == "2099-01-01T00:00:02+00:00"
+    # 有効なupdated_atが1件もなければwatermarkは進まない
+    delta_log.clear()
+    repo = GraphRepositoryApiStarrydata2(api_client=PagedStubClient([("sid1", "", 1.0)]), delta_log=delta_log)
+    repo.get_graph_by_property_and_unit("Temperature", "Seebeck coefficient", "K", "V/K")
+    assert delta_log.get(("Temperature", "Seebeck coefficient", "K", "V/K")).watermark is None
@@ -0,0 +1,75 @@
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from infra.http_session import HttpPolicy, HttpSessionPool
+
+
+@pytest.fixture
+def local_server():
+    state = {"requests": 0, "fail_first": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            state["requests"] += 1
+            status = 503 if state["requests"] <= state["fail_first"] else 200
+            body = b'{"ok": true}'
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+    server.server_close()
+
+
+def test_policy_from_env(monkeypatch):
+    monkeypatch.setenv("STARRYDATA_HTTP_POOL_SIZE", "4")
+    monkeypatch.setenv("STARRYDATA_HTTP_CONNECT_TIMEOUT", "1.5")
+    monkeypatch.setenv("STARRYDATA_HTTP_READ_TIMEOUT", "30")
+    policy = HttpPolicy.from_env()
+    assert policy.pool_size == 4
+    assert policy.timeout == (1.5, 30.0)
+
+
+def test_session_pool_applies_default_timeout():
+    pool = HttpSessionPool(HttpPolicy(connect_timeout=2, read_timeout=7))
+    with patch("requests.Session.get") as mock_get:
+        pool.get("http://dummy/a.json")
+        pool.get("http://dummy/b.json", timeout=1)
+    assert mock_get.call_args_list[0].kwargs["timeout"] == (2, 7)
+    assert mock_get.call_args_list[1].kwargs["timeout"] == 1
+
+
+def test_session_pool_reuses_connections(local_server):
+    url, _ = local_server
+    pool = HttpSessionPool()
+    assert pool.session_for(url + "/a") is pool.session_for(url + "/b")
+    for _ in range(5):
+        response = pool.get(url + "/x.json")
+        assert response.json() == {"ok": True}
+    stats = pool.stats()[url]
+    assert stats["requests"] == 5
+    assert stats["connections"] == 1
+    assert stats["reused"] == 4
+    pool.close()
+
+
+def test_session_pool_retries_transient_errors(local_server):
+    url, state = local_server
+    state["fail_first"] = 2
+    pool = HttpSessionPool(HttpPolicy(retries=3, backoff_factor=0))
+    response = pool.get(url + "/x.json")
+    assert response.status_code == 200
+    assert state["requests"] == 3
+    pool.close()
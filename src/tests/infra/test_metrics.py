@@ -0,0 +1,97 @@
+import asyncio
+import json
+import logging
+import urllib.request
+
+from infra.metrics import Metrics, start_metrics_server
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    with metrics.span("fetch") as span:
+        span.set(series=3)
+    metrics.count("bytes_downloaded", 10)
+    with metrics.trace() as trace:
+        pass
+    assert trace is None
+    assert metrics.snapshot()["spans"] == {}
+    assert metrics.snapshot()["counters"] == {}
+    # 無効時は共有の何もしないspanを返す
+    assert metrics.span("a") is metrics.span("b")
+
+
+def test_spans_and_counters_are_aggregated():
+    metrics = Metrics(enabled=True)
+    for _ in range(2):
+        with metrics.span("convert"):
+            pass
+    try:
+        with metrics.span("convert"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    metrics.count("points_processed", 5)
+    metrics.count("points_processed", 7)
+    snapshot = metrics.snapshot()
+    assert snapshot["spans"]["convert"]["count"] == 3
+    assert snapshot["spans"]["convert"]["errors"] == 1
+    assert snapshot["spans"]["convert"]["max_seconds"] <= snapshot["spans"]["convert"]["total_seconds"]
+    assert snapshot["counters"] == {"points_processed": 12}
+
+
+def test_trace_collects_spans_from_tasks_and_copied_contexts():
+    metrics = Metrics(enabled=True)
+
+    def work_in_thread():
+        with metrics.span("thread", series=2):
+            metrics.count("series_processed", 2)
+
+    async def run():
+        import contextvars
+        loop = asyncio.get_running_loop()
+        with metrics.span("task"):
+            await loop.run_in_executor(None, contextvars.copy_context().run, work_in_thread)
+
+    with metrics.trace() as trace:
+        asyncio.run(run())
+    with metrics.span("outside"):
+        pass
+    assert [record.name for record in trace.spans] == ["thread", "task"]
+    assert trace.spans[0].fields == {"series": 2}
+    assert trace.counters == {"series_processed": 2}
+
+
+def test_span_writes_structured_log_line(caplog):
+    metrics = Metrics(enabled=True)
+    with caplog.at_level(logging.INFO, logger="infra.metrics"):
+        with metrics.span("highlight") as span:
+            span.set(series=4)
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line["event"] == "span"
+    assert line["span"] == "highlight"
+    assert line["series"] == 4
+
+
+def test_prometheus_text_and_endpoint():
+    metrics = Metrics(enabled=True)
+    with metrics.span("http_fetch"):
+        pass
+    metrics.count("bytes_downloaded", 100)
+    metrics.register_collector("series_store", lambda: {"bulk_hits": 3, "bulk_hit_rate": 0.5})
+    metrics.register_collector("http", lambda: {"https://example.com": {"requests": 4}})
+    metrics.register_collector("broken", lambda: 1 / 0)
+    text = metrics.prometheus_text()
+    assert 'starrydata_span_seconds_count{span="http_fetch"} 1' in text
+    assert "starrydata_bytes_downloaded_total 100" in text
+    assert "starrydata_series_store_bulk_hits 3.0" in text
+    assert 'starrydata_http_requests{key="https://example.com"} 4.0' in text
+
+    server = start_metrics_server(0, metrics, host="127.0.0.1")
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "starrydata_bytes_downloaded_total 100" in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
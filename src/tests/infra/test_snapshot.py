@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from domain.graph import XYSeries
+from infra.graph_repository import GraphRepositorySnapshot
+from infra.graph_repository_factory import ApiHostName, GraphRepositoryFactory
+from infra.snapshot import SnapshotStore, read_snapshot, write_snapshot
+
+
+def make_series() -> XYSeries:
+    return XYSeries.from_columns(
+        x=np.array([1.0, 2.0, 3.0, 4.0]),
+        y=np.array([10.0, 20.0, 30.0, 40.0]),
+        offsets=np.array([0, 2, 3, 4]),
+        updated_at=["2025-06-01T00:00:00Z", "2025-06-02T00:00:00Z", "2025-06-01T00:00:00Z"],
+        sid=["1", "2", "1"],
+        figure_id=["f1", "f2", "f3"],
+        sample_id=["s1", "s2", "s3"],
+        composition=["Bi2Te3", None, "Bi2Te3"],
+    )
+
+
+def assert_same_series(a: XYSeries, b: XYSeries) -> None:
+    assert a.x.tolist() == b.x.tolist()
+    assert a.y.tolist() == b.y.tolist()
+    assert a.offsets.tolist() == b.offsets.tolist()
+    for name in ("updated_at", "sid", "figure_id", "sample_id", "composition"):
+        assert getattr(a, name).tolist() == getattr(b, name).tolist()
+    assert np.array_equal(a.updated_at_epoch, b.updated_at_epoch)
+
+
+def test_round_trip_maps_columns_without_copying(tmp_path):
+    path = str(tmp_path / "pair.xysnap")
+    series = make_series()
+    size = write_snapshot(path, series, "Temperature", "ZT", metadata={"etag": "abc"})
+    snapshot = read_snapshot(path)
+    assert snapshot.size == size
+    assert (snapshot.property_x, snapshot.property_y, snapshot.metadata) == ("Temperature", "ZT", {"etag": "abc"})
+    assert_same_series(snapshot.series, series)
+    # 数値列と時刻列はmmapしたファイルを参照し、書き換えられない
+    for column in (snapshot.series.x, snapshot.series.offsets, snapshot.series.updated_at_epoch):
+        assert not column.flags.owndata
+        assert not column.flags.writeable
+    # 辞書符号化はファイルの値の一覧・位置をそのまま使う
+    values, codes = snapshot.series.dictionary_encode("composition")
+    assert values.tolist() == ["Bi2Te3", None]
+    assert codes.tolist() == [0, 1, 0]
+    assert snapshot.series.index.positions("sid", "1").tolist() == [0, 2]
+
+
+def test_metadata_columns_are_built_on_first_access(tmp_path):
+    path = str(tmp_path / "pair.xysnap")
+    write_snapshot(path, make_series(), "Temperature", "ZT")
+    series = read_snapshot(path).series
+    # 開いた時点では系列ごとのメタデータ列も値の一覧も作らない
+    assert all(column is None for column in series._metadata.values())
+    assert series._encoded == {}
+    assert series.sid.tolist() == ["1", "2", "1"]
+    assert series._metadata["sid"] is not None
+    assert series._metadata["composition"] is None
+    assert series.composition.tolist() == ["Bi2Te3", None, "Bi2Te3"]
+
+
+def test_empty_series_round_trip(tmp_path):
+    path = str(tmp_path / "empty.xysnap")
+    write_snapshot(path, XYSeries(), "a", "b")
+    assert len(read_snapshot(path).series) == 0
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "pair.xysnap"
+    path.write_bytes(b'{"data": {}}' * 4)
+    with pytest.raises(ValueError):
+        read_snapshot(str(path))
+
+
+def test_snapshot_can_be_opened_from_another_process(tmp_path):
+    path = str(tmp_path / "pair.xysnap")
+    write_snapshot(path, make_series(), "a", "b")
+    src = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    output = subprocess.run(
+        [sys.executable, "-c", f"from infra.snapshot import read_snapshot; print(len(read_snapshot({path!r}).series))"],
+        env={**os.environ, "PYTHONPATH": src}, capture_output=True, text=True, check=True, timeout=60,
+    ).stdout
+    assert output.strip() == "3"
+
+
+def test_store_and_repository(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    assert store.open("Temperature", "ZT") is None
+    store.write("Temperature", "ZT", make_series())
+    assert [s.property_y for s in store] == ["ZT"]
+
+    repository = GraphRepositorySnapshot(store)
+    assert_same_series(repository.get_graph_by_property("Temperature", "ZT"), make_series())
+    with pytest.raises(FileNotFoundError):
+        repository.get_graph_by_property("Temperature", "Seebeck coefficient")
+
+    class Fallback:
+        def get_graph_by_property(self, property_x, property_y):
+            return XYSeries()
+    repository = GraphRepositorySnapshot(store, fallback=Fallback())
+    assert len(repository.get_graph_by_property("Temperature", "Seebeck coefficient")) == 0
+
+
+def test_factory_selects_snapshot_from_env(tmp_path, monkeypatch):
+    monkeypatch.delenv("STARRYDATA_BULK_DATA_SOURCE", raising=False)
+    assert ApiHostName.bulk_from_env() is ApiHostName.CLEANSING_DATASET
+    monkeypatch.setenv("STARRYDATA_BULK_DATA_SOURCE", "snapshot")
+    monkeypatch.setenv("STARRYDATA_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.delenv("STARRYDATA_BULK_DATA_API", raising=False)
+    repository = GraphRepositoryFactory.create(ApiHostName.bulk_from_env())
+    assert isinstance(repository, GraphRepositorySnapshot)
+    assert repository.fallback is None
+    monkeypatch.delenv("STARRYDATA_SNAPSHOT_DIR")
+    with pytest.raises(ValueError):
+        GraphRepositoryFactory.create(ApiHostName.SNAPSHOT)
@@ -0,0 +1,103 @@
+import json
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from infra.api_client import CleansingDatasetApiClient, XYApiColumns, XYApiResponse
+from infra.xy_decoders import Strictness, XYDecoder, available_backends
+
+DATA = {
+    "x": [[1.0, 2.0], [3]],
+    "y": [[10.0, 20.0], [30.0]],
+    "updated_at": ["2025-06-01T00:00:00Z", "2025-06-01T01:00:00Z"],
+    "SID": ["sid1", "sid2"],
+    "figure_id": ["fig1", "fig2"],
+    "sample_id": ["sample1", "sample2"],
+    "composition": ["comp1", None],
+}
+BODY = json.dumps({"data": DATA}).encode()
+
+ALL_DECODERS = [
+    XYDecoder(backend=backend, strictness=strictness)
+    for backend in available_backends()
+    for strictness in Strictness
+]
+
+
+@pytest.mark.parametrize("decoder", ALL_DECODERS, ids=lambda d: f"{d.backend}/{d.strictness.value}")
+def test_every_decoder_gives_the_same_columns(decoder):
+    columns = decoder.decode_columns(BODY)
+    assert isinstance(columns, XYApiColumns)
+    assert columns.x.tolist() == [1.0, 2.0, 3.0]
+    assert columns.x_offsets.tolist() == [0, 2, 3]
+    assert columns.y.dtype == np.float64
+    assert columns.composition == ["comp1", None]
+    response = decoder.decode_response(BODY)
+    assert isinstance(response, XYApiResponse)
+    assert response.SID == ["sid1", "sid2"]
+
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_full_validation_rejects_bad_elements_but_trusted_only_checks_shape(backend):
+    body = json.dumps({"data": {**DATA, "SID": ["sid1", 2]}}).encode()
+    with pytest.raises(ValidationError):
+        XYDecoder(backend=backend, strictness=Strictness.FULL).decode_response(body)
+    # 要素の型は検証しない
+    assert XYDecoder(backend=backend, strictness=Strictness.TRUSTED).decode_response(body).SID == ["sid1", 2]
+
+
+@pytest.mark.parametrize("data, message", [
+    ({"x": [[1.0]], "y": [[2.0]]}, "missing fields: updated_at"),
+    ({**DATA, "x": [1.0, 2.0]}, "x must be a list of lists"),
+    ({**DATA, "SID": "sid1"}, "SID must be a list"),
+])
+def test_trusted_shape_checks(data, message):
+    decoder = XYDecoder(strictness=Strictness.TRUSTED)
+    with pytest.raises(ValueError, match=message):
+        decoder.decode_columns(json.dumps({"data": data}).encode())
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.delenv("STARRYDATA_JSON_DECODER", raising=False)
+    monkeypatch.delenv("STARRYDATA_JSON_STRICTNESS", raising=False)
+    assert XYDecoder.from_env() == XYDecoder(backend="json", strictness=Strictness.FULL)
+    monkeypatch.setenv("STARRYDATA_JSON_DECODER", "auto")
+    assert XYDecoder.from_env().backend == "pydantic"
+    monkeypatch.setenv("STARRYDATA_JSON_STRICTNESS", "trusted")
+    assert XYDecoder.from_env().backend == ("orjson" if "orjson" in available_backends() else "pydantic")
+    monkeypatch.setenv("STARRYDATA_JSON_DECODER", "yaml")
+    with pytest.raises(ValueError):
+        XYDecoder.from_env()
+
+
+def test_missing_orjson_falls_back_to_json(monkeypatch):
+    monkeypatch.setattr("infra.xy_decoders.orjson", None)
+    monkeypatch.setenv("STARRYDATA_JSON_DECODER", "orjson")
+    assert XYDecoder.from_env().backend == "json"
+    with pytest.raises(ValueError):
+        XYDecoder(backend="orjson")
+
+
+def test_client_decodes_whole_body_with_its_decoder():
+    client = CleansingDatasetApiClient(
+        "http://dummy", streaming=False, decoder=XYDecoder(backend="pydantic", strictness=Strictness.TRUSTED)
+    )
+
+    class Pool:
+        def get(self, path, **kwargs):
+            class Response:
+                status_code = 200
+                headers = {}
+                def __enter__(self):
+                    return self
+                def __exit__(self, *exc):
+                    return False
+                def raise_for_status(self):
+                    pass
+                def iter_content(self, chunk_size):
+                    return iter([BODY[:10], BODY[10:]])
+            return Response()
+    client.session_pool = Pool()
+    columns = client.fetch_xy_columns("x", "y")
+    assert columns.SID == ["sid1", "sid2"]
@@ -0,0 +1,88 @@
+import json
+import pytest
+import numpy as np
+from unittest.mock import patch
+from infra.api_client import XYApiResponse, XYApiColumns, CleansingDatasetApiClient
+from infra.xy_stream_decoder import XYStreamDecoder
+
+PAYLOAD = {
+    "meta": {"generated_at": "2025-06-01T00:00:00+09:00", "count": 3},
+    "data": {
+        "x": [[1.0, 2.5], [], [3e-2, -4, 5]],
+        "y": [[10.0, 20.0], [1.0], [30.0, 40.0, 50.0]],
+        "updated_at": ["2025-06-01T00:00:00Z", "2025-06-01T01:00:00Z", "2025-06-01T02:00:00Z"],
+        "SID": ["sid1", "sid2", "sid3"],
+        "figure_id": ["fig1", "fig2", "fig3"],
+        "sample_id": ["sample1", "sample2", "sample3"],
+        "composition": ["Bi2Te3", None, 'comp "]" ,'],
+        "extra": {"ignored": [1, 2, 3]}
+    }
+}
+
+
+def decode_in_chunks(raw: bytes, chunk_size: int) -> XYApiColumns:
+    decoder = XYStreamDecoder()
+    for i in range(0, len(raw), chunk_size):
+        decoder.feed(raw[i:i + chunk_size])
+    return decoder.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_stream_decoder_matches_pydantic(chunk_size):
+    raw = json.dumps(PAYLOAD, indent=2, ensure_ascii=False).encode("utf-8")
+    columns = decode_in_chunks(raw, chunk_size)
+    expected = XYApiColumns.from_response(XYApiResponse(**PAYLOAD["data"]))
+    assert columns.x.dtype == np.float64
+    assert columns.x.tolist() == expected.x.tolist()
+    assert columns.x_offsets.tolist() == expected.x_offsets.tolist() == [0, 2, 2, 5]
+    assert columns.y.tolist() == expected.y.tolist()
+    assert columns.y_offsets.tolist() == expected.y_offsets.tolist()
+    assert columns.SID == expected.SID
+    assert columns.updated_at == expected.updated_at
+    assert columns.composition == ["Bi2Te3", None, 'comp "]" ,']
+
+
+def test_stream_decoder_multibyte_characters_split_across_chunks():
+    payload = json.loads(json.dumps(PAYLOAD))
+    payload["data"]["composition"] = ["Ω·m", "αβγ", None]
+    raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    columns = decode_in_chunks(raw, 1)
+    assert columns.composition == ["Ω·m", "αβγ", None]
+
+
+def test_stream_decoder_missing_fields_raises():
+    raw = json.dumps({"data": {"x": [[1.0]], "y": [[2.0]]}}).encode("utf-8")
+    with pytest.raises(ValueError):
+        decode_in_chunks(raw, 4)
+
+
+def test_stream_decoder_truncated_input_raises():
+    raw = json.dumps(PAYLOAD).encode("utf-8")
+    with pytest.raises(ValueError):
+        decode_in_chunks(raw[:-10], 16)
+
+
+def test_stream_decoder_invalid_number_raises():
+    raw = b'{"data": {"x": [[1.0, "a"]], "y": [[2.0, 3.0]]}}'
+    with pytest.raises(ValueError):
+        decode_in_chunks(raw, 8)
+
+
+def test_cleansing_dataset_api_client_fetch_xy_columns_streaming():
+    raw = json.dumps(PAYLOAD).encode("utf-8")
+    class MockResponse:
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            return False
+        def raise_for_status(self):
+            pass
+        def iter_content(self, chunk_size):
+            for i in range(0, len(raw), 5):
+                yield raw[i:i + 5]
+    with patch("requests.Session.get", return_value=MockResponse()) as mock_get:
+        client = CleansingDatasetApiClient("http://dummy")
+        columns = client.fetch_xy_columns("x", "y")
+    assert mock_get.call_args.kwargs["stream"] is True
+    assert columns.x.tolist() == [1.0, 2.5, 0.03, -4.0, 5.0]
+    assert columns.SID == ["sid1", "sid2", "sid3"]
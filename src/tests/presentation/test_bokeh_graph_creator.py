@@ -1,3 +1,6 @@
+import logging
+
+import numpy as np
 import pytest
 from presentation.bokeh_graph_creator import BokehGraphCreator
 from bokeh.plotting import figure
@@ -60,6 +63,65 @@ def test_create_bokeh_data_source(graph_creator, simple_dto):
     assert "y" in source.data
     assert len(source.data["x"]) == 9
     assert len(source.data["y"]) == 9
-    assert source.data["x"] == [1, 2, 3, 1, 2, 3, 1, 2, 3]
-    assert source.data["y"] == [4, 5, 6, 4, 5, 6, 4, 5, 6]
+    assert list(source.data["x"]) == [1, 2, 3, 1, 2, 3, 1, 2, 3]
+    assert list(source.data["y"]) == [4, 5, 6, 4, 5, 6, 4, 5, 6]
     assert isinstance(source, ColumnDataSource)
+
+
+def test_create_bokeh_data_source_encodes_highlight_and_sid(graph_creator):
+    points_a = make_xy_points([XYPoint(1, 4), XYPoint(2, 5)], sid="sid-a")
+    points_b = make_xy_points([XYPoint(3, 6)], sid="sid-b")
+    dto = XYSeriesDTO(data=[
+        XYPointsDTO(data=points_a.data, is_highlighted=False, sid="sid-a", figure_id="f", sample_id="s", composition=""),
+        XYPointsDTO(data=points_b.data, is_highlighted=True, sid="sid-b", figure_id="f", sample_id="s", composition=""),
+    ])
+    source = graph_creator.create_bokeh_data_source(dto)
+    assert list(source.data["highlight"]) == [0, 0, 1]
+    sids, _ = dto.series.dictionary_encode("sid")
+    assert [sids[c] for c in source.data["sid_code"]] == ["sid-a", "sid-a", "sid-b"]
+
+
+def test_create_bokeh_figure_with_level_of_detail(graph_creator, x_axis, y_axis):
+    from presentation.level_of_detail import LevelOfDetail
+    graph_creator.create_bokeh_figure(x_axis, y_axis, level_of_detail=LevelOfDetail())
+    result = graph_creator.last_lod_result
+    # 3系列が同じ3点なので、各位置1点ずつ残る
+    assert result.n_input == 9
+    assert result.n_output == 3
+
+
+def test_create_bokeh_figure_logs_document_size(graph_creator, x_axis, y_axis, caplog):
+    with caplog.at_level(logging.INFO, logger="presentation.wire_format"):
+        fig = graph_creator.create_bokeh_figure(x_axis, y_axis)
+    assert "bytes serialized" in caplog.text
+    source = fig.renderers[0].data_source
+    assert source.data["x"].dtype == np.float32
+    assert source.data["sid_code"].dtype == np.uint8
+
+
+def test_create_bokeh_figure_from_dto_reuses_point_columns(mock_graph_data_service, simple_dto, x_axis, y_axis):
+    creator = BokehGraphCreator(graph_data_service=mock_graph_data_service)
+    narrow_x_axis = Axis(property="x", axis_type=AxisType.LINEAR, unit="", axis_range=AxisRange(1.5, 2.5))
+    first = creator.create_bokeh_figure_from_dto(simple_dto, x_axis, y_axis)
+    columns = creator.point_columns(simple_dto)
+    second = creator.create_bokeh_figure_from_dto(simple_dto, narrow_x_axis, y_axis)
+    assert creator.point_columns(simple_dto) is columns
+    assert second.x_range.start == 1.5
+    assert len(first.renderers[0].data_source.data["x"]) == 9
+    mock_graph_data_service.get_merged_graph_data.assert_not_called()
+
+
+def test_hover_sends_only_sids_of_sent_points(mock_graph_data_service, y_axis):
+    from application.viewport_culling import ViewportCulling
+    from bokeh.models import HoverTool
+    dto = XYSeriesDTO(data=[
+        XYPointsDTO(data=[XYPoint(x, 5)], is_highlighted=False, sid=f"sid-{x}", figure_id="f", sample_id="s", composition="")
+        for x in (1, 2, 3)
+    ])
+    narrow_x_axis = Axis(property="x", axis_type=AxisType.LINEAR, unit="", axis_range=AxisRange(2.5, 3.5))
+    creator = BokehGraphCreator(graph_data_service=mock_graph_data_service)
+    fig = creator.create_bokeh_figure_from_dto(dto, narrow_x_axis, y_axis, viewport_culling=ViewportCulling(margin=0))
+    source = fig.renderers[0].data_source
+    sids = fig.select_one(HoverTool).formatters["@sid_code"].args["sids"]
+    assert list(sids) == ["sid-3"]
+    assert [sids[c] for c in source.data["sid_code"]] == ["sid-3"]
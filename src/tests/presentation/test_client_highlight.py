@@ -0,0 +1,61 @@
+import datetime
+
+import numpy as np
+from bokeh.embed import json_item
+from bokeh.models import CDSView, CustomJSFilter, DateRangePicker
+from unittest.mock import Mock
+
+from application.graph_data_service import XYSeriesDTO
+from domain.graph import Axis, AxisType, AxisRange, XYPoint
+from presentation.bokeh_graph_creator import BokehGraphCreator
+from presentation.client_highlight import ClientDateHighlight
+from presentation.level_of_detail import LevelOfDetail
+from src.tests.domain.graph_mock_factory import make_xy_points, make_xy_series
+
+
+def test_client_highlight_adds_filtered_renderer_on_top():
+    series = make_xy_series([
+        make_xy_points([XYPoint(1, 2)], updated_at="2024-01-01T00:00:00Z"),
+        make_xy_points([XYPoint(3, 4)], updated_at="2024-01-02T00:00:00Z"),
+    ])
+    dto = XYSeriesDTO.from_series(series, np.zeros(2, dtype=bool))
+    axis = Axis(property="x", axis_type=AxisType.LINEAR, unit="", axis_range=AxisRange(0, 5))
+    creator = BokehGraphCreator(graph_data_service=Mock())
+    highlight = ClientDateHighlight(date_from=datetime.date(2024, 1, 1), date_to=datetime.date(2024, 1, 1))
+    layout = creator.create_bokeh_figure_from_dto(dto, axis, axis, client_highlight=highlight)
+
+    picker, fig = layout.children
+    assert isinstance(picker, DateRangePicker)
+    base, highlighted = fig.renderers
+    # ハイライト用のビューは同じデータソースをCustomJSFilterで絞り込み、全点の後（上）に描く
+    assert highlighted.data_source is base.data_source
+    assert isinstance(highlighted.view, CDSView)
+    assert isinstance(highlighted.view.filter, CustomJSFilter)
+    assert list(base.data_source.data["updated_at"]) == [1704067200000.0, 1704153600000.0]
+    assert picker.js_property_callbacks["change:value"]
+    json_item(layout)
+
+
+def test_client_highlight_with_lod_keeps_points_in_selectable_range():
+    n = 20_000
+    # 同じ位置に重なった点のうち、最近更新された系列だけがブラウザでハイライトされうる
+    series = make_xy_series([
+        make_xy_points([XYPoint(0.5, 0.5)], updated_at="2024-06-01T00:00:00Z" if i % 100 == 0 else "2023-01-01T00:00:00Z")
+        for i in range(n)
+    ])
+    dto = XYSeriesDTO.from_series(series, np.zeros(n, dtype=bool))
+    axis = Axis(property="x", axis_type=AxisType.LINEAR, unit="", axis_range=AxisRange(0, 1))
+    creator = BokehGraphCreator(graph_data_service=Mock())
+    lod = LevelOfDetail(point_budget=1000)
+
+    limited = ClientDateHighlight(date_from=datetime.date(2024, 6, 1), date_to=datetime.date(2024, 6, 30), min_date=datetime.date(2024, 6, 1))
+    picker, fig = creator.create_bokeh_figure_from_dto(dto, axis, axis, level_of_detail=lod, client_highlight=limited).children
+    sent = fig.renderers[0].data_source.data["updated_at"]
+    assert (np.asarray(sent) == 1717200000000.0).sum() == n // 100
+    assert str(picker.min_date) == "2024-06-01"
+
+    # 選べる期間が限られていなければ間引かない
+    unlimited = ClientDateHighlight(date_from=datetime.date(2024, 6, 1), date_to=datetime.date(2024, 6, 30))
+    _, fig = creator.create_bokeh_figure_from_dto(dto, axis, axis, level_of_detail=lod, client_highlight=unlimited).children
+    assert len(fig.renderers[0].data_source.data["x"]) == n
+    assert creator.last_lod_result is None
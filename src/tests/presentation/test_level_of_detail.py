@@ -0,0 +1,72 @@
+import numpy as np
+
+from domain.graph import Axis, AxisType, AxisRange
+from presentation.level_of_detail import LevelOfDetail
+
+
+def axis(lo=0.0, hi=1.0, axis_type=AxisType.LINEAR):
+    return Axis(property="p", axis_type=axis_type, unit="", axis_range=AxisRange(lo, hi))
+
+
+def test_dense_cell_is_reduced_to_one_point():
+    x = np.full(1000, 0.5)
+    y = np.full(1000, 0.5)
+    result = LevelOfDetail().decimate(x, y, axis(), axis())
+    assert result.n_input == 1000
+    assert result.indices.tolist() == [0]
+
+
+def test_highlighted_and_isolated_points_are_kept():
+    x = np.r_[np.full(1000, 0.5), 0.9]
+    y = np.r_[np.full(1000, 0.5), 0.1]
+    keep = np.zeros(1001, dtype=bool)
+    keep[500] = True
+    result = LevelOfDetail().decimate(x, y, axis(), axis(), keep=keep)
+    assert result.indices.tolist() == [0, 500, 1000]
+    # 予算の対象外になるのはハイライトだけ
+    assert result.n_forced == 1
+
+
+def test_budget_coarsens_cells():
+    rng = np.random.default_rng(0)
+    x = rng.random(100_000)
+    y = rng.random(100_000)
+    result = LevelOfDetail(point_budget=2000, outlier_max_count=0).decimate(x, y, axis(), axis())
+    assert result.n_output <= 2000
+    assert result.cell_px > 2
+
+
+def test_non_positive_values_are_dropped_on_log_axis():
+    x = np.array([-1.0, 0.0, 10.0])
+    y = np.array([1.0, 1.0, 1.0])
+    result = LevelOfDetail().decimate(x, y, axis(1, 100, AxisType.LOGARITHMIC), axis(0, 2))
+    assert result.indices.tolist() == [2]
+
+
+def test_log_axis_with_non_positive_range_uses_data_extent():
+    rng = np.random.default_rng(2)
+    x = rng.uniform(1, 1150, 200_000)
+    y = rng.random(200_000)
+    log_x = axis(-5, 1150, AxisType.LOGARITHMIC)
+    result = LevelOfDetail().decimate(x, y, log_x, axis())
+    # 範囲の下限が0以下でも、点が1列のセルに集まらない（下限を1にした場合と同程度の点数になる）
+    reference = LevelOfDetail().decimate(x, y, axis(1, 1150, AxisType.LOGARITHMIC), axis())
+    assert result.n_output > reference.n_output * 0.9
+    assert result.n_output > 10_000
+
+
+def test_budget_holds_on_dense_random_data():
+    rng = np.random.default_rng(1)
+    n = 1_000_000
+    x = rng.random(n)
+    y = rng.random(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[rng.choice(n, 300, replace=False)] = True
+    lod = LevelOfDetail(point_budget=50_000, outlier_max_count=3)
+    result = lod.decimate(x, y, axis(), axis(), keep=keep)
+    assert result.n_forced == 300
+    assert result.n_output <= lod.point_budget + result.n_forced
+    assert np.isin(np.flatnonzero(keep), result.indices).all()
+    # 予算が小さすぎても、ハイライト以外は予算で打ち切る
+    tiny = LevelOfDetail(point_budget=10, width_px=4, height_px=4).decimate(x, y, axis(), axis())
+    assert tiny.n_output <= 10
@@ -0,0 +1,40 @@
+
+import numpy as np
+
+from domain.graph import Axis, AxisType, AxisRange
+from presentation.wire_format import WireFormat, encode_float, narrow_codes
+
+
+def axis(lo, hi, axis_type=AxisType.LINEAR):
+    return Axis(property="p", axis_type=axis_type, unit="", axis_range=AxisRange(lo, hi))
+
+
+def test_encode_float_uses_float32_within_tolerance():
+    values = np.array([0.1, 0.5, np.nan, 300.0])
+    assert encode_float(values, axis(0, 1000), 1e-6).dtype == np.float32
+    assert encode_float(values, axis(0, 1000), None).dtype == np.float64
+
+
+def test_encode_float_keeps_float64_for_narrow_span():
+    values = np.array([300.0000001, 300.0000002])
+    assert encode_float(values, axis(300.0, 300.000001), 1e-3).dtype == np.float64
+
+
+def test_encode_float_relative_on_log_axis():
+    values = np.array([1e-12, 1e12])
+    assert encode_float(values, axis(1e-12, 1e12, AxisType.LOGARITHMIC), 1e-6).dtype == np.float32
+
+
+def test_narrow_codes():
+    codes = np.array([0, 1, 2], dtype=np.int64)
+    assert narrow_codes(codes, 3).dtype == np.uint8
+    assert narrow_codes(codes, 300).dtype == np.uint16
+    assert narrow_codes(codes, 70000).dtype == np.uint32
+
+
+def test_wire_format_from_env(monkeypatch):
+    monkeypatch.setenv("STARRYDATA_WIRE_X_TOLERANCE", "none")
+    monkeypatch.setenv("STARRYDATA_WIRE_Y_TOLERANCE", "0.001")
+    wire_format = WireFormat.from_env()
+    assert wire_format.x_tolerance is None
+    assert wire_format.y_tolerance == 0.001